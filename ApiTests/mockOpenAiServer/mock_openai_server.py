@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatível com a API de chat completions da OpenAI, para testar os scripts do
+step3 sem gastar tokens nem depender de rede:
+
+    python mock_openai_server.py --porta=8000 --latencia=2 --rpm=120
+    python ../../step3/classify_tables_openai.py 50 --base-url=http://127.0.0.1:8000/v1 --concorrencia=8
+
+A resposta imita o formato pedido pelo prompt universal, com um score determinístico derivado
+do nome da tabela; prompts com várias tabelas (--agrupar do step3) recebem um array com uma
+classificação por tabela, e --taxa-omissao descarta itens do array para simular respostas
+incompletas. O campo usage.prompt_tokens_details.cached_tokens simula o cache de prefixo da
+OpenAI: conta os tokens do maior início do prompt (a partir de 1024 tokens, em blocos de 128)
+idêntico ao de uma requisição anterior. Opções simulam latência, limite de requisições por minuto (HTTP 429) e erros
+aleatórios (HTTP 500). Ao encerrar (Ctrl+C) mostra quantas requisições recebeu e o pico de
+requisições simultâneas.
+
+Também atende a Batch API (POST /v1/files, POST /v1/batches, GET /v1/batches/{id} e
+GET /v1/files/{id}/content), usada pelo modo --lote do step3. Os arquivos enviados e os
+resultados ficam em --dir-lotes; cada lote é processado em segundo plano depois de
+--latencia-lote segundos, e --taxa-erro também vale para as requisições do lote:
+
+    python mock_openai_server.py --porta=8000 --latencia-lote=5
+    python ../../step3/classify_tables.py --provedores=openai --lote --base-url=http://127.0.0.1:8000/v1
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+class MockState:
+    def __init__(self, latency, jitter, rpm, error_rate, batch_latency=2.0, batch_dir=None, omission_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.batch_latency = batch_latency
+        self.omission_rate = omission_rate
+        self.omitted = 0
+        self.batch_dir = Path(batch_dir or tempfile.mkdtemp(prefix="mock_batches_"))
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        self.files = {}                # id -> objeto "file" (o conteúdo fica em batch_dir/<id>)
+        self.batches = {}              # id -> objeto "batch"
+        self.batch_requests = 0
+        self.lock = threading.Lock()
+        self.recent = deque()          # instantes das requisições aceitas no último minuto
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.prefixes = set()          # hashes dos inícios de prompt já vistos (cache de prefixo)
+
+    def admit(self):
+        """
+        Registra a requisição. Devolve None se ela foi aceita ou, se ultrapassa o limite de
+        requisições por minuto, os segundos até a janela liberar uma vaga (o Retry-After).
+        """
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.rpm and len(self.recent) >= self.rpm:
+                self.rate_limited += 1
+                return max(1, math.ceil(60 - (now - self.recent[0])))
+            self.recent.append(now)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return None
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def fake_classification(table: str) -> dict:
+    score = int(hashlib.sha1(table.encode('utf-8')).hexdigest(), 16) % 101
+    return {
+        "tabela": table,
+        "chave_primaria": "id",
+        "score_relevancia": score,
+        "colunas_contribuintes": [],
+        "justificativa": f"Resposta simulada pelo servidor mock para {table}.",
+    }
+
+
+CACHE_MIN_TOKENS = 1024        # Cache de prefixo: mínimo de tokens e tamanho dos blocos (como na OpenAI)
+CACHE_BLOCK_TOKENS = 128
+
+
+def cached_prefix_tokens(prompt: str, state: MockState) -> int:
+    """Tokens (~4 caracteres cada) do maior início do prompt já visto, em blocos de 128."""
+    total_tokens = len(prompt) // 4
+    boundaries = range(CACHE_MIN_TOKENS, total_tokens + 1, CACHE_BLOCK_TOKENS)
+    hashes = [(tokens, hashlib.sha1(prompt[:tokens * 4].encode('utf-8')).hexdigest()) for tokens in boundaries]
+    with state.lock:
+        cached = max((tokens for tokens, digest in hashes if digest in state.prefixes), default=0)
+        state.prefixes.update(digest for _, digest in hashes)
+        state.cached_tokens += cached
+    return cached
+
+
+def chat_completion(request: dict, state: MockState) -> dict:
+    """Corpo da resposta de chat completions para a requisição."""
+    prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+    tables = re.findall(r'"table_name"\s*:\s*"([^"]+)"', prompt) or ["desconhecida"]
+    if len(tables) == 1:
+        content = json.dumps(fake_classification(tables[0]), ensure_ascii=False)
+    else:
+        kept = [t for t in tables if random.random() >= state.omission_rate]
+        with state.lock:
+            state.omitted += len(tables) - len(kept)
+        content = json.dumps([fake_classification(t) for t in kept], ensure_ascii=False)
+    prompt_tokens = len(prompt) // 4
+    cached_tokens = cached_prefix_tokens(prompt, state)
+    with state.lock:
+        state.prompt_tokens += prompt_tokens
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                  "total_tokens": prompt_tokens + len(content) // 4,
+                  "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+    }
+
+
+def store_file(state: MockState, data: bytes, filename: str, purpose: str) -> dict:
+    file_id = f"file-{uuid.uuid4().hex[:24]}"
+    (state.batch_dir / file_id).write_bytes(data)
+    file_object = {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                   "filename": filename, "purpose": purpose, "status": "processed"}
+    with state.lock:
+        state.files[file_id] = file_object
+    return file_object
+
+
+def process_batch(state: MockState, batch_id: str):
+    """Executa as requisições de um lote em segundo plano e grava os arquivos de saída e de erro."""
+    batch = state.batches[batch_id]
+    batch.update(status="in_progress", in_progress_at=int(time.time()))
+    time.sleep(state.batch_latency)
+    outputs, errors = [], []
+    lines = (state.batch_dir / batch["input_file_id"]).read_text(encoding='utf-8').splitlines()
+    for line in filter(str.strip, lines):
+        entry = json.loads(line)
+        request_id = f"batch_req_{uuid.uuid4().hex[:16]}"
+        if random.random() < state.error_rate:
+            errors.append({"id": request_id, "custom_id": entry["custom_id"], "error": None,
+                           "response": {"status_code": 500, "request_id": request_id,
+                                        "body": {"error": {"message": "Erro simulado (mock)"}}}})
+        else:
+            outputs.append({"id": request_id, "custom_id": entry["custom_id"], "error": None,
+                            "response": {"status_code": 200, "request_id": request_id,
+                                         "body": chat_completion(entry["body"], state)}})
+    batch.update(status="finalizing", finalizing_at=int(time.time()))
+    for key, entries in (("output_file_id", outputs), ("error_file_id", errors)):
+        if entries:
+            data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode('utf-8')
+            batch[key] = store_file(state, data, f"{batch_id}_{key[:-8]}.jsonl", "batch_output")["id"]
+    with state.lock:
+        state.batch_requests += len(outputs) + len(errors)
+        state.errors += len(errors)
+    batch.update(status="completed", completed_at=int(time.time()),
+                 request_counts={"total": len(outputs) + len(errors), "completed": len(outputs),
+                                 "failed": len(errors)})
+
+
+def stop_server(signum, frame):
+    raise KeyboardInterrupt
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip('/').split('/')
+            if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in state.batches:
+                self.send_json(200, state.batches[parts[-1]])
+            elif len(parts) >= 3 and parts[-1] == "content" and parts[-2] in state.files:
+                body = (state.batch_dir / parts[-2]).read_bytes()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_json(404, {"error": {"message": f"Rota não suportada: {self.path}"}})
+
+        def upload_file(self):
+            # multipart/form-data com os campos "purpose" e "file"
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode('utf-8') + self.read_body())
+            fields = {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                fields[name] = (part.get_filename(), part.get_payload(decode=True))
+            if "file" not in fields:
+                self.send_json(400, {"error": {"message": "Campo 'file' ausente"}})
+                return
+            filename, data = fields["file"]
+            purpose = fields.get("purpose", (None, b"batch"))[1].decode('utf-8')
+            self.send_json(200, store_file(state, data, filename or "upload.jsonl", purpose))
+
+        def create_batch(self):
+            request = json.loads(self.read_body() or b"{}")
+            if request.get("input_file_id") not in state.files:
+                self.send_json(404, {"error": {"message": f"Arquivo não encontrado: {request.get('input_file_id')}"}})
+                return
+            now = int(time.time())
+            batch = {
+                "id": f"batch_{uuid.uuid4().hex[:24]}", "object": "batch",
+                "endpoint": request.get("endpoint", "/v1/chat/completions"),
+                "input_file_id": request["input_file_id"],
+                "completion_window": request.get("completion_window", "24h"),
+                "status": "validating", "created_at": now, "expires_at": now + 24 * 3600,
+                "output_file_id": None, "error_file_id": None, "errors": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                "metadata": request.get("metadata"),
+            }
+            state.batches[batch["id"]] = batch
+            threading.Thread(target=process_batch, args=(state, batch["id"]), daemon=True).start()
+            self.send_json(200, batch)
+
+        def do_POST(self):
+            path = self.path.split("?")[0].rstrip('/')
+            if path.endswith("/files"):
+                self.upload_file()
+                return
+            if path.endswith("/batches"):
+                self.create_batch()
+                return
+            if not path.endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": f"Rota não suportada: {self.path}"}})
+                return
+            request = json.loads(self.read_body() or b"{}")
+
+            retry_after = state.admit()
+            if retry_after is not None:
+                self.send_json(429, {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit"}},
+                               {"Retry-After": str(retry_after)})
+                return
+            try:
+                time.sleep(max(0.0, random.gauss(state.latency, state.jitter)))
+                if random.random() < state.error_rate:
+                    with state.lock:
+                        state.errors += 1
+                    self.send_json(500, {"error": {"message": "Erro simulado (mock)"}})
+                    return
+
+                self.send_json(200, chat_completion(request, state))
+            finally:
+                state.release()
+
+    return Handler
+
+
+def main():
+    port, latency, jitter, rpm, error_rate = 8000, 1.0, 0.3, 0, 0.0
+    batch_latency, batch_dir, omission_rate = 2.0, None, 0.0
+    try:
+        for arg in sys.argv[1:]:
+            key, _, value = arg.partition("=")
+            if key == "--porta":
+                port = int(value)
+            elif key == "--latencia":
+                latency = float(value)
+            elif key == "--jitter":
+                jitter = float(value)
+            elif key == "--rpm":
+                rpm = int(value)
+            elif key == "--taxa-erro":
+                error_rate = float(value)
+            elif key == "--taxa-omissao":
+                omission_rate = float(value)
+            elif key == "--latencia-lote":
+                batch_latency = float(value)
+            elif key == "--dir-lotes":
+                batch_dir = value
+            else:
+                raise ValueError(arg)
+    except ValueError as e:
+        print(f"Argumento inválido: {e}")
+        print("Uso: python mock_openai_server.py [--porta=8000] [--latencia=1.0] [--jitter=0.3] [--rpm=0] [--taxa-erro=0.0]"
+              " [--taxa-omissao=0.0] [--latencia-lote=2.0] [--dir-lotes=DIR]")
+        sys.exit(1)
+
+    state = MockState(latency, jitter, rpm, error_rate, batch_latency, batch_dir, omission_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    print("=" * 80)
+    print("🧪 SERVIDOR MOCK COMPATÍVEL COM A API OPENAI")
+    print("=" * 80)
+    print(f"   Endpoint: http://127.0.0.1:{port}/v1/chat/completions")
+    print(f"   Latência: {latency}s ± {jitter}s | Limite: {rpm or 'sem limite'} req/min | Erros: {error_rate:.0%}")
+    print(f"   Batch API: /v1/files e /v1/batches (arquivos em {state.batch_dir}, processamento após {batch_latency}s)")
+    print("   Ctrl+C para encerrar")
+    # Processos em segundo plano ignoram o Ctrl+C: encerra também com SIGTERM (kill)
+    signal.signal(signal.SIGTERM, stop_server)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\n" + "=" * 80)
+        print(f"   Requisições recebidas: {state.requests}")
+        print(f"   Recusadas por limite (429): {state.rate_limited}")
+        print(f"   Lotes: {len(state.batches)} ({state.batch_requests} requisições)")
+        print(f"   Erros simulados (500): {state.errors}")
+        print(f"   Tabelas omitidas de respostas agrupadas: {state.omitted}")
+        print(f"   Pico de requisições simultâneas: {state.max_in_flight}")
+        print(f"   Tokens de prompt (aprox.): {state.prompt_tokens:,} ({state.cached_tokens:,} do cache de prefixo)")
+        print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
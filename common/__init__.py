@@ -0,0 +1,6 @@
+"""
+Código compartilhado entre as etapas do pipeline (step1, step2, ...).
+
+Os scripts de cada etapa rodam a partir do próprio diretório; para importar daqui, acrescentam a
+raiz do repositório ao sys.path antes do import (ver o início de step1/fk_graph.py).
+"""
@@ -0,0 +1,33 @@
+"""
+Resolução da tabela referenciada por uma FK refletida do PostgreSQL.
+
+A reflexão devolve referred_schema = None quando a tabela referenciada é visível pelo search_path
+da conexão (ex.: FK de saude.tb_atendimento para tb_cidadao, que está em public). O grafo de FKs
+do step1 e as regras de grau de FK do step2 usam esta mesma função, para que uma aresta nunca
+aponte para tabelas diferentes nas duas etapas.
+"""
+
+DEFAULT_SEARCH_PATH = ["public"]
+
+
+def resolve_referred_table(fk: dict, source_schema: str, known_tables, search_path=None):
+    """
+    (schema, tabela) referenciada pela FK.
+
+    Args:
+        fk: FK no formato da reflexão (referred_schema, referred_table)
+        source_schema: Schema da tabela que tem a FK (último recurso com search_path vazio)
+        known_tables: Conjunto de (schema, tabela) conhecidas
+        search_path: Schemas do search_path usado na reflexão (None = DEFAULT_SEARCH_PATH)
+
+    Com referred_schema = None, vale o primeiro schema do search_path que tem a tabela, como no
+    PostgreSQL; se nenhum a tem entre as conhecidas, o primeiro schema do search_path.
+    """
+    table = fk.get("referred_table")
+    if fk.get("referred_schema") is not None:
+        return fk["referred_schema"], table
+    search_path = DEFAULT_SEARCH_PATH if search_path is None else search_path
+    for candidate in search_path:
+        if (candidate, table) in known_tables:
+            return candidate, table
+    return (search_path[0] if search_path else source_schema), table
@@ -0,0 +1,114 @@
+"""
+Leitura e escrita incrementais de arrays JSON (um objeto por vez), para gravar e processar o JSON
+consolidado sem carregá-lo inteiro em memória. Usado pelo step1 (gravação e modo --incremental)
+e pelo step2 (--streaming).
+
+A leitura usa o ijson, se instalado; senão, um leitor com json.JSONDecoder.raw_decode sobre
+blocos do arquivo (só o objeto corrente e o bloco lido ficam em memória).
+"""
+
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+READ_CHUNK_CHARS = 1 << 20      # Caracteres lidos por vez pelo leitor sem ijson
+
+
+def iter_json_array(path, chunk_chars: int = READ_CHUNK_CHARS):
+    """Itera os elementos do array JSON no topo do arquivo `path`."""
+    if ijson is not None:
+        with open(path, 'rb') as f:
+            # use_float: números com casas decimais como float (o padrão do ijson é Decimal)
+            yield from ijson.items(f, 'item', use_float=True)
+        return
+    yield from _iter_raw_decode(path, chunk_chars)
+
+
+def _iter_raw_decode(path, chunk_chars):
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = "", 0, False
+        read_size = chunk_chars
+        started = False
+        while True:
+            pos = _skip_whitespace(buffer, pos, ',' if started else '')
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != '[':
+                        raise ValueError(f"{path}: o arquivo não contém um array JSON")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    # Depois de um elemento completo sempre vem ',' ou ']'; até vê-lo no bloco, o
+                    # elemento pode estar cortado (ex.: o número "2.5" lido como "2" + ".5")
+                    after = _skip_whitespace(buffer, end)
+                    if after < len(buffer) and buffer[after] in ',]':
+                        yield item
+                        pos = end
+                        read_size = chunk_chars
+                        continue
+                    if eof:
+                        raise ValueError(f"{path}: esperado ',' ou ']' após o elemento {buffer[pos:end][:40]!r}")
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                raise ValueError(f"{path}: array JSON incompleto")
+            # Elemento incompleto no bloco: descarta o que já foi consumido e lê mais
+            # (dobrando o tamanho da leitura para não reprocessar objetos grandes muitas vezes)
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = f.read(read_size)
+            read_size *= 2
+            eof = not chunk
+            buffer += chunk
+
+
+def _skip_whitespace(buffer, pos, extra=''):
+    while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in extra):
+        pos += 1
+    return pos
+
+
+class StreamingJSONArrayWriter:
+    """
+    Escreve um array JSON um objeto por vez, à medida que os itens ficam prontos: só o item
+    corrente fica em memória e o arquivo é descarregado a cada item, de modo que o prefixo já
+    gravado pode ser lido por um parser incremental durante a execução.
+    Sem compactação, a saída é idêntica à de json.dump(lista, indent=2); com compactação, cada
+    item ocupa uma única linha sem espaços.
+    """
+    def __init__(self, path, compact=False):
+        self.path = path
+        self.compact = compact
+        self.written = 0
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.path, 'w', encoding='utf-8')
+        self.f.write("[")
+        return self
+
+    def write(self, item):
+        if self.compact:
+            text = json.dumps(item, ensure_ascii=False, default=str, separators=(",", ":"))
+        else:
+            text = json.dumps(item, indent=2, ensure_ascii=False, default=str)
+            text = "\n".join("  " + line for line in text.split("\n"))
+        self.f.write(("," if self.written else "") + "\n" + text)
+        self.f.flush()
+        self.written += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        # Fecha o array mesmo em caso de erro, para o arquivo parcial continuar sendo JSON válido
+        self.f.write("\n]" if self.written else "]")
+        self.f.close()
+        return False
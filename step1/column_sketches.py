@@ -0,0 +1,261 @@
+# column_sketches.py
+# NOVO: Sketches de domínio de valores por coluna (PROFILER_MODE = "sketch" no extract_metadata.py).
+# Em uma única varredura da tabela, cada coluna alimenta:
+#   - HyperLogLog          -> estimativa de valores distintos (erro relativo ~1,04/sqrt(2^precisão))
+#   - Count-Min + candidatos -> valores mais frequentes (heavy hitters) com contagem aproximada
+# A memória por coluna é fixa (não depende do tamanho da tabela), e os sketches são serializáveis
+# e combináveis (merge): uma execução futura pode varrer apenas as linhas novas e somar ao que foi salvo.
+import base64
+import hashlib
+import math
+import zlib
+from array import array
+
+HLL_PRECISION = 12                 # 2^12 registradores (4 KB por coluna, erro ~1,6%)
+CMS_WIDTH = 4096                   # Contadores por linha do Count-Min (erro <= e/largura * linhas)
+CMS_DEPTH = 4                      # Linhas (funções de hash) do Count-Min
+HEAVY_HITTER_CAPACITY = 32         # Candidatos a valor frequente mantidos por coluna
+SKETCH_SAMPLE_VALUES = 15          # Exemplos distintos guardados por coluna (como no modo por consulta)
+HASH_CACHE_SIZE = 4096             # Hashes memorizados por coluna (colunas de baixa cardinalidade repetem valores)
+
+_MASK64 = (1 << 64) - 1
+
+def hash_value(value_str):
+    """Dois hashes de 64 bits de um valor (em texto); o HLL usa o primeiro e o Count-Min combina os dois."""
+    digest = hashlib.blake2b(value_str.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+
+def _pack(typecode, values):
+    return base64.b64encode(zlib.compress(array(typecode, values).tobytes())).decode('ascii')
+
+def _unpack(typecode, data):
+    values = array(typecode)
+    values.frombytes(zlib.decompress(base64.b64decode(data)))
+    return values
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, h):
+        index = h >> (64 - self.precision)
+        rest = (h << self.precision) & _MASK64
+        rank = min(64 - rest.bit_length(), 64 - self.precision) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        z = sum(n * 2.0 ** -r for r, n in enumerate(self.register_histogram()) if n)
+        estimate = alpha * m * m / z
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Faixa pequena: contagem linear é mais precisa
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def register_histogram(self):
+        histogram = [0] * 66
+        for r in self.registers:
+            histogram[r] += 1
+        return histogram
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog com precisões diferentes não podem ser combinados")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def to_dict(self):
+        return {"precision": self.precision, "registers": _pack('B', self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        hll = cls(data["precision"])
+        hll.registers = bytearray(_unpack('B', data["registers"]))
+        return hll
+
+class CountMinSketch:
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+        self.total = 0
+
+    def _indexes(self, h1, h2):
+        # Kirsch-Mitzenmacher: d funções de hash derivadas de duas
+        return [((h1 + i * h2) & _MASK64) % self.width for i in range(self.depth)]
+
+    def add(self, h1, h2, count=1):
+        """Incrementa o valor e devolve a nova estimativa (mínimo entre as linhas)."""
+        self.total += count
+        estimate = None
+        for row, idx in zip(self.rows, self._indexes(h1, h2)):
+            row[idx] += count
+            if estimate is None or row[idx] < estimate:
+                estimate = row[idx]
+        return estimate
+
+    def estimate(self, h1, h2):
+        return min(row[idx] for row, idx in zip(self.rows, self._indexes(h1, h2)))
+
+    def error_bound(self):
+        """Superestimação máxima (com probabilidade 1 - e^-depth) de qualquer contagem."""
+        return int(math.ceil(math.e / self.width * self.total))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min com dimensões diferentes não podem ser combinados")
+        self.rows = [[a + b for a, b in zip(r1, r2)] for r1, r2 in zip(self.rows, other.rows)]
+        self.total += other.total
+
+    def to_dict(self):
+        return {"width": self.width, "depth": self.depth, "total": self.total,
+                "rows": [_pack('Q', row) for row in self.rows]}
+
+    @classmethod
+    def from_dict(cls, data):
+        cms = cls(data["width"], data["depth"])
+        cms.rows = [list(_unpack('Q', row)) for row in data["rows"]]
+        cms.total = data["total"]
+        return cms
+
+class ColumnSketch:
+    """
+    Todos os sketches de uma coluna: nulos (exato), HLL, Count-Min, candidatos a valores
+    frequentes, agregados numéricos (soma, soma dos quadrados, mínimo, máximo) e exemplos.
+    """
+    def __init__(self, numeric=False):
+        self.numeric = numeric
+        self.rows = 0
+        self.null_count = 0
+        self.hll = HyperLogLog()
+        self.cms = CountMinSketch()
+        self.candidates = {}         # valor -> contagem estimada
+        self.candidate_floor = 0     # menor contagem entre os candidatos quando a lista está cheia
+        self.samples = []
+        self.num_count = 0
+        self.num_sum = 0.0
+        self.num_sumsq = 0.0
+        self.num_min = None
+        self.num_max = None
+        self._hash_cache = {}
+
+    def add(self, value, value_str):
+        self.rows += 1
+        if value is None:
+            self.null_count += 1
+            return
+        hashes = self._hash_cache.get(value_str)
+        if hashes is None:
+            if len(self._hash_cache) >= HASH_CACHE_SIZE:
+                self._hash_cache.clear()
+            hashes = self._hash_cache[value_str] = hash_value(value_str)
+        h1, h2 = hashes
+        self.hll.add(h1)
+        estimate = self.cms.add(h1, h2)
+        self._offer(value_str, estimate)
+        if len(self.samples) < SKETCH_SAMPLE_VALUES and value_str not in self.samples:
+            self.samples.append(value_str)
+        if self.numeric:
+            try:
+                x = float(value)
+            except (TypeError, ValueError):
+                return
+            if math.isfinite(x):
+                self.num_count += 1
+                self.num_sum += x
+                self.num_sumsq += x * x
+                self.num_min = x if self.num_min is None else min(self.num_min, x)
+                self.num_max = x if self.num_max is None else max(self.num_max, x)
+
+    def _offer(self, value_str, estimate):
+        candidates = self.candidates
+        if value_str in candidates or len(candidates) < HEAVY_HITTER_CAPACITY:
+            candidates[value_str] = estimate
+            return
+        if estimate <= self.candidate_floor:
+            return
+        # Substitui o candidato de menor contagem e recalcula o piso
+        weakest = min(candidates, key=candidates.get)
+        del candidates[weakest]
+        candidates[value_str] = estimate
+        self.candidate_floor = min(candidates.values())
+
+    def top_values(self, n):
+        """
+        Os n candidatos mais frequentes. Só entram valores cuja contagem estimada supera a
+        superestimação máxima do Count-Min: abaixo disso não há como separá-los de colisões.
+        """
+        floor = self.cms.error_bound()
+        ranked = sorted(self.candidates.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [{'value': v, 'count': int(c)} for v, c in ranked[:n] if c > floor]
+
+    def numeric_stats(self):
+        if self.num_count == 0:
+            return {'avg': None, 'min': None, 'max': None, 'stddev': None}
+        avg = self.num_sum / self.num_count
+        stddev = None
+        if self.num_count > 1:
+            variance = max(0.0, (self.num_sumsq - self.num_count * avg * avg) / (self.num_count - 1))
+            stddev = math.sqrt(variance)
+        return {'avg': avg, 'min': self.num_min, 'max': self.num_max, 'stddev': stddev}
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.null_count += other.null_count
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        # Candidatos das duas partes, reestimados no Count-Min combinado
+        merged = {}
+        for value_str in set(self.candidates) | set(other.candidates):
+            merged[value_str] = self.cms.estimate(*hash_value(value_str))
+        ranked = sorted(merged.items(), key=lambda kv: (-kv[1], kv[0]))[:HEAVY_HITTER_CAPACITY]
+        self.candidates = dict(ranked)
+        self.candidate_floor = min(self.candidates.values()) if len(self.candidates) >= HEAVY_HITTER_CAPACITY else 0
+        for value_str in other.samples:
+            if len(self.samples) < SKETCH_SAMPLE_VALUES and value_str not in self.samples:
+                self.samples.append(value_str)
+        self.num_count += other.num_count
+        self.num_sum += other.num_sum
+        self.num_sumsq += other.num_sumsq
+        for x in (other.num_min, other.num_max):
+            if x is not None:
+                self.num_min = x if self.num_min is None else min(self.num_min, x)
+                self.num_max = x if self.num_max is None else max(self.num_max, x)
+
+    def to_dict(self):
+        return {
+            "numeric": self.numeric,
+            "rows": self.rows,
+            "null_count": self.null_count,
+            "hll": self.hll.to_dict(),
+            "cms": self.cms.to_dict(),
+            "candidates": self.candidates,
+            "samples": self.samples,
+            "numeric_acc": [self.num_count, self.num_sum, self.num_sumsq, self.num_min, self.num_max],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["numeric"])
+        sketch.rows = data["rows"]
+        sketch.null_count = data["null_count"]
+        sketch.hll = HyperLogLog.from_dict(data["hll"])
+        sketch.cms = CountMinSketch.from_dict(data["cms"])
+        sketch.candidates = dict(data["candidates"])
+        if len(sketch.candidates) >= HEAVY_HITTER_CAPACITY:
+            sketch.candidate_floor = min(sketch.candidates.values())
+        sketch.samples = list(data["samples"])
+        sketch.num_count, sketch.num_sum, sketch.num_sumsq, sketch.num_min, sketch.num_max = data["numeric_acc"]
+        return sketch
+
+def sketch_config():
+    """Parâmetros que precisam coincidir para que sketches salvos possam ser combinados."""
+    return {"hll_precision": HLL_PRECISION, "cms_width": CMS_WIDTH, "cms_depth": CMS_DEPTH,
+            "heavy_hitter_capacity": HEAVY_HITTER_CAPACITY}
@@ -1,12 +1,28 @@
 # extract_metadata_advanced.py
 import os
-import pandas as pd
+import csv
+import datetime
+import math
+from decimal import Decimal
 from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 import urllib.parse
 import json
 import re # NOVO: Para análise de padrões
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import sys
+from pathlib import Path
+import metadata_columnar
+import fk_graph
+# common/ fica na raiz do repositório
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from common.json_stream import iter_json_array, StreamingJSONArrayWriter  # noqa: E402
+import column_sketches
 
 # --- Configurações e Conexão (igual ao anterior) ---
 load_dotenv()
@@ -23,13 +39,50 @@ conn_string = f"postgresql://{PG_USER}:{PG_PASS_ENC}@{PG_HOST}:{PG_PORT}/{PG_DB}
 GET_COLUMN_STATS = True      # NOVO: Flag principal para ligar/desligar as estatísticas avançadas
 TOP_N_FREQUENT_VALUES = 5    # Quantos valores mais frequentes buscar (0 para desativar)
 SAMPLE_ROWS = 3              # Reduzido para focar nas estatísticas
+# NOVO: "first" = primeiras linhas na ordem física (LIMIT); "random" = TABLESAMPLE BERNOULLI + ORDER BY random()
+SAMPLE_ROWS_MODE = "first"
+SAMPLE_ROWS_OVERSAMPLE = 20  # No modo "random", o TABLESAMPLE mira SAMPLE_ROWS * este fator linhas antes do sorteio
+SAMPLE_MAX_BINARY_BYTES = 32 # Bytes de colunas binárias (bytea) mantidos em hexadecimal nas amostras
+# NOVO: "single_pass" calcula nulos, distintos e agregados numéricos de TODAS as colunas
+# em uma única consulta por tabela; "per_column" mantém as consultas por coluna (usadas também como fallback);
+# "sketch" lê a tabela uma vez por cursor no servidor e estima distintos/frequentes com HyperLogLog e Count-Min
+PROFILER_MODE = "single_pass"
+SKETCH_BATCH_ROWS = 10_000   # Linhas por lote buscadas do cursor no servidor (modo "sketch")
+SKETCH_STORE = True          # Salva os sketches por tabela para que execuções futuras varram só as linhas novas
+SKETCH_DIR = "metadata_sketches"
+# NOVO: Estatísticas aproximadas via TABLESAMPLE para tabelas grandes
+APPROX_STATS_ROW_THRESHOLD = 1_000_000  # Acima deste row_count usa amostragem (0 para desativar)
+APPROX_SAMPLE_METHOD = "SYSTEM"          # "SYSTEM" (por página, mais rápido) ou "BERNOULLI" (por linha, mais uniforme)
+APPROX_TARGET_SAMPLE_ROWS = 100_000      # Tamanho alvo da amostra (define o percentual amostrado)
+APPROX_SAMPLE_SEED = 42                  # REPEATABLE: todas as consultas da tabela veem a mesma amostra
+# NOVO: Origem das estatísticas: "scan" (consulta as tabelas) ou "catalog" (apenas pg_stats/pg_class, sem varreduras)
+STATS_SOURCE = "scan"
+RUN_ANALYZE = False                      # Executa ANALYZE antes de ler o catálogo (sobrescrito por --analyze)
+# NOVO: Agendador por custo: limita o tempo de cada consulta e escolhe exato/amostra/catálogo por coluna
+COST_AWARE_SCHEDULER = True
+STATEMENT_TIMEOUT_MS = 120_000                   # statement_timeout de cada consulta da tabela (0 desativa)
+EXACT_MAX_RELATION_BYTES = 2 * 1024**3           # pg_relation_size acima disso: colunas usam amostra
+CATALOG_MIN_RELATION_BYTES = 20 * 1024**3        # pg_relation_size acima disso: colunas com pg_stats usam o catálogo
+WIDE_COLUMN_AVG_WIDTH = 512                      # avg_width (bytes) acima disso: COUNT(DISTINCT) exato é caro demais
+ROW_COUNT_SAMPLE_PERCENT = 1                     # COUNT(*) excedeu o tempo e a tabela nunca foi analisada: estima com TABLESAMPLE SYSTEM
+BULK_REFLECTION = True                   # NOVO: Reflete colunas/PK/FK de todas as tabelas em poucas consultas ao pg_catalog
+WORKERS = 1                  # NOVO: Tabelas processadas em paralelo (sobrescrito por --workers N); 1 = serial
 OUTPUT_DIR = "metadata_output_advanced" # NOVO: Pasta de saída diferente
+CONSOLIDATED_FILE = "metadata_advanced_consolidated.json"
+COLUMNAR_OUTPUT = True       # NOVO: Também grava os metadados em Parquet normalizado (requer pyarrow; desligado por --no-columnar)
+COMPACT_JSON = False         # NOVO: JSON consolidado sem indentação, uma tabela por linha (sobrescrito por --compact-json)
+FINGERPRINTS_FILE = "metadata_fingerprints.json"  # NOVO: Impressões digitais por tabela (modo --incremental)
+CHECKPOINT_FILE = "metadata_checkpoint.jsonl"     # NOVO: Uma linha JSON por tabela concluída (modo --resume)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # --- Funções de Conexão e Listagem de Tabelas (iguais ao anterior) ---
-def connect(engine_str):
+def connect(engine_str, workers=1):
     try:
-        engine = create_engine(engine_str)
+        if workers > 1:
+            # Um slot do pool por worker + a conexão principal
+            engine = create_engine(engine_str, pool_size=workers + 1, max_overflow=0, pool_pre_ping=True)
+        else:
+            engine = create_engine(engine_str)
         conn = engine.connect()
         return engine, conn
     except SQLAlchemyError as e:
@@ -43,74 +96,406 @@ def list_tables(inspector):
             continue
         for tbl in inspector.get_table_names(schema=schema):
             tables.append((schema, tbl))
-    return tables
+    # Ordem determinística (schema, tabela): a saída não depende do número de workers
+    return sorted(tables)
+
+def fetch_search_path(conn):
+    """Schemas do search_path da conexão, usados para resolver FKs com referred_schema = None."""
+    with conn.begin():
+        return [row[0] for row in conn.execute(text("SELECT unnest(current_schemas(false))"))]
+
+# --- NOVO: Reflexão em lote (colunas, PKs e FKs de todo o banco em poucas consultas) ---
+# Códigos de ação de FK do pg_constraint -> nomes usados pelo Inspector do SQLAlchemy
+FK_ACTIONS = {'r': 'RESTRICT', 'c': 'CASCADE', 'n': 'SET NULL', 'd': 'SET DEFAULT'}
+FK_MATCH = {'f': 'FULL', 'p': 'PARTIAL'}
+
+def normalize_pg_type(type_str):
+    """
+    Converte a saída de format_type() (ex.: 'character varying(100)', 'numeric(10,2)')
+    para a mesma grafia de str(tipo) do SQLAlchemy (ex.: 'VARCHAR(100)', 'NUMERIC(10, 2)'),
+    para que o campo "type" do JSON não mude entre os modos de reflexão. Tipos que o
+    SQLAlchemy não reconhece (xml, point...) mantêm o nome do Postgres em vez de 'NULL'.
+    """
+    if type_str.endswith('[]'):
+        return 'ARRAY'
+    match = re.match(r'^([a-z ]+?)(?:\(([^)]*)\))?( with(?:out)? time zone)?$', type_str)
+    if not match:
+        return type_str.upper()
+    base, args, tz = match.groups()
+    if base.startswith('interval'):
+        return 'INTERVAL'
+    # O SQLAlchemy não exibe precisão nem fuso em TIMESTAMP/TIME, nem tamanho em BIT
+    if base in ('timestamp', 'time', 'bit', 'bit varying'):
+        return 'BIT' if base.startswith('bit') else base.upper()
+    base = {'character varying': 'VARCHAR', 'character': 'CHAR', 'bpchar': 'CHAR'}.get(base, base.upper())
+    args = f"({', '.join(a.strip() for a in args.split(','))})" if args else ''
+    return f"{base}{args}"
+
+def reflect_schema_bulk(conn):
+    """
+    Lê colunas, chaves primárias e chaves estrangeiras de todos os schemas não-sistema
+    em três consultas ao pg_catalog e monta, em memória, os mesmos dicionários que o
+    Inspector devolveria por tabela. Retorna {(schema, tabela): {"columns", "primary_key", "foreign_keys"}}.
+    """
+    schema_filter = "n.nspname NOT LIKE 'pg\\_%' AND n.nspname <> 'information_schema'"
+    q_columns = text(f"""
+        SELECT n.nspname AS schema_name, c.relname AS table_name, a.attname AS column_name,
+               format_type(a.atttypid, a.atttypmod) AS data_type,
+               NOT a.attnotnull AS nullable,
+               pg_get_expr(d.adbin, d.adrelid) AS column_default
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE c.relkind IN ('r', 'p') AND a.attnum > 0 AND NOT a.attisdropped AND {schema_filter}
+        ORDER BY n.nspname, c.relname, a.attnum
+    """)
+    q_pks = text(f"""
+        SELECT n.nspname AS schema_name, c.relname AS table_name, con.conname,
+               ARRAY(SELECT a.attname::text
+                     FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                     JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                     ORDER BY k.ord) AS constrained_columns
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE con.contype = 'p' AND {schema_filter}
+    """)
+    q_fks = text(f"""
+        SELECT n.nspname AS schema_name, c.relname AS table_name, con.conname,
+               rn.nspname AS referred_schema, rc.relname AS referred_table,
+               pg_table_is_visible(rc.oid) AS referred_visible,
+               obj_description(con.oid, 'pg_constraint') AS comment,
+               con.confupdtype, con.confdeltype, con.condeferrable, con.condeferred, con.confmatchtype,
+               ARRAY(SELECT a.attname::text
+                     FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                     JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                     ORDER BY k.ord) AS constrained_columns,
+               ARRAY(SELECT a.attname::text
+                     FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, ord)
+                     JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                     ORDER BY k.ord) AS referred_columns
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_class rc ON rc.oid = con.confrelid
+        JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+        WHERE con.contype = 'f' AND {schema_filter}
+        ORDER BY n.nspname, c.relname, con.conname
+    """)
+
+    def entry(key):
+        return reflected.setdefault(key, {"columns": [], "primary_key": [], "foreign_keys": []})
+
+    reflected = {}
+    with conn.begin():
+        for row in conn.execute(q_columns):
+            entry((row.schema_name, row.table_name))["columns"].append({
+                "name": row.column_name,
+                "type": normalize_pg_type(row.data_type),
+                "nullable": row.nullable,
+                "default": row.column_default,
+            })
+        for row in conn.execute(q_pks):
+            entry((row.schema_name, row.table_name))["primary_key"] = list(row.constrained_columns)
+        for row in conn.execute(q_fks):
+            options = {}
+            if row.confupdtype in FK_ACTIONS:
+                options["onupdate"] = FK_ACTIONS[row.confupdtype]
+            if row.confdeltype in FK_ACTIONS:
+                options["ondelete"] = FK_ACTIONS[row.confdeltype]
+            if row.condeferrable:
+                options["deferrable"] = True
+                options["initially"] = "DEFERRED" if row.condeferred else "IMMEDIATE"
+            if row.confmatchtype in FK_MATCH:
+                options["match"] = FK_MATCH[row.confmatchtype]
+            # Mesma regra do Inspector: schema visível no search_path vira None,
+            # exceto quando é o próprio schema da tabela de origem
+            referred_schema = row.referred_schema
+            if row.referred_visible and referred_schema != row.schema_name:
+                referred_schema = None
+            entry((row.schema_name, row.table_name))["foreign_keys"].append({
+                "name": row.conname,
+                "constrained_columns": list(row.constrained_columns),
+                "referred_schema": referred_schema,
+                "referred_table": row.referred_table,
+                "referred_columns": list(row.referred_columns),
+                "options": options,
+                "comment": row.comment,
+            })
+    return reflected
+
+class BulkInspector:
+    """
+    Substituto somente-leitura do Inspector do SQLAlchemy, alimentado por reflect_schema_bulk.
+    Expõe apenas os métodos usados neste script; como não faz I/O, pode ser
+    compartilhado entre os workers.
+    """
+
+    def __init__(self, conn):
+        self.tables = reflect_schema_bulk(conn)
+
+    def get_schema_names(self):
+        return sorted({schema for schema, _ in self.tables})
+
+    def get_table_names(self, schema=None):
+        return sorted(table for s, table in self.tables if s == schema)
+
+    def get_columns(self, table, schema=None):
+        return self.tables.get((schema, table), {}).get("columns", [])
+
+    def get_pk_constraint(self, table, schema=None):
+        return {"constrained_columns": self.tables.get((schema, table), {}).get("primary_key", [])}
+
+    def get_foreign_keys(self, table, schema=None):
+        return self.tables.get((schema, table), {}).get("foreign_keys", [])
+
+def quote_ident(name):
+    """Coloca um identificador entre aspas duplas, escapando aspas internas."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def is_numeric_type(col_type_str):
+    """Indica se o tipo (em maiúsculas) recebe estatísticas numéricas (AVG/MIN/MAX/STDDEV)."""
+    if any(t in col_type_str for t in ['INTERVAL', 'POINT']):
+        return False
+    return any(t in col_type_str for t in ['INT', 'BIGINT', 'NUMERIC', 'DECIMAL', 'REAL', 'DOUBLE'])
+
+def choose_table_sampling(row_count):
+    """
+    Decide se a tabela usa estatísticas aproximadas. Devolve None (estatística exata)
+    ou um dicionário com método, percentual e semente do TABLESAMPLE.
+    """
+    if APPROX_STATS_ROW_THRESHOLD <= 0 or row_count <= APPROX_STATS_ROW_THRESHOLD:
+        return None
+    return build_table_sampling(row_count)
+
+def build_table_sampling(row_count):
+    """Parâmetros do TABLESAMPLE para atingir ~APPROX_TARGET_SAMPLE_ROWS linhas."""
+    percent = min(100.0, max(0.0001, APPROX_TARGET_SAMPLE_ROWS * 100.0 / row_count))
+    return {
+        "method": APPROX_SAMPLE_METHOD.upper(),
+        "sample_percent": round(percent, 6),
+        "seed": APPROX_SAMPLE_SEED,
+    }
+
+def table_source_sql(schema, table, sampling=None):
+    """Cláusula FROM da tabela, com TABLESAMPLE quando houver amostragem."""
+    source = f"{quote_ident(schema)}.{quote_ident(table)}"
+    if sampling:
+        source += (f" TABLESAMPLE {sampling['method']} ({sampling['sample_percent']:.6f})"
+                   f" REPEATABLE ({int(sampling['seed'])})")
+    return source
+
+def approximation_info(stats, sampling):
+    """
+    Informações de confiança de uma coluna calculada sobre amostra: fração amostrada e
+    margem de erro (IC 95%, aproximação normal) do percentual de nulos, em pontos percentuais.
+    Em SYSTEM a amostra é por página, então a margem real tende a ser maior (efeito de conglomerado).
+    """
+    n = sampling["sample_rows"]
+    p = stats.get('null_percentage', 0) / 100.0
+    margin = 1.96 * ((p * (1 - p)) / n) ** 0.5 * 100 if n > 0 else None
+    return {
+        "method": sampling["method"],
+        "sample_percent": sampling["sample_percent"],
+        "sample_rows": n,
+        "confidence_level": 0.95,
+        "null_percentage_margin": round(margin, 4) if margin is not None else None,
+        "null_count_scope": "amostra",
+        "distinct_count_scope": "amostra",
+        "frequent_values_count_scope": "extrapolado para a tabela",
+    }
+
+def prepare_table_sampling(conn, schema, table, row_count):
+    """
+    Monta a amostragem da tabela e conta as linhas efetivamente amostradas.
+    Devolve None se o TABLESAMPLE falhar ou a amostra vier vazia.
+    """
+    sampling = build_table_sampling(row_count)
+    try:
+        q_sample_count = text(f"SELECT COUNT(*) FROM {table_source_sql(schema, table, sampling)}")
+        with conn.begin_nested():
+            sampling["sample_rows"] = int(conn.execute(q_sample_count).scalar())
+        sampling["total_rows"] = row_count
+    except Exception as e:
+        print(f"  - Aviso: TABLESAMPLE falhou em {schema}.{table}: {str(e).splitlines()[0][:150]}")
+        return None
+    if sampling["sample_rows"] == 0:
+        return None
+    print(f"  - Estatísticas aproximadas ({sampling['method']} {sampling['sample_percent']}%, "
+          f"{sampling['sample_rows']} linhas amostradas)")
+    return sampling
+
+def _to_float(value):
+    return float(value) if value is not None else None
+
+# Tipos sem operador de igualdade: COUNT(DISTINCT) falharia e derrubaria a consulta inteira
+SINGLE_PASS_UNSUPPORTED_TYPES = ('JSON', 'XML')
+
+def supports_single_pass(column_info):
+    col_type_str = str(column_info["type"]).upper()
+    if 'JSONB' in col_type_str:
+        return True
+    return not any(t in col_type_str for t in SINGLE_PASS_UNSUPPORTED_TYPES)
+
+def build_single_pass_query(schema, table, cols_info, sampling=None):
+    """
+    Gera UMA consulta agregada que calcula, para todas as colunas da tabela,
+    contagem de nulos, contagem de distintos e (para colunas numéricas) AVG/MIN/MAX/STDDEV.
+    Os aliases seguem o padrão c<índice>_<métrica>.
+    """
+    select_parts = ["COUNT(*) AS total_rows"]
+    for idx, col_info in enumerate(cols_info):
+        col = quote_ident(col_info["name"])
+        select_parts.append(f"COUNT(*) FILTER (WHERE {col} IS NULL) AS c{idx}_null_count")
+        select_parts.append(f"COUNT(DISTINCT {col}) AS c{idx}_distinct_count")
+        if is_numeric_type(str(col_info["type"]).upper()):
+            select_parts.append(f"AVG({col}) AS c{idx}_avg_val")
+            select_parts.append(f"MIN({col}) AS c{idx}_min_val")
+            select_parts.append(f"MAX({col}) AS c{idx}_max_val")
+            select_parts.append(f"STDDEV({col}) AS c{idx}_stddev_val")
+    select_sql = ",\n    ".join(select_parts)
+    return f"SELECT\n    {select_sql}\nFROM {table_source_sql(schema, table, sampling)}"
+
+def get_table_single_pass_stats(conn, schema, table, cols_info, row_count, sampling=None):
+    """
+    Executa a consulta agregada de passada única e devolve um dicionário
+    {nome_coluna: stats_base} com null_count, distinct_count, null_percentage e numeric_stats.
+    Colunas de tipos não suportados ficam de fora (serão tratadas pelo caminho por coluna).
+    Lança a exceção original se a consulta falhar, para que o chamador use o fallback.
+    Com `sampling`, a consulta roda sobre o TABLESAMPLE e `row_count` deve ser o tamanho da amostra.
+    """
+    supported = [c for c in cols_info if supports_single_pass(c)]
+    if not supported:
+        return {}
+
+    q_single = text(build_single_pass_query(schema, table, supported, sampling))
+    # SAVEPOINT: uma falha aqui não pode abortar a transação da tabela inteira
+    with conn.begin_nested():
+        result = conn.execute(q_single).first()._mapping
+    return parse_single_pass_result(result, supported, row_count)
+
+def parse_single_pass_result(result, cols_info, row_count):
+    """Converte a linha da consulta de passada única (mapeamento alias -> valor) em {coluna: stats_base}."""
+    base_stats = {}
+    for idx, col_info in enumerate(cols_info):
+        stats = {}
+        stats['null_count'] = int(result[f"c{idx}_null_count"])
+        stats['distinct_count'] = int(result[f"c{idx}_distinct_count"])
+        stats['null_percentage'] = round((stats['null_count'] / row_count) * 100, 2) if row_count > 0 else 0
+        if is_numeric_type(str(col_info["type"]).upper()):
+            stats['numeric_stats'] = {
+                'avg': _to_float(result[f"c{idx}_avg_val"]),
+                'min': _to_float(result[f"c{idx}_min_val"]),
+                'max': _to_float(result[f"c{idx}_max_val"]),
+                'stddev': _to_float(result[f"c{idx}_stddev_val"]),
+            }
+        base_stats[col_info["name"]] = stats
+    return base_stats
+
+def build_frequent_values_query(schema, table, col_name, sampling=None):
+    """Os TOP_N_FREQUENT_VALUES valores mais frequentes (não nulos) de uma coluna."""
+    col = quote_ident(col_name)
+    return f"""
+        SELECT {col}, COUNT(*) as frequency
+        FROM {table_source_sql(schema, table, sampling)}
+        WHERE {col} IS NOT NULL
+        GROUP BY {col}
+        ORDER BY frequency DESC
+        LIMIT {TOP_N_FREQUENT_VALUES}
+    """
+
+def build_sample_values_query(schema, table, col_name, sampling=None):
+    """Até 15 valores distintos não nulos de uma coluna (exemplos reais)."""
+    col = quote_ident(col_name)
+    return f"""
+        SELECT DISTINCT {col}
+        FROM {table_source_sql(schema, table, sampling)}
+        WHERE {col} IS NOT NULL
+        LIMIT 15
+    """
+
+def get_column_base_stats(conn, schema, table, column_info, row_count, stats=None, sampling=None):
+    """Caminho por coluna (fallback): nulos/distintos e agregados numéricos em consultas separadas."""
+    col = quote_ident(column_info["name"])
+    col_type_str = str(column_info["type"]).upper()
+    stats = {} if stats is None else stats
+    source = table_source_sql(schema, table, sampling)
+
+    # 1. Contagem de Nulos e Distintos
+    q_stats = text(f"""
+        SELECT
+            COUNT(*) FILTER (WHERE {col} IS NULL) AS null_count,
+            COUNT(DISTINCT {col}) AS distinct_count
+        FROM {source}
+    """)
+    result = conn.execute(q_stats).first()
+    stats['null_count'] = int(result.null_count)
+    stats['distinct_count'] = int(result.distinct_count)
+    stats['null_percentage'] = round((stats['null_count'] / row_count) * 100, 2) if row_count > 0 else 0
+
+    # 2. Estatísticas para colunas numéricas
+    if is_numeric_type(col_type_str):
+        q_numeric = text(f"""
+            SELECT
+                AVG({col}) AS avg_val,
+                MIN({col}) AS min_val,
+                MAX({col}) AS max_val,
+                STDDEV({col}) AS stddev_val
+            FROM {source}
+        """)
+        num_result = conn.execute(q_numeric).first()
+        stats['numeric_stats'] = {
+            'avg': float(num_result.avg_val) if num_result.avg_val is not None else None,
+            'min': float(num_result.min_val) if num_result.min_val is not None else None,
+            'max': float(num_result.max_val) if num_result.max_val is not None else None,
+            'stddev': float(num_result.stddev_val) if num_result.stddev_val is not None else None,
+        }
+
+    return stats
 
 # NOVO: Função para extrair estatísticas avançadas de uma coluna
-def get_column_advanced_stats(conn, schema, table, column_info, row_count):
+def get_column_advanced_stats(conn, schema, table, column_info, row_count, base_stats=None, sampling=None,
+                              raise_timeouts=False):
+    """
+    Estatísticas avançadas de uma coluna. Se `base_stats` vier do profiler de passada única,
+    as etapas 1 e 2 (nulos/distintos e agregados numéricos) não são refeitas.
+    Com `sampling`, todas as consultas usam o TABLESAMPLE e `row_count` é o tamanho da amostra.
+    Com `raise_timeouts`, um statement_timeout é propagado para o agendador trocar de estratégia.
+    """
     col_name = column_info["name"]
-    col_type_str = str(column_info["type"]).upper()
-    stats = {}
+    stats = dict(base_stats) if base_stats else {}
+    # Fator para extrapolar contagens da amostra para a tabela inteira
+    scale = sampling["total_rows"] / sampling["sample_rows"] if sampling else 1
 
     # Ignorar colunas com muitos nulos ou tabelas vazias para otimizar
     if row_count == 0:
         return {"error": "Tabela vazia"}
 
     try:
-        # 1. Contagem de Nulos e Distintos
-        q_stats = text(f"""
-            SELECT
-                COUNT(*) FILTER (WHERE "{col_name}" IS NULL) AS null_count,
-                COUNT(DISTINCT "{col_name}") AS distinct_count
-            FROM "{schema}"."{table}"
-        """)
-        result = conn.execute(q_stats).first()
-        stats['null_count'] = int(result.null_count)
-        stats['distinct_count'] = int(result.distinct_count)
-        stats['null_percentage'] = round((stats['null_count'] / row_count) * 100, 2) if row_count > 0 else 0
+        # SAVEPOINT: um erro (ou timeout) nesta coluna não aborta a transação da tabela
+        with conn.begin_nested():
+            # 1 e 2. Nulos/distintos e agregados numéricos (por coluna, só se a passada única não os trouxe)
+            if not base_stats:
+                get_column_base_stats(conn, schema, table, column_info, row_count, stats, sampling)
 
-        # 2. Estatísticas para colunas numéricas
-        if any(t in col_type_str for t in ['INT', 'BIGINT', 'NUMERIC', 'DECIMAL', 'REAL', 'DOUBLE']):
-            q_numeric = text(f"""
-                SELECT
-                    AVG("{col_name}") AS avg_val,
-                    MIN("{col_name}") AS min_val,
-                    MAX("{col_name}") AS max_val,
-                    STDDEV("{col_name}") AS stddev_val
-                FROM "{schema}"."{table}"
-            """)
-            num_result = conn.execute(q_numeric).first()
-            stats['numeric_stats'] = {
-                'avg': float(num_result.avg_val) if num_result.avg_val is not None else None,
-                'min': float(num_result.min_val) if num_result.min_val is not None else None,
-                'max': float(num_result.max_val) if num_result.max_val is not None else None,
-                'stddev': float(num_result.stddev_val) if num_result.stddev_val is not None else None,
-            }
+            # 3. Valores mais frequentes para colunas de texto/categoria
+            if TOP_N_FREQUENT_VALUES > 0 and stats['distinct_count'] < row_count: # Otimização
+                 q_freq = text(build_frequent_values_query(schema, table, col_name, sampling))
+                 freq_result = conn.execute(q_freq).fetchall()
+                 stats['frequent_values'] = [{'value': value_to_str(row[0]), 'count': int(round(row[1] * scale))} for row in freq_result]
 
-        # 3. Valores mais frequentes para colunas de texto/categoria
-        if TOP_N_FREQUENT_VALUES > 0 and stats['distinct_count'] < row_count: # Otimização
-             q_freq = text(f"""
-                SELECT "{col_name}", COUNT(*) as frequency
-                FROM "{schema}"."{table}"
-                WHERE "{col_name}" IS NOT NULL
-                GROUP BY "{col_name}"
-                ORDER BY frequency DESC
-                LIMIT {TOP_N_FREQUENT_VALUES}
-            """)
-             freq_result = conn.execute(q_freq).fetchall()
-             stats['frequent_values'] = [{'value': str(row[0]), 'count': int(row[1])} for row in freq_result]
-
-        # 4. NOVO: 15 primeiros valores não-nulos (exemplos reais)
-        # Busca os primeiros 15 valores distintos que não são NULL
-        q_sample = text(f"""
-            SELECT DISTINCT "{col_name}"
-            FROM "{schema}"."{table}"
-            WHERE "{col_name}" IS NOT NULL
-            LIMIT 15
-        """)
-        sample_result = conn.execute(q_sample).fetchall()
-        stats['sample_values'] = [str(row[0]) for row in sample_result]
+            # 4. NOVO: 15 primeiros valores não-nulos (exemplos reais)
+            q_sample = text(build_sample_values_query(schema, table, col_name, sampling))
+            sample_result = conn.execute(q_sample).fetchall()
+            stats['sample_values'] = [value_to_str(row[0]) for row in sample_result]
+
+            if sampling:
+                stats['approximation'] = approximation_info(stats, sampling)
 
     except Exception as e:
+        if raise_timeouts and is_statement_timeout(e):
+            raise
         # Usar regex para simplificar a mensagem de erro, que pode ser longa
         error_message = str(e).split('\n')[0]
         if len(error_message) > 150:
@@ -120,19 +505,590 @@ def get_column_advanced_stats(conn, schema, table, column_info, row_count):
 
     return stats
 
+# --- NOVO: Estatísticas a partir do catálogo (pg_stats / pg_class) ---
+def parse_pg_array(value):
+    """
+    Converte o literal texto de um array do Postgres ('{a,"b c",NULL}') em lista Python.
+    Usado para most_common_vals/histogram_bounds, que são do tipo anyarray.
+    Arrays aninhados são devolvidos como listas aninhadas.
+    """
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+
+    def parse(s, i):
+        # s[i] == '{'
+        items, i = [], i + 1
+        while i < len(s):
+            ch = s[i]
+            if ch == '}':
+                return items, i + 1
+            if ch == ',':
+                i += 1
+                continue
+            if ch == '{':
+                sub, i = parse(s, i)
+                items.append(sub)
+            elif ch == '"':
+                buf, i = [], i + 1
+                while s[i] != '"':
+                    if s[i] == '\\':
+                        i += 1
+                    buf.append(s[i])
+                    i += 1
+                items.append(''.join(buf))
+                i += 1
+            else:
+                j = i
+                while s[j] not in ',}':
+                    j += 1
+                token = s[i:j]
+                items.append(None if token == 'NULL' else token)
+                i = j
+        return items, i
+
+    value = value.strip()
+    if not value.startswith('{'):
+        return [value]
+    return parse(value, 0)[0]
+
+# Campos de pg_stats usados por build_catalog_column_stats (anyarray convertido para texto)
+PG_STATS_FIELDS = """inherited, null_frac, n_distinct, avg_width,
+               most_common_vals::text AS most_common_vals, most_common_freqs,
+               histogram_bounds::text AS histogram_bounds"""
+
+def harvest_catalog_stats(conn, run_analyze=False):
+    """
+    Lê, em consultas em lote para o banco inteiro, as estatísticas mantidas pelo Postgres:
+    reltuples (pg_class) e null_frac/n_distinct/most_common_vals/most_common_freqs/histogram_bounds (pg_stats).
+    Devolve {"row_counts": {(schema, tabela): n}, "columns": {(schema, tabela): {coluna: linha_pg_stats}}}.
+    """
+    if run_analyze:
+        print("Executando ANALYZE no banco (pode levar alguns minutos)...")
+        with conn.begin():
+            conn.execute(text("ANALYZE"))
+
+    q_tables = text("""
+        SELECT n.nspname AS schema_name, c.relname AS table_name, c.reltuples AS reltuples
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p')
+          AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+          AND n.nspname NOT LIKE 'pg_toast%'
+    """)
+    q_columns = text(f"""
+        SELECT schemaname AS schema_name, tablename AS table_name, attname AS column_name,
+               {PG_STATS_FIELDS}
+        FROM pg_stats
+        WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+        ORDER BY schemaname, tablename, attname, inherited
+    """)
+
+    catalog = {"row_counts": {}, "columns": {}}
+    with conn.begin():
+        for row in conn.execute(q_tables):
+            catalog["row_counts"][(row.schema_name, row.table_name)] = float(row.reltuples)
+        for row in conn.execute(q_columns):
+            table_cols = catalog["columns"].setdefault((row.schema_name, row.table_name), {})
+            # Preferir a linha não herdada (inherited = false vem primeiro); tabelas particionadas só têm a herdada
+            table_cols.setdefault(row.column_name, row._asdict())
+    print(f"Catálogo: {len(catalog['row_counts'])} tabelas e "
+          f"{sum(len(c) for c in catalog['columns'].values())} colunas com estatísticas.")
+    return catalog
+
+def build_catalog_column_stats(pg_row, col_type_str, row_count):
+    """Preenche o mesmo esquema de `stats` do modo "scan" a partir de uma linha de pg_stats."""
+    if pg_row is None:
+        return {"error": "Sem estatísticas em pg_stats (execute ANALYZE)", "source": "pg_stats"}
+
+    stats = {}
+    null_frac = float(pg_row["null_frac"] or 0)
+    n_distinct = float(pg_row["n_distinct"] or 0)
+    stats['null_count'] = int(round(null_frac * row_count))
+    # n_distinct negativo = fração do número de linhas
+    stats['distinct_count'] = int(round(-n_distinct * row_count)) if n_distinct < 0 else int(n_distinct)
+    stats['null_percentage'] = round(null_frac * 100, 2)
+
+    mcv = parse_pg_array(pg_row["most_common_vals"])
+    mcf = list(pg_row["most_common_freqs"] or [])
+    histogram = parse_pg_array(pg_row["histogram_bounds"])
+
+    if is_numeric_type(col_type_str):
+        numeric_values = []
+        for v in mcv + histogram:
+            try:
+                numeric_values.append(float(v))
+            except (TypeError, ValueError):
+                pass
+        # AVG/STDDEV não existem no catálogo; MIN/MAX vêm dos limites do histograma e dos MCVs
+        stats['numeric_stats'] = {
+            'avg': None,
+            'min': min(numeric_values) if numeric_values else None,
+            'max': max(numeric_values) if numeric_values else None,
+            'stddev': None,
+        }
+
+    if TOP_N_FREQUENT_VALUES > 0 and mcv:
+        stats['frequent_values'] = [
+            {'value': str(v), 'count': int(round(float(f) * row_count))}
+            for v, f in list(zip(mcv, mcf))[:TOP_N_FREQUENT_VALUES]
+        ]
+
+    sample_values = []
+    for v in mcv + histogram:
+        if v is not None and str(v) not in sample_values:
+            sample_values.append(str(v))
+        if len(sample_values) >= 15:
+            break
+    stats['sample_values'] = sample_values
+    stats['source'] = "pg_stats"
+    stats['strategy'] = "catalog"
+    return stats
+
+# --- NOVO: Agendador por custo (statement_timeout + escolha exato/amostra/catálogo por coluna) ---
+def is_statement_timeout(e):
+    """True se a exceção veio de um cancelamento por statement_timeout (SQLSTATE 57014)."""
+    return getattr(getattr(e, 'orig', None), 'pgcode', None) == '57014'
+
+def apply_statement_timeout(conn):
+    """SET LOCAL vale até o fim da transação da tabela e limita CADA consulta individualmente."""
+    if STATEMENT_TIMEOUT_MS > 0:
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(STATEMENT_TIMEOUT_MS)}"))
+
+ROW_COUNT_UNKNOWN = (-1, "desconhecido (COUNT(*) excedeu o tempo limite)")
+
+def build_row_count_sample_query(schema, table):
+    """COUNT(*) sobre uma amostra de blocos, para estimar o row_count de uma tabela nunca analisada."""
+    return (f"SELECT COUNT(*) FROM {quote_ident(schema)}.{quote_ident(table)} "
+            f"TABLESAMPLE SYSTEM ({ROW_COUNT_SAMPLE_PERCENT})")
+
+def row_count_from_reltuples(reltuples):
+    """(row_count, origem) a partir de pg_class.reltuples; None se a tabela nunca foi analisada
+    (-1, ou 0 antes do PostgreSQL 14)."""
+    if reltuples is None or reltuples <= 0:
+        return None
+    return int(round(reltuples)), "pg_class.reltuples (COUNT(*) excedeu o tempo limite)"
+
+def row_count_from_sample(sampled):
+    """(row_count, origem) escalando a contagem de build_row_count_sample_query; None se a amostra veio vazia."""
+    if not sampled:
+        return None
+    return (int(sampled * 100 / ROW_COUNT_SAMPLE_PERCENT),
+            f"TABLESAMPLE SYSTEM ({ROW_COUNT_SAMPLE_PERCENT}%) (COUNT(*) excedeu o tempo limite)")
+
+def estimate_row_count(conn, schema, table):
+    """
+    Estimativa de linhas para quando o COUNT(*) excede o tempo limite: reltuples do planejador ou,
+    se a tabela nunca foi analisada, COUNT(*) de uma amostra de blocos escalado.
+    Devolve (row_count, origem). Sem estimativa devolve ROW_COUNT_UNKNOWN (-1), nunca 0: a
+    etapa 2 descartaria como vazia uma tabela que só é lenta demais para contar.
+    """
+    fqname = f"{quote_ident(schema)}.{quote_ident(table)}"
+    try:
+        with conn.begin_nested():
+            q_estimate = text("SELECT reltuples FROM pg_class WHERE oid = CAST(:fqname AS regclass)")
+            estimate = row_count_from_reltuples(conn.execute(q_estimate, {"fqname": fqname}).scalar())
+        if estimate is None:
+            with conn.begin_nested():
+                estimate = row_count_from_sample(conn.execute(text(build_row_count_sample_query(schema, table))).scalar())
+        if estimate is not None:
+            return estimate
+    except Exception as e:
+        print(f"  - Aviso: estimativa de linhas falhou em {schema}.{table}: {str(e).splitlines()[0][:150]}")
+    return ROW_COUNT_UNKNOWN
+
+def fetch_table_cost_info(conn, schema, table):
+    """Tamanho da tabela (pg_relation_size) e linhas de pg_stats de suas colunas."""
+    fqname = f"{quote_ident(schema)}.{quote_ident(table)}"
+    q_size = text("SELECT pg_relation_size(CAST(:fqname AS regclass))")
+    q_stats = text(f"""
+        SELECT attname AS column_name, {PG_STATS_FIELDS}
+        FROM pg_stats
+        WHERE schemaname = :schema AND tablename = :table
+        ORDER BY attname, inherited
+    """)
+    cost_info = {"relation_bytes": None, "columns": {}}
+    try:
+        with conn.begin_nested():
+            cost_info["relation_bytes"] = int(conn.execute(q_size, {"fqname": fqname}).scalar() or 0)
+            for row in conn.execute(q_stats, {"schema": schema, "table": table}):
+                cost_info["columns"].setdefault(row.column_name, row._asdict())
+    except Exception as e:
+        print(f"  - Aviso: não foi possível estimar o custo de {schema}.{table}: {str(e).splitlines()[0][:150]}")
+    return cost_info
+
+def plan_column_strategies(cols_info, row_count, cost_info):
+    """
+    Lista ordenada de estratégias candidatas por coluna; a primeira é a planejada e as
+    seguintes são usadas, em ordem, quando uma consulta excede o statement_timeout.
+      exact   -> consultas sobre a tabela inteira
+      sampled -> consultas sobre TABLESAMPLE
+      catalog -> pg_stats, sem consultar a tabela
+    """
+    relation_bytes = cost_info["relation_bytes"] or 0
+    large_by_rows = choose_table_sampling(row_count) is not None
+    plan = {}
+    for col_info in cols_info:
+        pg_row = cost_info["columns"].get(col_info["name"])
+        avg_width = pg_row["avg_width"] if pg_row else None
+        if not COST_AWARE_SCHEDULER:
+            planned = "sampled" if large_by_rows else "exact"
+        elif pg_row and relation_bytes > CATALOG_MIN_RELATION_BYTES:
+            planned = "catalog"
+        elif large_by_rows or relation_bytes > EXACT_MAX_RELATION_BYTES:
+            planned = "sampled"
+        elif avg_width and avg_width > WIDE_COLUMN_AVG_WIDTH and row_count > APPROX_TARGET_SAMPLE_ROWS:
+            planned = "sampled"
+        else:
+            planned = "exact"
+        order = {"exact": ["exact", "sampled", "catalog"],
+                 "sampled": ["sampled", "catalog", "exact"],
+                 "catalog": ["catalog"]}[planned]
+        plan[col_info["name"]] = [st for st in order if st != "catalog" or pg_row]
+    return plan
+
+def profile_table_columns(conn, schema, table, cols_info, row_count, meta):
+    """
+    Calcula as estatísticas de todas as colunas seguindo o plano do agendador:
+    uma passada única por estratégia (exata e amostrada), depois frequentes/exemplos por coluna.
+    Timeouts rebaixam a coluna para a próxima estratégia. Devolve {coluna: stats}, com
+    stats['strategy'] indicando a estratégia efetivamente usada.
+    """
+    fullname = f"{schema}.{table}"
+    cost_info = fetch_table_cost_info(conn, schema, table)
+    plan = plan_column_strategies(cols_info, row_count, cost_info)
+    fallback_reason = {}
+    sampling_cache = {}
+
+    def current(name):
+        return plan[name][0] if plan[name] else None
+
+    def downgrade(name, reason):
+        plan[name].pop(0)
+        fallback_reason[name] = reason
+
+    def get_sampling():
+        if "value" not in sampling_cache:
+            sampling_cache["value"] = prepare_table_sampling(conn, schema, table, row_count)
+        if sampling_cache["value"] is None:
+            # Sem amostra possível: remove a estratégia de todas as colunas
+            for name in plan:
+                if current(name) == "sampled":
+                    downgrade(name, "tablesample_indisponivel")
+                elif "sampled" in plan[name]:
+                    plan[name].remove("sampled")
+        return sampling_cache["value"]
 
-def extract_table_metadata(inspector, conn, schema, table):
+    # 1. Passada única por estratégia (a exata primeiro: colunas que estourarem o tempo vão para a amostrada)
+    base_stats = {"exact": {}, "sampled": {}}
+    for strategy in ("exact", "sampled"):
+        if PROFILER_MODE == "per_column":
+            break
+        if strategy == "sampled" and any(current(n) == "sampled" for n in plan) and get_sampling() is None:
+            continue
+        group = [c for c in cols_info if current(c["name"]) == strategy]
+        if not group:
+            continue
+        sampling = sampling_cache.get("value") if strategy == "sampled" else None
+        group_row_count = sampling["sample_rows"] if sampling else row_count
+        try:
+            base_stats[strategy] = get_table_single_pass_stats(conn, schema, table, group, group_row_count, sampling)
+        except Exception as e:
+            error_message = str(e).split('\n')[0][:150]
+            if is_statement_timeout(e):
+                print(f"  - Aviso: passada única ({strategy}) excedeu o tempo limite em {fullname}, rebaixando colunas")
+                for c in group:
+                    downgrade(c["name"], "statement_timeout")
+            else:
+                print(f"  - Aviso: passada única falhou em {fullname}, usando consultas por coluna: {error_message}")
+
+    # 2. Estatísticas por coluna, rebaixando a estratégia em caso de timeout
+    results = {}
+    for col_info in cols_info:
+        name = col_info["name"]
+        while True:
+            strategy = current(name)
+            if strategy is None:
+                stats = {"error": "Falha ao analisar coluna: tempo limite excedido em todas as estratégias"}
+                break
+            if strategy == "catalog":
+                stats = build_catalog_column_stats(cost_info["columns"].get(name),
+                                                   str(col_info["type"]).upper(), row_count)
+                break
+            sampling = None
+            if strategy == "sampled":
+                sampling = get_sampling()
+                if sampling is None:
+                    continue
+            try:
+                stats = get_column_advanced_stats(conn, schema, table, col_info,
+                                                  sampling["sample_rows"] if sampling else row_count,
+                                                  base_stats=base_stats[strategy].get(name),
+                                                  sampling=sampling, raise_timeouts=True)
+                break
+            except Exception as e:
+                downgrade(name, "statement_timeout" if is_statement_timeout(e) else "erro")
+        stats['strategy'] = strategy
+        if name in fallback_reason:
+            stats['strategy_fallback_reason'] = fallback_reason[name]
+        results[name] = stats
+
+    sampling = sampling_cache.get("value")
+    if sampling:
+        meta["stats_sampling"] = {
+            "method": sampling["method"],
+            "sample_percent": sampling["sample_percent"],
+            "sample_rows": sampling["sample_rows"],
+            "seed": sampling["seed"],
+        }
+    used = [st.get('strategy') for st in results.values()]
+    meta["stats_plan"] = {
+        "relation_bytes": cost_info["relation_bytes"],
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+        "strategies": {st: used.count(st) for st in ("exact", "sampled", "catalog") if st in used},
+    }
+    return results
+
+
+# --- NOVO: Perfil por sketches (PROFILER_MODE = "sketch") ---
+def sketch_path(schema, table):
+    name = f"{urllib.parse.quote(schema, safe='')}.{urllib.parse.quote(table, safe='')}.json"
+    return os.path.join(OUTPUT_DIR, SKETCH_DIR, name)
+
+def fetch_table_write_activity(conn, schema, table):
+    """Atualizações e remoções acumuladas (pg_stat_user_tables); None se a tabela não tiver entrada."""
+    q_activity = text("""
+        SELECT n_tup_upd, n_tup_del FROM pg_stat_user_tables
+        WHERE schemaname = :schema AND relname = :table
+    """)
+    row = conn.execute(q_activity, {"schema": schema, "table": table}).first()
+    return [int(row.n_tup_upd), int(row.n_tup_del)] if row else None
+
+def load_mergeable_sketch(path, columns_signature, watermark_column, activity):
+    """
+    Sketch salvo que pode receber só as linhas novas: mesma configuração, mesmas colunas,
+    coluna de marca d'água (PK inteira crescente, como as de sequence) e nenhuma atualização/remoção desde a varredura
+    (HyperLogLog e Count-Min não suportam remoções).
+    """
+    if not (SKETCH_STORE and watermark_column and activity and os.path.exists(path)):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (stored.get("config") != column_sketches.sketch_config()
+            or stored.get("columns") != columns_signature
+            or stored.get("watermark_column") != watermark_column
+            or stored.get("write_activity") != activity
+            or stored.get("watermark") is None):
+        return None
+    return stored
+
+def profile_table_sketches(conn, schema, table, cols_info, primary_key, meta):
+    """
+    Uma única leitura da tabela por cursor no servidor (lotes de SKETCH_BATCH_ROWS), alimentando
+    os sketches de todas as colunas ao mesmo tempo: memória limitada independentemente do tamanho.
+    Com um sketch salvo combinável, lê só as linhas com PK acima da marca d'água e combina.
+    Devolve {coluna: stats} ou None se a leitura falhar (o chamador usa o agendador por consultas).
+    """
+    fullname = f"{schema}.{table}"
+    columns_signature = [[c["name"], str(c["type"])] for c in cols_info]
+    watermark_column = None
+    if len(primary_key) == 1:
+        pk_info = next((c for c in cols_info if c["name"] == primary_key[0]), None)
+        if pk_info and 'INT' in str(pk_info["type"]).upper():
+            watermark_column = primary_key[0]
+    path = sketch_path(schema, table)
+
+    try:
+        with conn.begin_nested():
+            activity = fetch_table_write_activity(conn, schema, table)
+    except Exception:
+        activity = None
+    stored = load_mergeable_sketch(path, columns_signature, watermark_column, activity)
+
+    sketches = [column_sketches.ColumnSketch(numeric=is_numeric_type(str(c["type"]).upper())) for c in cols_info]
+    select_cols = ", ".join(quote_ident(c["name"]) for c in cols_info)
+    sql = f"SELECT {select_cols} FROM {quote_ident(schema)}.{quote_ident(table)}"
+    params = {}
+    if stored:
+        sql += f" WHERE {quote_ident(watermark_column)} > :watermark"
+        params["watermark"] = stored["watermark"]
+    watermark_idx = [c["name"] for c in cols_info].index(watermark_column) if watermark_column else None
+    watermark = stored["watermark"] if stored else None
+
+    scanned = 0
+    try:
+        with conn.begin_nested():
+            q_stream = text(sql).execution_options(stream_results=True, yield_per=SKETCH_BATCH_ROWS)
+            result = conn.execute(q_stream, params)
+            for batch in result.partitions(SKETCH_BATCH_ROWS):
+                for row in batch:
+                    for sketch, value in zip(sketches, row):
+                        sketch.add(value, value_to_str(value) if value is not None else None)
+                    if watermark_idx is not None and row[watermark_idx] is not None:
+                        if watermark is None or row[watermark_idx] > watermark:
+                            watermark = row[watermark_idx]
+                scanned += len(batch)
+    except Exception as e:
+        print(f"  - Aviso: perfil por sketches falhou em {fullname}, usando consultas: {str(e).splitlines()[0][:150]}")
+        return None
+
+    if stored:
+        for sketch, c in zip(sketches, cols_info):
+            sketch.merge(column_sketches.ColumnSketch.from_dict(stored["sketches"][c["name"]]))
+
+    if SKETCH_STORE:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "schema": schema,
+                "table_name": table,
+                "config": column_sketches.sketch_config(),
+                "columns": columns_signature,
+                "watermark_column": watermark_column,
+                "watermark": watermark,
+                "write_activity": activity,
+                "sketches": {c["name"]: sk.to_dict() for c, sk in zip(cols_info, sketches)},
+            }, f, default=str)
+
+    results = {}
+    for col_info, sketch in zip(cols_info, sketches):
+        total = sketch.rows
+        non_null = total - sketch.null_count
+        stats = {
+            'null_count': sketch.null_count,
+            'distinct_count': min(sketch.hll.count(), non_null),
+            'null_percentage': round((sketch.null_count / total) * 100, 2) if total > 0 else 0,
+        }
+        if sketch.numeric:
+            stats['numeric_stats'] = sketch.numeric_stats()
+        top_values = sketch.top_values(TOP_N_FREQUENT_VALUES) if TOP_N_FREQUENT_VALUES > 0 else []
+        if top_values and stats['distinct_count'] < total:
+            stats['frequent_values'] = top_values
+        stats['sample_values'] = list(sketch.samples)
+        stats['sketch'] = {
+            "distinct_relative_error": round(sketch.hll.relative_error(), 4),
+            "frequent_values_max_overcount": sketch.cms.error_bound(),
+        }
+        stats['strategy'] = "sketch"
+        results[col_info["name"]] = stats
+
+    meta["stats_sketch"] = {
+        "rows_scanned": scanned,
+        "rows_merged": sketches[0].rows - scanned if sketches else 0,
+        "watermark_column": watermark_column,
+        "incremental": stored is not None,
+    }
+    meta["stats_plan"] = {
+        "relation_bytes": None,
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+        "strategies": {"sketch": len(results)},
+    }
+    if stored:
+        print(f"  - Sketches combinados: {scanned} linhas novas + {meta['stats_sketch']['rows_merged']} já resumidas")
+    return results
+
+# --- NOVO: Amostra de linhas sem pandas (leitura direta do cursor) ---
+def serialize_value(value):
+    """
+    Converte um valor devolvido pelo driver em um valor serializável em JSON:
+    Decimal -> float, datas/horas -> texto, binários -> hexadecimal (truncado), NaN/Infinito -> texto.
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float):
+        return value if math.isfinite(value) else str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return binary_to_str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): serialize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize_value(v) for v in value]
+    return str(value)
+
+def binary_to_str(value):
+    """bytea no formato hexadecimal do Postgres (\\x...), limitado a SAMPLE_MAX_BINARY_BYTES."""
+    data = bytes(value)
+    text_value = "\\x" + data[:SAMPLE_MAX_BINARY_BYTES].hex()
+    return text_value + f"... ({len(data)} bytes)" if len(data) > SAMPLE_MAX_BINARY_BYTES else text_value
+
+def value_to_str(value):
+    """Texto usado em frequent_values/sample_values (binários em hexadecimal em vez da repr do driver)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return binary_to_str(value)
+    return str(value)
+
+def build_sample_rows_query(schema, table, row_count, limit):
+    """
+    Consulta da amostra de linhas. No modo "random" as linhas vêm de um TABLESAMPLE BERNOULLI
+    (por linha, sem o viés da ordem física das páginas) sorteadas com ORDER BY random().
+    """
+    source = f"{quote_ident(schema)}.{quote_ident(table)}"
+    if SAMPLE_ROWS_MODE == "random":
+        percent = min(100.0, max(0.0001, limit * SAMPLE_ROWS_OVERSAMPLE * 100.0 / max(row_count, 1)))
+        if percent < 100.0:
+            source += f" TABLESAMPLE BERNOULLI ({percent:.6f})"
+        return f"SELECT * FROM {source} ORDER BY random() LIMIT {int(limit)}"
+    return f"SELECT * FROM {source} LIMIT {int(limit)}"
+
+def fetch_sample_rows(conn, schema, table, row_count):
+    """Busca até SAMPLE_ROWS linhas direto do cursor, já convertidas por serialize_value."""
+    if SAMPLE_ROWS <= 0 or row_count <= 0:
+        return []
+    try:
+        q_rows = text(build_sample_rows_query(schema, table, row_count, SAMPLE_ROWS))
+        with conn.begin_nested():
+            result = conn.execute(q_rows)
+            columns = list(result.keys())
+            return [{c: serialize_value(v) for c, v in zip(columns, row)} for row in result.fetchall()]
+    except Exception as e:
+        return [{"error": f"Erro ao obter amostra: {e}"}]
+
+def write_summary_csv(path, summaries):
+    """Grava o resumo por tabela (somente tabelas sem erro) em CSV."""
+    fields = ["schema", "table", "row_count", "column_count", "pk"]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for sm in summaries:
+            if sm["ok"]:
+                writer.writerow(sm)
+
+
+def extract_table_metadata(inspector, conn, schema, table, catalog_stats=None):
     meta = {"schema": schema, "table_name": table}
     fullname = f"{schema}.{table}"
 
+    # NOVO: Limite de tempo para cada consulta desta tabela
+    apply_statement_timeout(conn)
+
     # Contagem de linhas (feito primeiro para otimizar o resto)
     row_count = 0
-    try:
-        q_count = text(f'SELECT COUNT(*) FROM "{schema}"."{table}"')
-        row_count = conn.execute(q_count).scalar()
-    except Exception as e:
-        print(f"Erro COUNT(*) em {fullname}: {e}")
-        row_count = -1
+    reltuples = catalog_stats["row_counts"].get((schema, table), -1) if catalog_stats else -1
+    if reltuples >= 0:
+        # Modo catálogo: estimativa de pg_class.reltuples (sem COUNT(*))
+        row_count = int(round(reltuples))
+        meta["row_count_source"] = "pg_class.reltuples"
+    else:
+        # reltuples = -1: tabela nunca analisada, então a contagem exata é necessária
+        try:
+            q_count = text(f'SELECT COUNT(*) FROM {quote_ident(schema)}.{quote_ident(table)}')
+            with conn.begin_nested():
+                row_count = conn.execute(q_count).scalar()
+        except Exception as e:
+            if is_statement_timeout(e):
+                # COUNT(*) estourou o tempo: usa uma estimativa (-1 se não houver nenhuma)
+                row_count, meta["row_count_source"] = estimate_row_count(conn, schema, table)
+            else:
+                print(f"Erro COUNT(*) em {fullname}: {e}")
+                row_count = -1
     meta["row_count"] = row_count
 
     # Metadados básicos (colunas, PK, FK)
@@ -140,6 +1096,15 @@ def extract_table_metadata(inspector, conn, schema, table):
     meta["primary_key"] = inspector.get_pk_constraint(table, schema=schema).get("constrained_columns", [])
     meta["foreign_keys"] = inspector.get_foreign_keys(table, schema=schema)
     
+    # NOVO: Estatísticas por coluna via agendador por custo (exato / amostra / catálogo)
+    column_stats = {}
+    if GET_COLUMN_STATS and row_count > 0 and not catalog_stats:
+        column_stats = None
+        if PROFILER_MODE == "sketch":
+            column_stats = profile_table_sketches(conn, schema, table, cols_info, meta["primary_key"], meta)
+        if column_stats is None:
+            column_stats = profile_table_columns(conn, schema, table, cols_info, row_count, meta)
+
     # Loop principal para colunas
     processed_columns = []
     for col_info in cols_info:
@@ -149,29 +1114,235 @@ def extract_table_metadata(inspector, conn, schema, table):
             "nullable": col_info.get("nullable", True)
         }
         # Adiciona estatísticas avançadas se a flag estiver ligada
-        if GET_COLUMN_STATS and row_count > 0:
-            advanced_stats = get_column_advanced_stats(conn, schema, table, col_info, row_count)
-            col_data['stats'] = advanced_stats
+        if GET_COLUMN_STATS and row_count > 0 and catalog_stats:
+            pg_row = catalog_stats["columns"].get((schema, table), {}).get(col_info["name"])
+            col_data['stats'] = build_catalog_column_stats(pg_row, str(col_info["type"]).upper(), row_count)
+        elif GET_COLUMN_STATS and row_count > 0:
+            col_data['stats'] = column_stats[col_info["name"]]
         
         processed_columns.append(col_data)
     
     meta["columns"] = processed_columns
 
     # Amostra de linhas
-    if SAMPLE_ROWS > 0 and row_count > 0:
-        try:
-            qs = text(f'SELECT * FROM "{schema}"."{table}" LIMIT :lim')
-            sample_df = pd.read_sql(qs, conn, params={"lim": SAMPLE_ROWS})
-            meta["sample_rows"] = sample_df.to_dict(orient='records')
-        except Exception as e:
-            meta["sample_rows"] = [{"error": f"Erro ao obter amostra: {e}"}]
-    else:
-        meta["sample_rows"] = []
+    meta["sample_rows"] = fetch_sample_rows(conn, schema, table, row_count)
 
     return meta
 
+# --- NOVO: Extração incremental (reaproveita tabelas cuja impressão digital não mudou) ---
+def profiling_config_signature(stats_source):
+    """Parâmetros que alteram o conteúdo extraído: se mudarem, todas as tabelas são refeitas."""
+    return {
+        "stats_source": stats_source,
+        "get_column_stats": GET_COLUMN_STATS,
+        "profiler_mode": PROFILER_MODE,
+        "top_n_frequent_values": TOP_N_FREQUENT_VALUES,
+        "sample_rows": SAMPLE_ROWS,
+        "sample_rows_mode": SAMPLE_ROWS_MODE,
+        "approx_stats_row_threshold": APPROX_STATS_ROW_THRESHOLD,
+        "approx_sample_method": APPROX_SAMPLE_METHOD,
+        "approx_target_sample_rows": APPROX_TARGET_SAMPLE_ROWS,
+        "approx_sample_seed": APPROX_SAMPLE_SEED,
+        "cost_aware_scheduler": COST_AWARE_SCHEDULER,
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+        "exact_max_relation_bytes": EXACT_MAX_RELATION_BYTES,
+        "catalog_min_relation_bytes": CATALOG_MIN_RELATION_BYTES,
+        "wide_column_avg_width": WIDE_COLUMN_AVG_WIDTH,
+    }
+
+def collect_table_fingerprints(conn, inspector, tables, stats_source):
+    """
+    Calcula uma impressão digital por tabela a partir de pg_stat_user_tables
+    (n_tup_ins/upd/del, último ANALYZE), do hash da lista de colunas e da configuração
+    de extração. Tabelas sem entrada em pg_stat_user_tables ficam sem impressão (sempre refeitas).
+    """
+    q_activity = text("""
+        SELECT schemaname AS schema_name, relname AS table_name,
+               n_tup_ins, n_tup_upd, n_tup_del, last_analyze, last_autoanalyze
+        FROM pg_stat_user_tables
+    """)
+    with conn.begin():
+        activity = {(row.schema_name, row.table_name): row._asdict() for row in conn.execute(q_activity)}
+
+    config = profiling_config_signature(stats_source)
+    fingerprints = {}
+    for schema, table in tables:
+        row = activity.get((schema, table))
+        if row is None:
+            continue
+        columns = [[c["name"], str(c["type"]), c.get("nullable", True)]
+                   for c in inspector.get_columns(table, schema=schema)]
+        details = {
+            "n_tup_ins": row["n_tup_ins"],
+            "n_tup_upd": row["n_tup_upd"],
+            "n_tup_del": row["n_tup_del"],
+            "last_analyze": str(row["last_analyze"]) if row["last_analyze"] else None,
+            "last_autoanalyze": str(row["last_autoanalyze"]) if row["last_autoanalyze"] else None,
+            "columns_hash": hashlib.sha256(json.dumps(columns).encode('utf-8')).hexdigest(),
+            "config": config,
+        }
+        digest = hashlib.sha256(json.dumps(details, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        fingerprints[f"{schema}.{table}"] = {"fingerprint": digest, "details": details}
+    return fingerprints
+
+def copy_reusable_metadata(json_path, fingerprints_path, fingerprints, checkpoint_path, index):
+    """
+    Percorre a saída consolidada anterior uma tabela por vez e copia para o checkpoint as tabelas
+    cuja impressão digital atual é igual à registrada na execução anterior. Como nas tabelas
+    retomadas, só o offset e o resumo entram em `index`: na gravação final elas são relidas do
+    checkpoint uma a uma, e o pico de memória continua sendo uma tabela.
+    Devolve o número de tabelas reaproveitadas.
+    """
+    if not (os.path.exists(json_path) and os.path.exists(fingerprints_path)):
+        print("Modo incremental: nenhuma execução anterior encontrada, extraindo todas as tabelas.")
+        return 0
+    with open(fingerprints_path, 'r', encoding='utf-8') as f:
+        previous_fingerprints = json.load(f)
+
+    reused = 0
+    with open(checkpoint_path, 'ab') as checkpoint:
+        for m in iter_json_array(json_path):
+            key = (m.get('schema'), m.get('table_name'))
+            fp_key = f"{key[0]}.{key[1]}"
+            if key in index or 'error' in m or fp_key not in fingerprints or fp_key not in previous_fingerprints:
+                continue
+            if fingerprints[fp_key]["fingerprint"] != previous_fingerprints[fp_key]["fingerprint"]:
+                continue
+            # Sem fsync por tabela: são cópias da execução anterior, que continua no disco até o fim
+            offset = checkpoint.tell()
+            checkpoint.write((json.dumps(m, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+            index[key] = {"offset": offset, "summary": table_summary(m)}
+            reused += 1
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+    return reused
+
+def save_fingerprints(fingerprints_path, fingerprints, ok_tables):
+    """Grava as impressões digitais apenas das tabelas extraídas sem erro (as com erro serão refeitas)."""
+    to_save = {k: v for k, v in fingerprints.items() if k in ok_tables}
+    with open(fingerprints_path, 'w', encoding='utf-8') as f:
+        json.dump(to_save, f, indent=2, ensure_ascii=False, sort_keys=True)
+    print(f"Impressões digitais salvas em: {fingerprints_path}")
+
+# --- NOVO: Checkpoint por tabela (JSONL append-only) e compactação final ---
+def table_summary(m):
+    """Resumo pequeno de uma tabela: é tudo o que fica em memória depois que ela é gravada no checkpoint."""
+    return {
+        "schema": m.get("schema"),
+        "table": m.get("table_name"),
+        "row_count": m.get("row_count"),
+        "column_count": len(m.get("columns", [])),
+        "pk": "|".join(m.get("primary_key", [])),
+        "ok": 'error' not in m,
+    }
+
+def load_checkpoint(checkpoint_path):
+    """
+    Lê o checkpoint linha a linha e devolve {(schema, tabela): {"offset", "summary"}} (a última
+    ocorrência de cada tabela vence). Uma última linha incompleta, deixada por uma queda no meio
+    da escrita, é descartada e o arquivo é truncado no último registro válido.
+    """
+    index = {}
+    valid_end = 0
+    with open(checkpoint_path, 'rb') as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                m = json.loads(line)
+            except ValueError:
+                break
+            index[(m.get("schema"), m.get("table_name"))] = {"offset": offset, "summary": table_summary(m)}
+            valid_end = f.tell()
+    if valid_end < os.path.getsize(checkpoint_path):
+        print(f"Aviso: descartando registro incompleto no fim de {checkpoint_path}")
+        with open(checkpoint_path, 'r+b') as f:
+            f.truncate(valid_end)
+    return index
+
+def append_checkpoint(f, m):
+    """Acrescenta uma tabela ao checkpoint e força a gravação em disco; devolve o offset da linha."""
+    offset = f.tell()
+    f.write((json.dumps(m, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+    f.flush()
+    os.fsync(f.fileno())
+    return offset
+
+def read_checkpoint_entry(src, offset):
+    """Lê do checkpoint (aberto em 'rb') a tabela gravada no offset indicado."""
+    src.seek(offset)
+    return json.loads(src.readline())
+
+def extract_table_safely(inspector, conn, schema, table, catalog_stats=None):
+    """Extrai uma tabela em sua própria transação; em caso de falha devolve um registro de erro."""
+    try:
+        # Usar uma transação por tabela para garantir consistência
+        with conn.begin():
+            return extract_table_metadata(inspector, conn, schema, table, catalog_stats)
+    except Exception as e:
+        print(f"  -> ERRO FATAL ao processar a tabela {schema}.{table}: {e}")
+        # Adiciona um registro de erro para não perder o rastro
+        return {"schema": schema, "table_name": table, "error": str(e)}
+
+def process_table_pooled(engine, inspector, schema, table, position, total, catalog_stats=None):
+    """
+    Worker: usa uma conexão própria do pool do engine. O BulkInspector é compartilhado;
+    o Inspector do SQLAlchemy não, então cada worker cria um ligado à sua conexão.
+    """
+    print(f"Processando Tabela {position}/{total}: {schema}.{table} ...")
+    with engine.connect() as worker_conn:
+        worker_inspector = inspector if isinstance(inspector, BulkInspector) else inspect(worker_conn)
+        return extract_table_safely(worker_inspector, worker_conn, schema, table, catalog_stats)
+
+def iter_tables_metadata(engine, conn, inspector, tables, workers=1, catalog_stats=None):
+    """
+    Gera os metadados das tabelas SEMPRE na ordem de `tables` (schema/tabela).
+    Com workers > 1 as tabelas são distribuídas em um pool de threads, cada uma
+    com sua conexão do pool do SQLAlchemy; executor.map preserva a ordem de entrada.
+    """
+    total = len(tables)
+
+    def process(item):
+        i, (schema, table) = item
+        if workers <= 1:
+            print(f"Processando Tabela {i+1}/{total}: {schema}.{table} ...")
+            return extract_table_safely(inspector, conn, schema, table, catalog_stats)
+        return process_table_pooled(engine, inspector, schema, table, i + 1, total, catalog_stats)
+
+    if workers <= 1:
+        for item in enumerate(tables):
+            yield process(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures_results = executor.map(process, enumerate(tables))
+        for m in futures_results:
+            yield m
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extração avançada de metadados do PostgreSQL")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="Número de tabelas extraídas em paralelo, cada uma com sua conexão do pool (padrão: %(default)s)")
+    parser.add_argument("--stats-source", choices=["scan", "catalog"], default=STATS_SOURCE,
+                        help="scan = consulta as tabelas; catalog = apenas pg_stats/pg_class (padrão: %(default)s)")
+    parser.add_argument("--analyze", action="store_true", default=RUN_ANALYZE,
+                        help="Executa ANALYZE antes de ler o catálogo (apenas com --stats-source catalog)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reextrai apenas tabelas cuja impressão digital mudou desde a última execução")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma uma execução interrompida, pulando as tabelas já gravadas no checkpoint")
+    parser.add_argument("--no-columnar", dest="columnar", action="store_false", default=COLUMNAR_OUTPUT,
+                        help="Não gera a saída colunar (Parquet) além do JSON consolidado")
+    parser.add_argument("--compact-json", action="store_true", default=COMPACT_JSON,
+                        help="Grava o JSON consolidado sem indentação, uma tabela por linha")
+    return parser.parse_args()
+
 def main():
-    engine, conn = connect(conn_string)
+    args = parse_args()
+    workers = max(1, args.workers)
+    engine, conn = connect(conn_string, workers)
 
     with engine.connect() as c:
         print("URL:", engine.url)  # mostra host/porta/db usados
@@ -180,43 +1351,87 @@ def main():
         print(c.execute(text('select count(*) from "public"."tb_dado_recebido_info_instalac"')).scalar())
 
 
-    inspector = inspect(engine)
-    tables = list_tables(inspector)
-    print(f"Encontradas {len(tables)} tabelas. Iniciando extração avançada...")
-
-    all_metadata = []
-    for i, (schema, table) in enumerate(tables):
-        print(f"Processando Tabela {i+1}/{len(tables)}: {schema}.{table} ...")
+    inspector = None
+    if BULK_REFLECTION:
         try:
-            # Usar uma transação por tabela para garantir consistência
-            with conn.begin():
-                m = extract_table_metadata(inspector, conn, schema, table)
-                all_metadata.append(m)
+            inspector = BulkInspector(conn)
+            print(f"Reflexão em lote: {len(inspector.tables)} tabelas carregadas do pg_catalog.")
         except Exception as e:
-            print(f"  -> ERRO FATAL ao processar a tabela {schema}.{table}: {e}")
-            # Adiciona um registro de erro para não perder o rastro
-            all_metadata.append({"schema": schema, "table_name": table, "error": str(e)})
+            print(f"Aviso: reflexão em lote falhou, usando o Inspector por tabela: {e}")
+    if inspector is None:
+        inspector = inspect(engine)
+    tables = list_tables(inspector)
+    print(f"Encontradas {len(tables)} tabelas. Iniciando extração avançada (workers: {workers})...")
+
+    catalog_stats = None
+    if args.stats_source == "catalog":
+        catalog_stats = harvest_catalog_stats(conn, run_analyze=args.analyze)
+
+    json_path = os.path.join(OUTPUT_DIR, CONSOLIDATED_FILE)
+    fingerprints_path = os.path.join(OUTPUT_DIR, FINGERPRINTS_FILE)
+    fingerprints = collect_table_fingerprints(conn, inspector, tables, args.stats_source)
+
+    # Checkpoint: cada tabela concluída vai para o JSONL; só o índice (offset + resumo) fica em memória
+    checkpoint_path = os.path.join(OUTPUT_DIR, CHECKPOINT_FILE)
+    index = {}
+    if args.resume and os.path.exists(checkpoint_path):
+        # Tabelas com erro são refeitas na retomada
+        index = {k: v for k, v in load_checkpoint(checkpoint_path).items() if v["summary"]["ok"]}
+        print(f"Retomando: {len(index)} tabelas já concluídas no checkpoint serão puladas.")
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if args.incremental:
+        # Tabelas inalteradas vão da saída anterior para o checkpoint, sem consultar o banco
+        reused = copy_reusable_metadata(json_path, fingerprints_path, fingerprints, checkpoint_path, index)
+        print(f"Modo incremental: {reused} de {len(tables)} tabelas inalteradas serão reaproveitadas.")
+    pending = [t for t in tables if t not in index]
+
+    # O JSON consolidado é escrito em streaming, na ordem schema/tabela, em um arquivo ".partial"
+    # (legível durante a execução); só ao final ele substitui o consolidado da execução anterior
+    partial_path = json_path + ".partial"
+    columnar = None
+    if args.columnar:
+        if metadata_columnar.pa is None:
+            print("Aviso: pyarrow não encontrado, saída colunar (Parquet) desativada. Instale com: pip install pyarrow")
+        else:
+            columnar = metadata_columnar.ColumnarMetadataWriter(os.path.join(OUTPUT_DIR, metadata_columnar.COLUMNAR_DIR))
+    fk_builder = fk_graph.FKGraphBuilder(fetch_search_path(conn))
+    results = iter_tables_metadata(engine, conn, inspector, pending, workers, catalog_stats)
+    with open(checkpoint_path, 'ab') as checkpoint, open(checkpoint_path, 'rb') as src, \
+            StreamingJSONArrayWriter(partial_path, compact=args.compact_json) as writer:
+        for key in tables:
+            if key in index:
+                # Tabela retomada ou reaproveitada (--incremental): relida do checkpoint, uma por vez
+                m = read_checkpoint_entry(src, index[key]["offset"])
+            else:
+                m = next(results)
+                offset = append_checkpoint(checkpoint, m)
+                index[key] = {"offset": offset, "summary": table_summary(m)}
+            writer.write(m)
+            if columnar:
+                columnar.write(m)
+            fk_builder.add_table(m)
 
     print("\nProcessamento concluído. Salvando arquivos consolidados...")
-    
-    # Salvar o arquivo JSON completo
-    json_path = os.path.join(OUTPUT_DIR, "metadata_advanced_consolidated.json")
-    with open(json_path, 'w', encoding='utf-8') as f:
-        # Usar um conversor padrão para lidar com tipos de dados não serializáveis (ex: Decimal)
-        json.dump(all_metadata, f, indent=2, ensure_ascii=False, default=str)
-    print(f"Metadados avançados salvos em: {json_path}")
-
-    # Salvar o DataFrame de resumo
-    summary_list = [{
-        "schema": m.get("schema"),
-        "table": m.get("table_name"),
-        "row_count": m.get("row_count"),
-        "column_count": len(m.get("columns", [])),
-        "pk": "|".join(m.get("primary_key", []))
-    } for m in all_metadata if 'error' not in m]
-    summary_df = pd.DataFrame(summary_list)
+
+    os.replace(partial_path, json_path)
+    print(f"Metadados avançados salvos em: {json_path} ({writer.written} tabelas)")
+    if columnar:
+        columnar.close()
+        print(f"Metadados colunares (Parquet) salvos em: {columnar.output_dir}")
+    fk_path = os.path.join(OUTPUT_DIR, fk_graph.FK_GRAPH_FILE)
+    fk_index = fk_builder.save(fk_path)
+    print(f"Grafo de FKs salvo em: {fk_path} ({fk_index['edge_count']} FKs, "
+          f"{len(fk_index['components'])} componentes)")
+    os.remove(checkpoint_path)
+
+    summaries = [index[t]["summary"] for t in tables if t in index]
+    save_fingerprints(fingerprints_path, fingerprints,
+                      {f"{sm['schema']}.{sm['table']}" for sm in summaries if sm["ok"]})
+
+    # Salvar o resumo
     summary_path = os.path.join(OUTPUT_DIR, "tables_summary_advanced.csv")
-    summary_df.to_csv(summary_path, index=False)
+    write_summary_csv(summary_path, summaries)
     print(f"Resumo avançado salvo em: {summary_path}")
 
     conn.close()
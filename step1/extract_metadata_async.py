@@ -0,0 +1,420 @@
+# extract_metadata_async.py
+# NOVO: Backend assíncrono (asyncpg) para a extração avançada de metadados.
+# As consultas de estatísticas por tabela e por coluna são disparadas concorrentemente sobre um
+# pool asyncpg, em vez de uma a uma: a latência de rede até o Postgres deixa de ser paga em série.
+# Gera os mesmos arquivos do extract_metadata.py (JSON consolidado + resumo CSV) e reaproveita
+# seus geradores de SQL, o agendador por custo e a reflexão em lote.
+# Não suporta --stats-source catalog, --incremental nem --resume (use o script síncrono).
+import os
+import asyncio
+import argparse
+from collections import deque
+import asyncpg
+
+from extract_metadata import (
+    conn_string, connect, list_tables, fetch_search_path, BulkInspector, table_summary, StreamingJSONArrayWriter, write_summary_csv,
+    quote_ident, table_source_sql, build_table_sampling, approximation_info,
+    supports_single_pass, build_single_pass_query, parse_single_pass_result,
+    build_frequent_values_query, build_sample_values_query, build_sample_rows_query, serialize_value, value_to_str,
+    PG_STATS_FIELDS, plan_column_strategies, build_catalog_column_stats,
+    build_row_count_sample_query, row_count_from_reltuples, row_count_from_sample, ROW_COUNT_UNKNOWN,
+    GET_COLUMN_STATS, TOP_N_FREQUENT_VALUES, SAMPLE_ROWS, PROFILER_MODE, STATEMENT_TIMEOUT_MS,
+    OUTPUT_DIR, CONSOLIDATED_FILE, COLUMNAR_OUTPUT,
+)
+import metadata_columnar
+import fk_graph
+
+# --- Flags de Controle ---
+ASYNC_DB_CONCURRENCY = 8        # Consultas simultâneas no banco inteiro (também é o tamanho do pool)
+ASYNC_TABLE_CONCURRENCY = 4     # Consultas simultâneas de uma mesma tabela (evita que uma tabela larga ocupe o pool)
+ASYNC_TABLES_IN_FLIGHT = 4      # Tabelas processadas ao mesmo tempo
+ASYNC_PENDING_TABLES = 16       # Tabelas iniciadas e ainda não gravadas (com uma tabela lenta na frente, as
+                                # seguintes esperam prontas na memória até este limite; nunca menos que as em voo)
+
+
+class AsyncQueryRunner:
+    """
+    Executa consultas no pool asyncpg respeitando dois semáforos limitados:
+    um global (banco) e um por tabela, recebido a cada chamada.
+    O statement_timeout é configurado nas conexões do pool e vale para cada consulta.
+    """
+    def __init__(self, pool, db_concurrency, table_concurrency):
+        self.pool = pool
+        self.db_semaphore = asyncio.BoundedSemaphore(db_concurrency)
+        self.table_concurrency = table_concurrency
+
+    def table_semaphore(self):
+        return asyncio.BoundedSemaphore(self.table_concurrency)
+
+    async def fetch(self, table_semaphore, sql, *args):
+        async with table_semaphore, self.db_semaphore:
+            async with self.pool.acquire() as con:
+                return await con.fetch(sql, *args)
+
+    async def fetchrow(self, table_semaphore, sql, *args):
+        rows = await self.fetch(table_semaphore, sql, *args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, table_semaphore, sql, *args):
+        row = await self.fetchrow(table_semaphore, sql, *args)
+        return row[0] if row else None
+
+
+def is_statement_timeout(e):
+    """True se a consulta foi cancelada por statement_timeout (SQLSTATE 57014)."""
+    return getattr(e, 'sqlstate', None) == '57014'
+
+def short_error(e):
+    error_message = str(e).split('\n')[0]
+    return error_message[:150] + "..." if len(error_message) > 150 else error_message
+
+
+async def estimate_row_count(runner, sem, schema, table):
+    """Mesma cadeia de extract_metadata.estimate_row_count: reltuples, amostra de blocos ou -1 (nunca 0)."""
+    fqname = f"{quote_ident(schema)}.{quote_ident(table)}"
+    try:
+        estimate = row_count_from_reltuples(await runner.fetchval(
+            sem, "SELECT reltuples FROM pg_class WHERE oid = CAST($1 AS regclass)", fqname))
+        if estimate is None:
+            estimate = row_count_from_sample(await runner.fetchval(sem, build_row_count_sample_query(schema, table)))
+        if estimate is not None:
+            return estimate
+    except Exception as e:
+        print(f"  - Aviso: estimativa de linhas falhou em {schema}.{table}: {short_error(e)}")
+    return ROW_COUNT_UNKNOWN
+
+async def fetch_table_cost_info(runner, sem, schema, table):
+    """Mesmo formato de extract_metadata.fetch_table_cost_info, com as duas consultas em paralelo."""
+    fqname = f"{quote_ident(schema)}.{quote_ident(table)}"
+    q_stats = f"""
+        SELECT attname AS column_name, {PG_STATS_FIELDS}
+        FROM pg_stats
+        WHERE schemaname = $1 AND tablename = $2
+        ORDER BY attname, inherited
+    """
+    cost_info = {"relation_bytes": None, "columns": {}}
+    try:
+        size, rows = await asyncio.gather(
+            runner.fetchval(sem, "SELECT pg_relation_size(CAST($1 AS regclass))", fqname),
+            runner.fetch(sem, q_stats, schema, table),
+        )
+        cost_info["relation_bytes"] = int(size or 0)
+        for row in rows:
+            cost_info["columns"].setdefault(row["column_name"], dict(row))
+    except Exception as e:
+        print(f"  - Aviso: não foi possível estimar o custo de {schema}.{table}: {short_error(e)}")
+    return cost_info
+
+async def prepare_table_sampling(runner, sem, schema, table, row_count):
+    """Monta a amostragem e conta as linhas amostradas; None se o TABLESAMPLE falhar ou vier vazio."""
+    sampling = build_table_sampling(row_count)
+    try:
+        sampling["sample_rows"] = int(await runner.fetchval(
+            sem, f"SELECT COUNT(*) FROM {table_source_sql(schema, table, sampling)}"))
+        sampling["total_rows"] = row_count
+    except Exception as e:
+        print(f"  - Aviso: TABLESAMPLE falhou em {schema}.{table}: {short_error(e)}")
+        return None
+    if sampling["sample_rows"] == 0:
+        return None
+    print(f"  - Estatísticas aproximadas em {schema}.{table} ({sampling['method']} {sampling['sample_percent']}%, "
+          f"{sampling['sample_rows']} linhas amostradas)")
+    return sampling
+
+async def get_column_advanced_stats(runner, sem, schema, table, col_info, row_count, base_stats=None, sampling=None):
+    """
+    Equivalente assíncrono de extract_metadata.get_column_advanced_stats: as consultas de valores
+    frequentes e de exemplos rodam concorrentemente. Timeouts são propagados ao agendador.
+    """
+    col_name = col_info["name"]
+    stats = dict(base_stats) if base_stats else {}
+    scale = sampling["total_rows"] / sampling["sample_rows"] if sampling else 1
+    if row_count == 0:
+        return {"error": "Tabela vazia"}
+
+    async def frequent():
+        # Mesma otimização do script síncrono: coluna sem repetições não tem valores frequentes
+        if TOP_N_FREQUENT_VALUES > 0 and stats['distinct_count'] < row_count:
+            return await runner.fetch(sem, build_frequent_values_query(schema, table, col_name, sampling))
+        return None
+
+    try:
+        if not base_stats:
+            # Caminho por coluna: a consulta de passada única restrita a esta coluna
+            row = await runner.fetchrow(sem, build_single_pass_query(schema, table, [col_info], sampling))
+            stats.update(parse_single_pass_result(row, [col_info], row_count)[col_name])
+        freq_result, sample_result = await asyncio.gather(
+            frequent(), runner.fetch(sem, build_sample_values_query(schema, table, col_name, sampling)))
+        if freq_result is not None:
+            stats['frequent_values'] = [{'value': value_to_str(row[0]), 'count': int(round(row[1] * scale))} for row in freq_result]
+        stats['sample_values'] = [value_to_str(row[0]) for row in sample_result]
+        if sampling:
+            stats['approximation'] = approximation_info(stats, sampling)
+    except Exception as e:
+        if is_statement_timeout(e):
+            raise
+        stats['error'] = f"Falha ao analisar coluna: {short_error(e)}"
+    return stats
+
+async def profile_table_columns(runner, sem, schema, table, cols_info, row_count, meta):
+    """
+    Agendador por custo (mesmo plano de extract_metadata.plan_column_strategies): as passadas
+    únicas exata e amostrada rodam em paralelo e, depois, todas as colunas são perfiladas
+    concorrentemente, cada uma rebaixando sua estratégia quando estoura o statement_timeout.
+    """
+    fullname = f"{schema}.{table}"
+    cost_info = await fetch_table_cost_info(runner, sem, schema, table)
+    plan = plan_column_strategies(cols_info, row_count, cost_info)
+    fallback_reason = {}
+
+    def current(name):
+        return plan[name][0] if plan[name] else None
+
+    def downgrade(name, reason):
+        plan[name].pop(0)
+        fallback_reason[name] = reason
+
+    # A amostra é preparada uma única vez, na primeira coluna que precisar dela
+    sampling_cache = {}
+    sampling_lock = asyncio.Lock()
+
+    async def get_sampling():
+        async with sampling_lock:
+            if "value" not in sampling_cache:
+                sampling_cache["value"] = await prepare_table_sampling(runner, sem, schema, table, row_count)
+                if sampling_cache["value"] is None:
+                    # Sem amostra possível: remove a estratégia de todas as colunas
+                    for name in plan:
+                        if current(name) == "sampled":
+                            downgrade(name, "tablesample_indisponivel")
+                        elif "sampled" in plan[name]:
+                            plan[name].remove("sampled")
+            return sampling_cache["value"]
+
+    # 1. Passadas únicas (exata e amostrada) em paralelo
+    base_stats = {"exact": {}, "sampled": {}}
+
+    async def single_pass(strategy):
+        if PROFILER_MODE == "per_column":
+            return
+        if strategy == "sampled" and any(current(n) == "sampled" for n in plan) and await get_sampling() is None:
+            return
+        group = [c for c in cols_info if current(c["name"]) == strategy and supports_single_pass(c)]
+        if not group:
+            return
+        group_sampling = sampling_cache.get("value") if strategy == "sampled" else None
+        group_row_count = group_sampling["sample_rows"] if group_sampling else row_count
+        try:
+            row = await runner.fetchrow(sem, build_single_pass_query(schema, table, group, group_sampling))
+            base_stats[strategy] = parse_single_pass_result(row, group, group_row_count)
+        except Exception as e:
+            if is_statement_timeout(e):
+                print(f"  - Aviso: passada única ({strategy}) excedeu o tempo limite em {fullname}, rebaixando colunas")
+                for c in group:
+                    downgrade(c["name"], "statement_timeout")
+            else:
+                print(f"  - Aviso: passada única falhou em {fullname}, usando consultas por coluna: {short_error(e)}")
+
+    await asyncio.gather(single_pass("exact"), single_pass("sampled"))
+
+    # 2. Todas as colunas concorrentemente
+    async def profile_column(col_info):
+        name = col_info["name"]
+        while True:
+            strategy = current(name)
+            if strategy is None:
+                stats = {"error": "Falha ao analisar coluna: tempo limite excedido em todas as estratégias"}
+                break
+            if strategy == "catalog":
+                stats = build_catalog_column_stats(cost_info["columns"].get(name),
+                                                   str(col_info["type"]).upper(), row_count)
+                break
+            col_sampling = None
+            if strategy == "sampled":
+                col_sampling = await get_sampling()
+                if col_sampling is None:
+                    continue
+            try:
+                stats = await get_column_advanced_stats(runner, sem, schema, table, col_info,
+                                                        col_sampling["sample_rows"] if col_sampling else row_count,
+                                                        base_stats=base_stats[strategy].get(name),
+                                                        sampling=col_sampling)
+                break
+            except Exception as e:
+                downgrade(name, "statement_timeout" if is_statement_timeout(e) else "erro")
+        stats['strategy'] = strategy
+        if name in fallback_reason:
+            stats['strategy_fallback_reason'] = fallback_reason[name]
+        return stats
+
+    column_stats = await asyncio.gather(*(profile_column(c) for c in cols_info))
+    results = {c["name"]: st for c, st in zip(cols_info, column_stats)}
+
+    sampling = sampling_cache.get("value")
+    if sampling:
+        meta["stats_sampling"] = {
+            "method": sampling["method"],
+            "sample_percent": sampling["sample_percent"],
+            "sample_rows": sampling["sample_rows"],
+            "seed": sampling["seed"],
+        }
+    used = [st.get('strategy') for st in results.values()]
+    meta["stats_plan"] = {
+        "relation_bytes": cost_info["relation_bytes"],
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+        "strategies": {st: used.count(st) for st in ("exact", "sampled", "catalog") if st in used},
+    }
+    return results
+
+async def extract_table_metadata(runner, inspector, schema, table):
+    meta = {"schema": schema, "table_name": table}
+    fullname = f"{schema}.{table}"
+    fqname = f"{quote_ident(schema)}.{quote_ident(table)}"
+    sem = runner.table_semaphore()
+
+    # Contagem de linhas; em timeout usa uma estimativa (-1 se não houver nenhuma)
+    try:
+        row_count = await runner.fetchval(sem, f"SELECT COUNT(*) FROM {fqname}")
+    except Exception as e:
+        if is_statement_timeout(e):
+            row_count, meta["row_count_source"] = await estimate_row_count(runner, sem, schema, table)
+        else:
+            print(f"Erro COUNT(*) em {fullname}: {e}")
+            row_count = -1
+    meta["row_count"] = row_count
+
+    # Metadados básicos vindos da reflexão em lote (já em memória)
+    cols_info = inspector.get_columns(table, schema=schema)
+    meta["primary_key"] = inspector.get_pk_constraint(table, schema=schema).get("constrained_columns", [])
+    meta["foreign_keys"] = inspector.get_foreign_keys(table, schema=schema)
+
+    # Estatísticas das colunas e amostra de linhas em paralelo
+    async def sample_rows():
+        if SAMPLE_ROWS <= 0 or row_count <= 0:
+            return []
+        try:
+            rows = await runner.fetch(sem, build_sample_rows_query(schema, table, row_count, SAMPLE_ROWS))
+            return [{c: serialize_value(v) for c, v in r.items()} for r in rows]
+        except Exception as e:
+            return [{"error": f"Erro ao obter amostra: {e}"}]
+
+    async def column_stats():
+        if GET_COLUMN_STATS and row_count > 0:
+            return await profile_table_columns(runner, sem, schema, table, cols_info, row_count, meta)
+        return {}
+
+    stats_by_column, sample = await asyncio.gather(column_stats(), sample_rows())
+
+    processed_columns = []
+    for col_info in cols_info:
+        col_data = {
+            "name": col_info["name"],
+            "type": str(col_info["type"]),
+            "nullable": col_info.get("nullable", True)
+        }
+        if GET_COLUMN_STATS and row_count > 0:
+            col_data['stats'] = stats_by_column[col_info["name"]]
+        processed_columns.append(col_data)
+    meta["columns"] = processed_columns
+    meta["sample_rows"] = sample
+    return meta
+
+async def extract_table_safely(runner, inspector, schema, table, tables_semaphore, position, total):
+    async with tables_semaphore:
+        print(f"Processando Tabela {position}/{total}: {schema}.{table} ...")
+        try:
+            return await extract_table_metadata(runner, inspector, schema, table)
+        except Exception as e:
+            print(f"  -> ERRO FATAL ao processar a tabela {schema}.{table}: {e}")
+            return {"schema": schema, "table_name": table, "error": str(e)}
+
+async def run(args):
+    # Reflexão em lote (poucas consultas ao pg_catalog) pela conexão síncrona
+    engine, conn = connect(conn_string)
+    inspector = BulkInspector(conn)
+    fk_builder = fk_graph.FKGraphBuilder(fetch_search_path(conn))
+    conn.close()
+    engine.dispose()
+    tables = list_tables(inspector)
+    print(f"Encontradas {len(tables)} tabelas. Iniciando extração assíncrona "
+          f"(banco: {args.db_concurrency}, por tabela: {args.table_concurrency}, tabelas: {args.tables_in_flight})...")
+
+    server_settings = {"statement_timeout": str(int(STATEMENT_TIMEOUT_MS))} if STATEMENT_TIMEOUT_MS > 0 else None
+    pool = await asyncpg.create_pool(conn_string, min_size=1, max_size=args.db_concurrency,
+                                     server_settings=server_settings)
+    runner = AsyncQueryRunner(pool, args.db_concurrency, args.table_concurrency)
+    tables_semaphore = asyncio.BoundedSemaphore(args.tables_in_flight)
+
+    json_path = os.path.join(OUTPUT_DIR, CONSOLIDATED_FILE)
+    partial_path = json_path + ".partial"
+    summaries = []
+    columnar = None
+    if args.columnar:
+        if metadata_columnar.pa is None:
+            print("Aviso: pyarrow não encontrado, saída colunar (Parquet) desativada. Instale com: pip install pyarrow")
+        else:
+            columnar = metadata_columnar.ColumnarMetadataWriter(os.path.join(OUTPUT_DIR, metadata_columnar.COLUMNAR_DIR))
+    # Janela limitada de tarefas: a próxima tabela só é iniciada quando uma sai da janela, e cada
+    # resultado deixa de ser referenciado assim que é gravado (a memória não cresce com o banco)
+    window = deque()
+    window_size = max(ASYNC_PENDING_TABLES, args.tables_in_flight)
+    next_table = 0
+    try:
+        # Grava na ordem schema/tabela, conforme cada tabela termina
+        with StreamingJSONArrayWriter(partial_path, compact=args.compact_json) as writer:
+            while window or next_table < len(tables):
+                while next_table < len(tables) and len(window) < window_size:
+                    schema, table = tables[next_table]
+                    next_table += 1
+                    window.append(asyncio.ensure_future(extract_table_safely(
+                        runner, inspector, schema, table, tables_semaphore, next_table, len(tables))))
+                m = await window.popleft()
+                writer.write(m)
+                if columnar:
+                    columnar.write(m)
+                fk_builder.add_table(m)
+                summaries.append(table_summary(m))
+                del m
+    finally:
+        for task in window:
+            task.cancel()
+        await pool.close()
+
+    print("\nProcessamento concluído. Salvando arquivos consolidados...")
+    os.replace(partial_path, json_path)
+    print(f"Metadados avançados salvos em: {json_path} ({writer.written} tabelas)")
+    if columnar:
+        columnar.close()
+        print(f"Metadados colunares (Parquet) salvos em: {columnar.output_dir}")
+    fk_path = os.path.join(OUTPUT_DIR, fk_graph.FK_GRAPH_FILE)
+    fk_index = fk_builder.save(fk_path)
+    print(f"Grafo de FKs salvo em: {fk_path} ({fk_index['edge_count']} FKs, "
+          f"{len(fk_index['components'])} componentes)")
+
+    summary_path = os.path.join(OUTPUT_DIR, "tables_summary_advanced.csv")
+    write_summary_csv(summary_path, summaries)
+    print(f"Resumo avançado salvo em: {summary_path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extração avançada de metadados do PostgreSQL (backend assíncrono)")
+    parser.add_argument("--db-concurrency", type=int, default=ASYNC_DB_CONCURRENCY,
+                        help="Consultas simultâneas no banco / tamanho do pool (padrão: %(default)s)")
+    parser.add_argument("--table-concurrency", type=int, default=ASYNC_TABLE_CONCURRENCY,
+                        help="Consultas simultâneas por tabela (padrão: %(default)s)")
+    parser.add_argument("--tables-in-flight", type=int, default=ASYNC_TABLES_IN_FLIGHT,
+                        help="Tabelas processadas ao mesmo tempo (padrão: %(default)s)")
+    parser.add_argument("--no-columnar", dest="columnar", action="store_false", default=COLUMNAR_OUTPUT,
+                        help="Não gera a saída colunar (Parquet) além do JSON consolidado")
+    parser.add_argument("--compact-json", action="store_true",
+                        help="Grava o JSON consolidado sem indentação, uma tabela por linha")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    args.db_concurrency = max(1, args.db_concurrency)
+    args.table_concurrency = max(1, args.table_concurrency)
+    args.tables_in_flight = max(1, args.tables_in_flight)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
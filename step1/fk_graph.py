@@ -0,0 +1,164 @@
+# fk_graph.py
+# NOVO: Índice do grafo de chaves estrangeiras, montado durante a extração do step1.
+# Cada tabela é um nó "schema.tabela"; cada FK é uma aresta da tabela de origem para a referenciada.
+# O índice persistido (metadata_fk_graph.json) traz listas de adjacência nos dois sentidos,
+# componentes conexos e as tabelas "hub" (mais referenciadas, ex.: tb_cidadao), para que as etapas
+# seguintes consultem vizinhos em O(1) sem varrer a lista de metadados nem refletir o schema de novo:
+#   from fk_graph import FKGraph
+#   grafo = FKGraph.load("metadata_output_advanced/metadata_fk_graph.json")
+#   grafo.neighbors("public.tb_cidadao")
+import json
+import sys
+from pathlib import Path
+
+# common/ fica na raiz do repositório
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from common.fk_refs import resolve_referred_table, DEFAULT_SEARCH_PATH  # noqa: E402
+
+FK_GRAPH_FILE = "metadata_fk_graph.json"
+FK_HUB_TOP_N = 20               # Quantas tabelas hub (maior número de tabelas que as referenciam) listar
+
+def node_name(schema, table):
+    return f"{schema}.{table}"
+
+class FKGraphBuilder:
+    """
+    Acumula as FKs das tabelas à medida que são extraídas (só nós e arestas ficam em memória)
+    e gera o índice ao final. `search_path` resolve referred_schema = None, que a reflexão usa
+    para schemas visíveis no search_path.
+    """
+    def __init__(self, search_path=None):
+        self.search_path = list(search_path or DEFAULT_SEARCH_PATH)
+        self.tables = []
+        self.pending_edges = []
+
+    def add_table(self, m):
+        schema, table = m.get("schema"), m.get("table_name")
+        self.tables.append((schema, table))
+        for fk in m.get("foreign_keys", []):
+            self.pending_edges.append((schema, table, fk))
+
+    def resolve_referred(self, schema, fk, known):
+        return node_name(*resolve_referred_table(fk, schema, known, self.search_path))
+
+    def build(self):
+        known = set(self.tables)
+        nodes = {}
+
+        def node(name):
+            if name not in nodes:
+                nodes[name] = {"out": [], "in": [], "out_degree": 0, "in_degree": 0, "component": None}
+            return nodes[name]
+
+        for schema, table in self.tables:
+            node(node_name(schema, table))
+
+        edges = []
+        for schema, table, fk in self.pending_edges:
+            source = node_name(schema, table)
+            target = self.resolve_referred(schema, fk, known)
+            edges.append({
+                "from": source,
+                "to": target,
+                "name": fk.get("name"),
+                "constrained_columns": fk.get("constrained_columns", []),
+                "referred_columns": fk.get("referred_columns", []),
+            })
+            src, dst = node(source), node(target)
+            if target not in known:
+                dst["external"] = True
+            # Várias FKs entre as mesmas tabelas contam como uma única vizinhança
+            if target not in src["out"]:
+                src["out"].append(target)
+                dst["in"].append(source)
+
+        for data in nodes.values():
+            data["out"].sort()
+            data["in"].sort()
+            data["out_degree"] = len(data["out"])
+            data["in_degree"] = len(data["in"])
+
+        components = self._components(nodes)
+        hubs = sorted((name for name, data in nodes.items() if data["in_degree"] > 0),
+                      key=lambda name: (-nodes[name]["in_degree"], -nodes[name]["out_degree"], name))[:FK_HUB_TOP_N]
+        return {
+            "node_count": len(nodes),
+            "edge_count": len(edges),
+            "search_path": self.search_path,
+            "nodes": dict(sorted(nodes.items())),
+            "edges": edges,
+            "components": components,
+            "hubs": [{"table": name, "in_degree": nodes[name]["in_degree"], "out_degree": nodes[name]["out_degree"]}
+                     for name in hubs],
+        }
+
+    @staticmethod
+    def _components(nodes):
+        """Componentes conexos (ignorando a direção das arestas), do maior para o menor; grava o id em cada nó."""
+        seen = set()
+        groups = []
+        for start in sorted(nodes):
+            if start in seen:
+                continue
+            seen.add(start)
+            stack, group = [start], []
+            while stack:
+                current = stack.pop()
+                group.append(current)
+                for neighbor in nodes[current]["out"] + nodes[current]["in"]:
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        stack.append(neighbor)
+            groups.append(sorted(group))
+        groups.sort(key=lambda g: (-len(g), g[0]))
+        components = []
+        for component_id, group in enumerate(groups):
+            for name in group:
+                nodes[name]["component"] = component_id
+            components.append({"id": component_id, "size": len(group), "tables": group})
+        return components
+
+    def save(self, path):
+        index = self.build()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        return index
+
+class FKGraph:
+    """Consulta ao índice persistido; todas as buscas por tabela são acessos a dicionário (O(1))."""
+    def __init__(self, index):
+        self.index = index
+        self.nodes = index["nodes"]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def references(self, table):
+        """Tabelas referenciadas pelas FKs de `table` ("schema.tabela")."""
+        return self.nodes.get(table, {}).get("out", [])
+
+    def referenced_by(self, table):
+        """Tabelas com FK apontando para `table`."""
+        return self.nodes.get(table, {}).get("in", [])
+
+    def neighbors(self, table):
+        """Vizinhos nos dois sentidos."""
+        return sorted(set(self.references(table)) | set(self.referenced_by(table)))
+
+    def degree(self, table):
+        data = self.nodes.get(table, {})
+        return data.get("in_degree", 0) + data.get("out_degree", 0)
+
+    def component_of(self, table):
+        """Tabelas do mesmo componente conexo de `table`."""
+        component_id = self.nodes.get(table, {}).get("component")
+        if component_id is None:
+            return []
+        return self.index["components"][component_id]["tables"]
+
+    def hubs(self):
+        return [h["table"] for h in self.index["hubs"]]
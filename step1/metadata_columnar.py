@@ -0,0 +1,299 @@
+# metadata_columnar.py
+# NOVO: Representação colunar (Parquet) dos metadados extraídos pelo step1.
+# Em vez de um único JSON indentado, os metadados são normalizados em quatro tabelas:
+#   tables.parquet          -> uma linha por tabela (row_count, PK, plano de estatísticas, amostra)
+#   columns.parquet         -> uma linha por coluna (tipo, nulos, distintos, agregados numéricos, exemplos)
+#   frequent_values.parquet -> uma linha por valor frequente de cada coluna
+#   foreign_keys.parquet    -> uma linha por chave estrangeira
+# As etapas seguintes leem só os campos que usam, com filtros aplicados na leitura (predicate pushdown):
+#   from metadata_columnar import read_metadata_table
+#   grandes = read_metadata_table(path, "tables", columns=["schema", "table_name"], filters=[("row_count", ">", 0)])
+# load_metadata() remonta a lista de dicionários no mesmo formato do JSON consolidado.
+# Depende de pyarrow (opcional: sem ele o step1 apenas não gera a saída colunar).
+import os
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+COLUMNAR_DIR = "metadata_columnar"     # Subpasta (dentro de OUTPUT_DIR) com os arquivos Parquet
+ROW_GROUP_TABLES = 500                 # Tabelas acumuladas em memória antes de gravar um row group
+
+def _string_list():
+    return pa.list_(pa.string())
+
+def columnar_schemas():
+    """Esquemas Arrow de cada tabela normalizada (explícitos para que arquivos de execuções diferentes sejam compatíveis)."""
+    return {
+        "tables": pa.schema([
+            ("schema", pa.string()),
+            ("table_name", pa.string()),
+            ("row_count", pa.int64()),
+            ("row_count_source", pa.string()),
+            ("column_count", pa.int32()),
+            ("primary_key", _string_list()),
+            ("stats_sampling_json", pa.string()),
+            ("stats_plan_json", pa.string()),
+            ("stats_sketch_json", pa.string()),
+            ("sample_rows_json", pa.string()),
+            ("error", pa.string()),
+        ]),
+        "columns": pa.schema([
+            ("schema", pa.string()),
+            ("table_name", pa.string()),
+            ("ordinal", pa.int32()),
+            ("column_name", pa.string()),
+            ("type", pa.string()),
+            ("nullable", pa.bool_()),
+            ("has_stats", pa.bool_()),
+            ("null_count", pa.int64()),
+            ("distinct_count", pa.int64()),
+            ("null_percentage", pa.float64()),
+            ("has_numeric_stats", pa.bool_()),
+            ("numeric_avg", pa.float64()),
+            ("numeric_min", pa.float64()),
+            ("numeric_max", pa.float64()),
+            ("numeric_stddev", pa.float64()),
+            ("has_frequent_values", pa.bool_()),
+            ("sample_values", _string_list()),
+            ("approximation_json", pa.string()),
+            ("sketch_json", pa.string()),
+            ("source", pa.string()),
+            ("strategy", pa.string()),
+            ("strategy_fallback_reason", pa.string()),
+            ("error", pa.string()),
+        ]),
+        "frequent_values": pa.schema([
+            ("schema", pa.string()),
+            ("table_name", pa.string()),
+            ("column_name", pa.string()),
+            ("rank", pa.int32()),
+            ("value", pa.string()),
+            ("count", pa.int64()),
+        ]),
+        "foreign_keys": pa.schema([
+            ("schema", pa.string()),
+            ("table_name", pa.string()),
+            ("name", pa.string()),
+            ("constrained_columns", _string_list()),
+            ("referred_schema", pa.string()),
+            ("referred_table", pa.string()),
+            ("referred_columns", _string_list()),
+            ("options_json", pa.string()),
+            ("comment", pa.string()),
+        ]),
+    }
+
+def _json_or_none(value):
+    return json.dumps(value, ensure_ascii=False, default=str) if value is not None else None
+
+def _float_or_none(value):
+    return float(value) if value is not None else None
+
+def normalize_table(m):
+    """Divide o dicionário de uma tabela (formato do JSON consolidado) em linhas das tabelas normalizadas."""
+    schema, table = m.get("schema"), m.get("table_name")
+    rows = {"tables": [], "columns": [], "frequent_values": [], "foreign_keys": []}
+    rows["tables"].append({
+        "schema": schema,
+        "table_name": table,
+        "row_count": m.get("row_count"),
+        "row_count_source": m.get("row_count_source"),
+        "column_count": len(m.get("columns", [])),
+        "primary_key": m.get("primary_key"),
+        "stats_sampling_json": _json_or_none(m.get("stats_sampling")),
+        "stats_plan_json": _json_or_none(m.get("stats_plan")),
+        "stats_sketch_json": _json_or_none(m.get("stats_sketch")),
+        "sample_rows_json": _json_or_none(m.get("sample_rows")),
+        "error": m.get("error"),
+    })
+    for fk in m.get("foreign_keys", []):
+        rows["foreign_keys"].append({
+            "schema": schema,
+            "table_name": table,
+            "name": fk.get("name"),
+            "constrained_columns": fk.get("constrained_columns"),
+            "referred_schema": fk.get("referred_schema"),
+            "referred_table": fk.get("referred_table"),
+            "referred_columns": fk.get("referred_columns"),
+            "options_json": _json_or_none(fk.get("options")),
+            "comment": fk.get("comment"),
+        })
+    for ordinal, col in enumerate(m.get("columns", [])):
+        stats = col.get("stats")
+        st = stats or {}
+        numeric = st.get("numeric_stats")
+        rows["columns"].append({
+            "schema": schema,
+            "table_name": table,
+            "ordinal": ordinal,
+            "column_name": col.get("name"),
+            "type": col.get("type"),
+            "nullable": col.get("nullable"),
+            "has_stats": stats is not None,
+            "null_count": st.get("null_count"),
+            "distinct_count": st.get("distinct_count"),
+            "null_percentage": _float_or_none(st.get("null_percentage")),
+            "has_numeric_stats": numeric is not None,
+            "numeric_avg": _float_or_none((numeric or {}).get("avg")),
+            "numeric_min": _float_or_none((numeric or {}).get("min")),
+            "numeric_max": _float_or_none((numeric or {}).get("max")),
+            "numeric_stddev": _float_or_none((numeric or {}).get("stddev")),
+            "has_frequent_values": "frequent_values" in st,
+            "sample_values": st.get("sample_values"),
+            "approximation_json": _json_or_none(st.get("approximation")),
+            "sketch_json": _json_or_none(st.get("sketch")),
+            "source": st.get("source"),
+            "strategy": st.get("strategy"),
+            "strategy_fallback_reason": st.get("strategy_fallback_reason"),
+            "error": st.get("error"),
+        })
+        for rank, fv in enumerate(st.get("frequent_values", [])):
+            rows["frequent_values"].append({
+                "schema": schema,
+                "table_name": table,
+                "column_name": col.get("name"),
+                "rank": rank,
+                "value": fv.get("value"),
+                "count": fv.get("count"),
+            })
+    return rows
+
+class ColumnarMetadataWriter:
+    """
+    Grava as tabelas normalizadas em Parquet à medida que as tabelas são extraídas, acumulando
+    no máximo ROW_GROUP_TABLES tabelas em memória antes de gravar cada row group.
+    Os arquivos são escritos em <nome>.parquet.partial e renomeados só em close(), como o JSON consolidado.
+    """
+    def __init__(self, output_dir, row_group_tables=ROW_GROUP_TABLES):
+        if pa is None:
+            raise ImportError("pyarrow não encontrado. Instale com: pip install pyarrow")
+        self.output_dir = output_dir
+        self.row_group_tables = row_group_tables
+        self.schemas = columnar_schemas()
+        self.buffers = {name: [] for name in self.schemas}
+        self.pending_tables = 0
+        self.writers = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, f"{name}.parquet")
+
+    def write(self, m):
+        for name, rows in normalize_table(m).items():
+            self.buffers[name].extend(rows)
+        self.pending_tables += 1
+        if self.pending_tables >= self.row_group_tables:
+            self.flush()
+
+    def flush(self):
+        for name, rows in self.buffers.items():
+            if name not in self.writers:
+                self.writers[name] = pq.ParquetWriter(self._path(name) + ".partial", self.schemas[name])
+            if rows:
+                self.writers[name].write_table(pa.Table.from_pylist(rows, schema=self.schemas[name]))
+            self.buffers[name] = []
+        self.pending_tables = 0
+
+    def close(self):
+        self.flush()
+        for name, writer in self.writers.items():
+            writer.close()
+            os.replace(self._path(name) + ".partial", self._path(name))
+
+def read_metadata_table(columnar_dir, name, columns=None, filters=None):
+    """
+    Lê uma das tabelas normalizadas ("tables", "columns", "frequent_values" ou "foreign_keys")
+    como pyarrow.Table, apenas com as `columns` pedidas e aplicando `filters` na leitura
+    (mesmo formato de pyarrow.parquet.read_table, ex.: [("row_count", ">", 0)]).
+    """
+    if pq is None:
+        raise ImportError("pyarrow não encontrado. Instale com: pip install pyarrow")
+    return pq.read_table(os.path.join(columnar_dir, f"{name}.parquet"), columns=columns, filters=filters)
+
+def load_metadata(columnar_dir, filters=None):
+    """
+    Remonta a lista de tabelas no formato do JSON consolidado a partir dos arquivos Parquet.
+    `filters` é aplicado à tabela "tables" (ex.: [("row_count", ">", 0)]); só as colunas,
+    valores frequentes e FKs das tabelas selecionadas são montados.
+    """
+    tables = read_metadata_table(columnar_dir, "tables", filters=filters).to_pylist()
+    selected = {(t["schema"], t["table_name"]) for t in tables}
+
+    def grouped(name):
+        groups = {}
+        for row in read_metadata_table(columnar_dir, name).to_pylist():
+            key = (row["schema"], row["table_name"])
+            if key in selected:
+                groups.setdefault(key, []).append(row)
+        return groups
+
+    columns_by_table = grouped("columns")
+    fks_by_table = grouped("foreign_keys")
+    freq_by_column = {}
+    for rows in grouped("frequent_values").values():
+        for fv in rows:
+            freq_by_column.setdefault((fv["schema"], fv["table_name"], fv["column_name"]), []).append(fv)
+
+    metadata = []
+    for t in tables:
+        key = (t["schema"], t["table_name"])
+        m = {"schema": t["schema"], "table_name": t["table_name"]}
+        if t["error"] is not None:
+            m["error"] = t["error"]
+            metadata.append(m)
+            continue
+        if t["row_count_source"] is not None:
+            m["row_count_source"] = t["row_count_source"]
+        m["row_count"] = t["row_count"]
+        m["primary_key"] = t["primary_key"] or []
+        m["foreign_keys"] = []
+        for fk in fks_by_table.get(key, []):
+            m["foreign_keys"].append({
+                "name": fk["name"],
+                "constrained_columns": fk["constrained_columns"],
+                "referred_schema": fk["referred_schema"],
+                "referred_table": fk["referred_table"],
+                "referred_columns": fk["referred_columns"],
+                "options": json.loads(fk["options_json"]) if fk["options_json"] else {},
+                "comment": fk["comment"],
+            })
+        for field in ("stats_sampling", "stats_plan", "stats_sketch"):
+            if t[field + "_json"] is not None:
+                m[field] = json.loads(t[field + "_json"])
+        m["columns"] = []
+        for col in sorted(columns_by_table.get(key, []), key=lambda c: c["ordinal"]):
+            m["columns"].append(rebuild_column(col, freq_by_column.get((key[0], key[1], col["column_name"]), [])))
+        m["sample_rows"] = json.loads(t["sample_rows_json"]) if t["sample_rows_json"] else []
+        metadata.append(m)
+    return metadata
+
+def rebuild_column(col, frequent_values):
+    """Remonta o dicionário de uma coluna (com `stats`) a partir de sua linha em columns.parquet."""
+    col_data = {"name": col["column_name"], "type": col["type"], "nullable": col["nullable"]}
+    if not col["has_stats"]:
+        return col_data
+    stats = {}
+    for field in ("null_count", "distinct_count", "null_percentage"):
+        if col[field] is not None:
+            stats[field] = col[field]
+    if col["has_numeric_stats"]:
+        stats["numeric_stats"] = {k: col[f"numeric_{k}"] for k in ("avg", "min", "max", "stddev")}
+    if col["has_frequent_values"]:
+        stats["frequent_values"] = [{"value": fv["value"], "count": fv["count"]}
+                                    for fv in sorted(frequent_values, key=lambda fv: fv["rank"])]
+    if col["sample_values"] is not None:
+        stats["sample_values"] = col["sample_values"]
+    if col["approximation_json"] is not None:
+        stats["approximation"] = json.loads(col["approximation_json"])
+    if col["sketch_json"] is not None:
+        stats["sketch"] = json.loads(col["sketch_json"])
+    for field in ("source", "strategy", "strategy_fallback_reason", "error"):
+        if col[field] is not None:
+            stats[field] = col[field]
+    col_data["stats"] = stats
+    return col_data
@@ -0,0 +1,73 @@
+"""
+Testes do backend assíncrono sem banco: um AsyncQueryRunner falso responde às consultas pelo
+texto do SQL. Rodar com `python -m pytest` dentro de step1/.
+"""
+import asyncio
+import os
+
+import asyncpg
+import pytest
+
+# extract_metadata monta a string de conexão ao ser importado
+for var in ("PG_USER", "PG_PASS", "PG_DB"):
+    os.environ.setdefault(var, "teste")
+
+import extract_metadata  # noqa: E402
+import extract_metadata_async as em_async  # noqa: E402
+
+
+class FakeInspector:
+    def get_columns(self, table, schema=None):
+        return []
+
+    def get_pk_constraint(self, table, schema=None):
+        return {"constrained_columns": []}
+
+    def get_foreign_keys(self, table, schema=None):
+        return []
+
+
+class FakeRunner(em_async.AsyncQueryRunner):
+    """COUNT(*) exato sempre estoura o statement_timeout; as demais consultas vêm de `answers`."""
+    def __init__(self, answers):
+        super().__init__(pool=None, db_concurrency=1, table_concurrency=1)
+        self.answers = answers
+
+    async def fetch(self, table_semaphore, sql, *args):
+        if sql.startswith("SELECT COUNT(*)") and "TABLESAMPLE" not in sql:
+            raise asyncpg.exceptions.QueryCanceledError("canceling statement due to statement timeout")
+        for fragment, answer in self.answers.items():
+            if fragment in sql:
+                if isinstance(answer, Exception):
+                    raise answer
+                return [(answer,)]
+        return []
+
+
+def extract(answers):
+    return asyncio.run(em_async.extract_table_metadata(FakeRunner(answers), FakeInspector(), "public", "tb_grande"))
+
+
+def test_timeout_uses_reltuples_when_analyzed():
+    meta = extract({"FROM pg_class": 2_500_000.0})
+    assert meta["row_count"] == 2_500_000
+    assert meta["row_count_source"].startswith("pg_class.reltuples")
+
+
+@pytest.mark.parametrize("reltuples", [-1.0, 0.0])
+def test_timeout_on_never_analyzed_table_uses_tablesample(reltuples):
+    meta = extract({"FROM pg_class": reltuples, "TABLESAMPLE SYSTEM": 1234})
+    assert meta["row_count"] == int(1234 * 100 / extract_metadata.ROW_COUNT_SAMPLE_PERCENT)
+    assert meta["row_count_source"].startswith("TABLESAMPLE SYSTEM")
+
+
+def test_timeout_without_any_estimate_is_unknown_not_empty():
+    meta = extract({"FROM pg_class": -1.0, "TABLESAMPLE SYSTEM": 0})
+    assert meta["row_count"] == -1
+    assert "error" not in meta
+
+
+def test_failing_reltuples_lookup_does_not_fail_the_table():
+    meta = extract({"FROM pg_class": RuntimeError("pg_class indisponível")})
+    assert meta["row_count"] == -1
+    assert meta["columns"] == []
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Script para compactar os metadados filtrados antes da classificação (entre o step2 e o step3).
+
+Cada tabela vira o menor payload que ainda descreve seu conteúdo para a LLM, respeitando um
+orçamento de tokens por tabela:
+- Remove campos que a LLM não usa (stats_plan, stats_sampling, stats_sketch, sample_rows,
+  strategy, null_count, approximation, sketch, error)
+- Trunca valores longos e arredonda as estatísticas numéricas
+- Remove dos sample_values os valores repetidos e os que já aparecem em frequent_values
+- Mantém só nome e tipo (mais o percentual de nulos) das colunas técnicas: chaves primárias,
+  colunas de FK, identificadores únicos, colunas binárias e colunas totalmente nulas
+- Se a tabela ainda passar do orçamento, reduz os exemplos em níveis até caber
+
+Os nomes dos campos continuam os mesmos do JSON consolidado (o prompt do step3 os descreve).
+O step3 serializa cada tabela sem indentação (PROMPT_JSON_COMPACT), e é esse o tamanho medido aqui.
+"""
+
+import json
+import math
+import re
+import sys
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+TOKEN_BUDGET = 1200             # Tokens máximos por tabela no payload compactado (sobrescrito por --orcamento=N)
+MAX_VALUE_CHARS = 60            # Valores de exemplo maiores são truncados
+MAX_SAMPLE_VALUES = 10          # Exemplos por coluna no nível 0 (o step1 extrai até 15)
+MAX_FREQUENT_VALUES = 5         # Valores frequentes por coluna no nível 0
+NUMERIC_DIGITS = 4              # Algarismos significativos das estatísticas numéricas
+TIKTOKEN_ENCODING = "o200k_base"  # Codificação usada na contagem quando o tiktoken está instalado
+
+TABLE_KEYS = ("schema", "table_name", "comment", "row_count", "primary_key", "foreign_keys", "columns")
+COLUMN_KEYS = ("name", "type", "nullable", "comment", "stats")
+FOREIGN_KEY_KEYS = ("constrained_columns", "referred_schema", "referred_table", "referred_columns")
+BINARY_TYPES = re.compile(r'^(BYTEA|BLOB|BINARY|VARBINARY|LARGEBINARY)', re.IGNORECASE)
+IDENTIFIER_TYPES = re.compile(r'^(SMALLINT|INTEGER|BIGINT|UUID)', re.IGNORECASE)
+
+# Níveis de redução aplicados enquanto a tabela passar do orçamento:
+# (exemplos por coluna, valores frequentes por coluna, manter numeric_stats)
+COMPACTION_LEVELS = [
+    (MAX_SAMPLE_VALUES, MAX_FREQUENT_VALUES, True),
+    (5, 3, True),
+    (3, 3, False),
+    (0, 2, False),
+    (0, 0, False),
+]
+
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens do texto (tiktoken, se instalado; senão a aproximação de ~4 caracteres por token)."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def prompt_json(table) -> str:
+    """Serialização usada no prompt do step3 quando PROMPT_JSON_COMPACT está ligado."""
+    return json.dumps(table, ensure_ascii=False, separators=(',', ':'))
+
+
+def truncate_value(value):
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS - 1] + "…"
+    return value
+
+
+def round_number(value):
+    """Arredonda para NUMERIC_DIGITS algarismos significativos (inteiros ficam como inteiros)."""
+    if not isinstance(value, float) or not math.isfinite(value):
+        return value
+    if value == int(value) and abs(value) < 1e15:
+        return int(value)
+    return float(f"{value:.{NUMERIC_DIGITS}g}")
+
+
+def is_technical_column(column, table, fk_columns) -> bool:
+    """Colunas cujos valores não ajudam a classificar a tabela: basta o nome e o tipo."""
+    stats = column.get('stats') if isinstance(column.get('stats'), dict) else {}
+    name = column.get('name')
+    if name in (table.get('primary_key') or []) or name in fk_columns:
+        return True
+    if BINARY_TYPES.match(str(column.get('type', ''))):
+        return True
+    if stats.get('null_percentage') == 100:
+        return True
+    row_count = table.get('row_count') or 0
+    # Identificador único: inteiro/UUID com um valor distinto por linha (datas e textos únicos continuam)
+    return (row_count > 1 and stats.get('distinct_count') == row_count
+            and bool(IDENTIFIER_TYPES.match(str(column.get('type', '')))))
+
+
+def compact_stats(stats, max_samples, max_frequent, keep_numeric):
+    compact = {}
+    if 'distinct_count' in stats:
+        compact['distinct_count'] = stats['distinct_count']
+    if 'null_percentage' in stats:
+        compact['null_percentage'] = round_number(stats['null_percentage'])
+    if keep_numeric and isinstance(stats.get('numeric_stats'), dict):
+        numeric = {k: round_number(v) for k, v in stats['numeric_stats'].items() if v is not None}
+        if numeric:
+            compact['numeric_stats'] = numeric
+
+    frequent = stats.get('frequent_values') or []
+    if max_frequent and frequent:
+        compact['frequent_values'] = [{"value": truncate_value(f['value']), "count": f['count']}
+                                      for f in frequent[:max_frequent]]
+
+    if max_samples:
+        # Exemplos distintos que ainda não aparecem entre os valores frequentes
+        seen = {str(f['value']) for f in frequent}
+        samples = []
+        for value in stats.get('sample_values') or []:
+            if value is None or str(value) in seen:
+                continue
+            seen.add(str(value))
+            samples.append(truncate_value(value))
+            if len(samples) >= max_samples:
+                break
+        if samples:
+            compact['sample_values'] = samples
+    return compact
+
+
+def compact_table(table, level: int = 0):
+    """Payload da tabela no nível de redução `level` (índice de COMPACTION_LEVELS)."""
+    max_samples, max_frequent, keep_numeric = COMPACTION_LEVELS[level]
+    fk_columns = {c for fk in table.get('foreign_keys') or [] for c in fk.get('constrained_columns', [])}
+
+    compact = {}
+    for key in TABLE_KEYS:
+        value = table.get(key)
+        if value in (None, [], ''):
+            continue
+        if key == 'foreign_keys':
+            value = [{k: fk[k] for k in FOREIGN_KEY_KEYS if fk.get(k) is not None} for fk in value]
+        elif key == 'columns':
+            value = [compact_column(c, table, fk_columns, max_samples, max_frequent, keep_numeric) for c in value]
+        compact[key] = value
+    return compact
+
+
+def compact_column(column, table, fk_columns, max_samples, max_frequent, keep_numeric):
+    compact = {k: column[k] for k in COLUMN_KEYS if k != 'stats' and column.get(k) is not None}
+    stats = column.get('stats')
+    if not isinstance(stats, dict):
+        return compact
+    if is_technical_column(column, table, fk_columns):
+        if 'null_percentage' in stats:
+            compact['stats'] = {'null_percentage': round_number(stats['null_percentage'])}
+        return compact
+    compact_s = compact_stats(stats, max_samples, max_frequent, keep_numeric)
+    if compact_s:
+        compact['stats'] = compact_s
+    return compact
+
+
+def compact_within_budget(table, budget: int = TOKEN_BUDGET):
+    """
+    Compacta a tabela no menor nível de redução que caiba no orçamento.
+
+    Returns:
+        (payload, nível, tokens); se nem o último nível couber, devolve o último
+    """
+    for level in range(len(COMPACTION_LEVELS)):
+        payload = compact_table(table, level)
+        tokens = count_tokens(prompt_json(payload))
+        if tokens <= budget:
+            break
+    return payload, level, tokens
+
+
+def generate_report(rows, output_file: str, budget: int):
+    """Relatório em Markdown com os tokens economizados por tabela."""
+    before = sum(r['tokens_before'] for r in rows)
+    after = sum(r['tokens_after'] for r in rows)
+    over = [r for r in rows if r['tokens_after'] > budget]
+
+    report = f"""# Relatório de Compactação de Metadados
+
+**Data de Execução:** {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}
+
+## Resumo
+
+- **Tabelas compactadas:** {len(rows)}
+- **Orçamento por tabela:** {budget} tokens
+- **Contagem de tokens:** {"tiktoken (" + TIKTOKEN_ENCODING + ")" if tiktoken is not None else "aproximada (~4 caracteres por token)"}
+- **Tokens antes (JSON indentado):** {before:,}
+- **Tokens depois:** {after:,}
+- **Tokens economizados:** {before - after:,} ({((before - after) / before * 100) if before else 0:.1f}%)
+- **Tabelas acima do orçamento mesmo no último nível:** {len(over)}
+
+## Tokens por Tabela
+
+| Schema | Nome da Tabela | Antes | Depois | Economia | Nível |
+|--------|----------------|-------|--------|----------|-------|
+"""
+    for r in sorted(rows, key=lambda r: r['tokens_before'] - r['tokens_after'], reverse=True):
+        saved = r['tokens_before'] - r['tokens_after']
+        pct = saved / r['tokens_before'] * 100 if r['tokens_before'] else 0
+        report += (f"| {r['schema']} | {r['table_name']} | {r['tokens_before']:,} | {r['tokens_after']:,} "
+                   f"| {saved:,} ({pct:.1f}%) | {r['level']} |\n")
+
+    report += """
+## Níveis de Redução
+
+| Nível | Exemplos por coluna | Valores frequentes | numeric_stats |
+|-------|---------------------|--------------------|---------------|
+"""
+    for level, (samples, frequent, numeric) in enumerate(COMPACTION_LEVELS):
+        report += f"| {level} | {samples} | {frequent} | {'sim' if numeric else 'não'} |\n"
+
+    report += """
+---
+
+*Relatório gerado automaticamente pelo script de compactação de metadados.*
+"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(report)
+    print(f"Relatório salvo em: {output_file}")
+
+
+def compact_metadata(input_file: str, output_file: str, report_file: str, budget: int = TOKEN_BUDGET):
+    """
+    Compacta todas as tabelas do JSON filtrado.
+
+    Args:
+        input_file: JSON filtrado do step2
+        output_file: JSON compactado (entrada do step3)
+        report_file: Relatório MD com a economia de tokens
+        budget: Orçamento de tokens por tabela
+    """
+    print(f"Lendo arquivo: {input_file}")
+    with open(input_file, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    print(f"Total de tabelas: {len(metadata)}")
+
+    compacted = []
+    rows = []
+    for table in metadata:
+        payload, level, tokens = compact_within_budget(table, budget)
+        compacted.append(payload)
+        rows.append({
+            "schema": table.get('schema'),
+            "table_name": table.get('table_name'),
+            # Antes: serialização que o step3 usava (indent=2) sobre a tabela completa
+            "tokens_before": count_tokens(json.dumps(table, indent=2, ensure_ascii=False)),
+            "tokens_after": tokens,
+            "level": level,
+        })
+
+    before = sum(r['tokens_before'] for r in rows)
+    after = sum(r['tokens_after'] for r in rows)
+    print(f"\nTokens antes: {before:,}")
+    print(f"Tokens depois: {after:,}")
+    if before:
+        print(f"Economia: {before - after:,} tokens ({(before - after) / before * 100:.1f}%)")
+    over = sum(1 for r in rows if r['tokens_after'] > budget)
+    if over:
+        print(f"AVISO: {over} tabelas continuam acima do orçamento de {budget} tokens")
+
+    print(f"\nSalvando arquivo compactado: {output_file}")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(compacted, f, indent=2, ensure_ascii=False)
+
+    generate_report(rows, report_file, budget)
+    print("\nProcesso concluído com sucesso!")
+
+
+def main():
+    """Função principal do script."""
+
+    input_file = "metadata_output_advanced/metadata_advanced_consolidated_filtered.json"
+    output_file = "metadata_output_advanced/metadata_advanced_consolidated_compact.json"
+    report_file = "metadata_output_advanced/relatorio_compactacao.md"
+    budget = TOKEN_BUDGET
+
+    options = [a for a in sys.argv[1:] if a.startswith("--")]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) > 0:
+        input_file = args[0]
+    if len(args) > 1:
+        output_file = args[1]
+    if len(args) > 2:
+        report_file = args[2]
+    for option in options:
+        if option.startswith("--orcamento="):
+            try:
+                budget = int(option.split("=", 1)[1])
+            except ValueError:
+                print("ERRO: --orcamento deve ser um número inteiro de tokens")
+                sys.exit(1)
+
+    if not Path(input_file).exists():
+        print(f"ERRO: Arquivo de entrada não encontrado: {input_file}")
+        sys.exit(1)
+
+    output_dir = Path(output_file).parent
+    if output_dir and not output_dir.exists():
+        print(f"Criando diretório: {output_dir}")
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        compact_metadata(input_file, output_file, report_file, budget)
+    except Exception as e:
+        print(f"ERRO durante a execução: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("Script de Compactação de Metadados")
+    print("=" * 70)
+    print()
+    print("Uso: python compact_metadata.py [input_file] [output_file] [report_file] [--orcamento=N]")
+    print()
+    print("Argumentos:")
+    print("  input_file   : JSON filtrado pelo filter_metadata.py")
+    print("                 (padrão: metadata_output_advanced/metadata_advanced_consolidated_filtered.json)")
+    print("  output_file  : JSON compactado, entrada do step3")
+    print("                 (padrão: metadata_output_advanced/metadata_advanced_consolidated_compact.json)")
+    print("  report_file  : Relatório MD com a economia de tokens")
+    print("                 (padrão: metadata_output_advanced/relatorio_compactacao.md)")
+    print(f"  --orcamento=N : Tokens máximos por tabela (padrão: {TOKEN_BUDGET})")
+    print()
+    print("=" * 70)
+    print()
+
+    main()
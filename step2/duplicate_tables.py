@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Detecção de tabelas duplicadas e de tabelas de log (revisão) nos metadados.
+
+Dois tipos de duplicidade são identificados:
+- Estrutural: tabelas com a mesma assinatura de colunas (hash de nome + tipo de todas as colunas)
+  e estatísticas e valores de exemplo quase idênticos (cópias, backups, particionamentos manuais).
+- Gêmea de log: tabela com prefixo de log (ex.: tl_) cuja gêmea com o prefixo principal (ex.: tb_)
+  existe no mesmo schema, com colunas quase iguais e estatísticas quase idênticas.
+
+Cada grupo elege uma tabela representante; com o colapso ligado, apenas ela segue para a
+classificação. Os grupos são gravados em tabelas_duplicadas.json, que o step3 lê para copiar a
+classificação da representante para as duplicatas colapsadas.
+"""
+
+import hashlib
+import json
+
+
+# Prefixo de tabela de log -> prefixo da tabela principal correspondente
+LOG_TABLE_PREFIXES = {"tl_": "tb_"}
+# Jaccard mínimo entre os nomes de colunas de uma gêmea de log e sua tabela principal
+TWIN_MIN_COLUMN_JACCARD = 0.8
+# Similaridade mínima das estatísticas (0 a 1) para confirmar uma gêmea de log ou uma duplicata estrutural
+MIN_STATS_SIMILARITY = 0.9
+# Sobreposição mínima dos valores de exemplo para confirmar uma duplicata estrutural
+# (tabelas de domínio com as mesmas colunas, mas conteúdos diferentes, não são duplicatas)
+STRUCTURAL_MIN_VALUE_OVERLAP = 0.5
+
+
+def column_signature(table) -> str:
+    """
+    Hash das colunas (nome + tipo, sem depender da ordem) de uma tabela. Usa o hash
+    pré-calculado em 'column_signature' quando presente (resumos do modo streaming).
+    """
+    if 'column_signature' in table:
+        return table['column_signature']
+    columns = sorted((c.get('name', ''), c.get('type', '')) for c in table.get('columns', []))
+    return hashlib.sha1(json.dumps(columns).encode('utf-8')).hexdigest()
+
+
+def sample_hashes(values):
+    """Hashes de 64 bits dos valores de exemplo: o Jaccard entre eles é o mesmo dos valores."""
+    return sorted({int.from_bytes(hashlib.blake2b(json.dumps(v, ensure_ascii=False).encode('utf-8'),
+                                                  digest_size=8).digest(), 'big') for v in values})
+
+
+def _sample_set(stats):
+    if 'sample_hashes' in stats:
+        return set(stats['sample_hashes'])
+    return set(stats.get('sample_values') or [])
+
+
+def _ratio(a, b) -> float:
+    """Razão menor/maior entre dois números não negativos (1.0 quando ambos são zero)."""
+    a, b = a or 0, b or 0
+    if a == b:
+        return 1.0
+    return min(a, b) / max(a, b) if max(a, b) > 0 else 1.0
+
+
+def stats_similarity(table_a, table_b) -> float:
+    """
+    Similaridade (0 a 1) entre as estatísticas de duas tabelas: razão dos row_count
+    multiplicada pela média, nas colunas em comum, da proximidade do percentual de nulos
+    e da razão entre as contagens de distintos.
+    """
+    cols_a = {c['name']: c.get('stats') or {} for c in table_a.get('columns', [])}
+    cols_b = {c['name']: c.get('stats') or {} for c in table_b.get('columns', [])}
+    shared = [name for name in cols_a if name in cols_b]
+    if not shared:
+        return 0.0
+
+    scores = []
+    for name in shared:
+        sa, sb = cols_a[name], cols_b[name]
+        if 'null_percentage' not in sa or 'null_percentage' not in sb:
+            continue
+        null_score = 1 - abs(sa['null_percentage'] - sb['null_percentage']) / 100
+        distinct_score = _ratio(sa.get('distinct_count'), sb.get('distinct_count'))
+        scores.append((null_score + distinct_score) / 2)
+
+    column_score = sum(scores) / len(scores) if scores else 1.0
+    return round(_ratio(table_a.get('row_count'), table_b.get('row_count')) * column_score, 4)
+
+
+def value_overlap(table_a, table_b):
+    """
+    Média, nas colunas em comum que têm sample_values (ou sample_hashes, nos resumos do modo
+    streaming), do Jaccard entre os valores de exemplo.
+    None quando não há valores para comparar (ex.: extração sem estatísticas).
+    """
+    cols_a = {c['name']: _sample_set(c.get('stats') or {}) for c in table_a.get('columns', [])}
+    cols_b = {c['name']: _sample_set(c.get('stats') or {}) for c in table_b.get('columns', [])}
+    scores = []
+    for name, set_a in cols_a.items():
+        set_b = cols_b.get(name)
+        if set_a and set_b:
+            scores.append(len(set_a & set_b) / len(set_a | set_b))
+    return sum(scores) / len(scores) if scores else None
+
+
+def column_jaccard(table_a, table_b) -> float:
+    names_a = {c['name'] for c in table_a.get('columns', [])}
+    names_b = {c['name'] for c in table_b.get('columns', [])}
+    if not names_a and not names_b:
+        return 1.0
+    return len(names_a & names_b) / len(names_a | names_b)
+
+
+def _is_log_table(table_name) -> bool:
+    return any(table_name.startswith(prefix) for prefix in LOG_TABLE_PREFIXES)
+
+
+def _representative_key(table):
+    """Ordem de preferência da representante: não-log, mais linhas, nome."""
+    return (_is_log_table(table['table_name']), -(table.get('row_count') or 0),
+            table.get('schema', ''), table['table_name'])
+
+
+def detect_duplicate_groups(metadata):
+    """
+    Agrupa tabelas duplicadas. Nunca compara todos os pares: só tabelas com o mesmo hash de
+    colunas e pares de nomes gêmeos (tl_x/tb_x), localizados por índice.
+
+    Args:
+        metadata: Lista de tabelas no formato do JSON consolidado
+
+    Returns:
+        Lista de grupos {"representative", "duplicates": [{schema, table_name, row_count, reason, similarity}]}
+    """
+    by_signature = {}
+    by_name = {}
+    for table in metadata:
+        if 'error' in table:
+            continue
+        by_signature.setdefault(column_signature(table), []).append(table)
+        by_name[(table.get('schema'), table['table_name'])] = table
+
+    # Une os membros de cada grupo (union-find sobre schema.tabela)
+    parent = {}
+    reasons = {}
+
+    def key(table):
+        return (table.get('schema'), table['table_name'])
+
+    def find(k):
+        parent.setdefault(k, k)
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    def union(a, b, reason):
+        ka, kb = find(key(a)), find(key(b))
+        if ka != kb:
+            parent[kb] = ka
+        reasons[key(a)] = reasons.get(key(a), reason)
+        reasons[key(b)] = reasons.get(key(b), reason)
+
+    # 1. Duplicatas estruturais: mesma assinatura de colunas (só compara dentro do mesmo hash)
+    for tables in by_signature.values():
+        for i, table in enumerate(tables):
+            for other in tables[i + 1:]:
+                overlap = value_overlap(table, other)
+                if (stats_similarity(table, other) >= MIN_STATS_SIMILARITY
+                        and (overlap is None or overlap >= STRUCTURAL_MIN_VALUE_OVERLAP)):
+                    union(table, other, "estrutura_identica")
+
+    # 2. Gêmeas de log: tl_x -> tb_x no mesmo schema, colunas quase iguais e estatísticas próximas
+    for table in metadata:
+        if 'error' in table:
+            continue
+        for log_prefix, main_prefix in LOG_TABLE_PREFIXES.items():
+            if not table['table_name'].startswith(log_prefix):
+                continue
+            twin = by_name.get((table.get('schema'), main_prefix + table['table_name'][len(log_prefix):]))
+            if twin is None:
+                continue
+            if (column_jaccard(table, twin) >= TWIN_MIN_COLUMN_JACCARD
+                    and stats_similarity(table, twin) >= MIN_STATS_SIMILARITY):
+                union(twin, table, "gemea_de_log")
+
+    groups = {}
+    for k in parent:
+        groups.setdefault(find(k), []).append(by_name[k])
+
+    result = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=_representative_key)
+        representative = members[0]
+        duplicates = []
+        for table in members[1:]:
+            duplicates.append({
+                "schema": table.get('schema'),
+                "table_name": table['table_name'],
+                "row_count": table.get('row_count'),
+                "reason": reasons.get(key(table), "estrutura_identica"),
+                "similarity": stats_similarity(representative, table),
+            })
+        result.append({
+            "representative": {"schema": representative.get('schema'), "table_name": representative['table_name']},
+            "duplicates": duplicates,
+        })
+    result.sort(key=lambda g: (g["representative"]["schema"] or '', g["representative"]["table_name"]))
+    return result
+
+
+def collapse_duplicates(metadata, groups):
+    """
+    Remove as duplicatas, mantendo só as representantes.
+
+    Returns:
+        (metadados_colapsados, lista_de_tabelas_removidas)
+    """
+    removed_keys = {(d['schema'], d['table_name']) for g in groups for d in g['duplicates']}
+    kept = [t for t in metadata if (t.get('schema'), t.get('table_name')) not in removed_keys]
+    removed = [t for t in metadata if (t.get('schema'), t.get('table_name')) in removed_keys]
+    return kept, removed
@@ -3,31 +3,72 @@
 Script para filtrar tabelas de metadados com base em critérios de row_count.
 
 Critérios de filtragem:
-- Remove APENAS tabelas com row_count igual a 0
+- Remove tabelas com row_count igual a 0
+- Aplica as regras declarativas de regras_filtragem.json (schema, nome, row_count, colunas,
+  nulos, grau de FK, exclusões do perfil do usuário); ver rule_engine.py
+- Detecta tabelas duplicadas (mesma estrutura) e gêmeas de log (tl_x de tb_x) e,
+  opcionalmente (--colapsar-duplicatas), mantém apenas uma representante de cada grupo
 
 O JSON de saída mantém exatamente o mesmo formato do JSON de entrada.
+
+Com --streaming, o arquivo é lido duas vezes, uma tabela por vez: a primeira passada guarda só um
+resumo de cada tabela (nomes, row_count, FKs, nulos e distintos por coluna e hashes da assinatura de
+colunas e dos valores de exemplo) e decide o que manter; a segunda grava as tabelas mantidas direto no
+arquivo de saída. A memória da primeira passada ainda cresce com o número de tabelas e de colunas
+(ver table_summary), mas não com o tamanho das estatísticas.
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 from datetime import datetime
 
+from duplicate_tables import detect_duplicate_groups, collapse_duplicates, column_signature, sample_hashes
+from rule_engine import load_rules, load_profile_exclusions, load_search_path, apply_rules
+
+# common/ fica na raiz do repositório
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from common.json_stream import iter_json_array, StreamingJSONArrayWriter  # noqa: E402
+
+
+# NOVO: Detecção de duplicatas / tabelas de log
+DETECT_DUPLICATES = True        # Lista os grupos de duplicatas no relatório e em tabelas_duplicadas.json
+COLLAPSE_DUPLICATES = False     # Remove as duplicatas, mantendo a representante (sobrescrito por --colapsar-duplicatas)
+
+# NOVO: Regras declarativas de pré-filtragem (ignoradas se o arquivo não existir ou com --sem-regras)
+SCRIPT_DIR = Path(__file__).resolve().parent
+RULES_FILE = SCRIPT_DIR / "regras_filtragem.json"        # Sobrescrito por --regras=<arquivo .json/.yaml>
+PROFILE_FILE = SCRIPT_DIR.parent / "prompt_generator" / "perfil_usuario.json"   # Fonte do predicado profile_exclusions
+FK_GRAPH_FILE = "metadata_fk_graph.json"   # Grafo do step1 ao lado do arquivo de entrada: search_path das FKs sem schema
+
+# NOVO: Leitura incremental (memória proporcional ao resumo das tabelas, não ao tamanho do JSON)
+STREAMING_MODE = False          # Sobrescrito por --streaming
+
 
-def generate_report(metadata, filtered_metadata, removed_tables, output_file: str):
+def generate_report(total_tables: int, filtered_metadata, removed_tables, output_file: str,
+                    duplicate_groups=None, collapsed: bool = False, rule_decisions=None,
+                    rules_file=None):
     """
     Gera um relatório em Markdown com as estatísticas da filtragem.
     
     Args:
-        metadata: Lista original de tabelas
-        filtered_metadata: Lista filtrada de tabelas
-        removed_tables: Lista de tabelas removidas
+        total_tables: Total de tabelas no arquivo original
+        filtered_metadata: Lista filtrada de tabelas (só schema, table_name e row_count são usados)
+        removed_tables: Lista de tabelas removidas (idem)
         output_file: Caminho para o arquivo de relatório
+        duplicate_groups: Grupos de tabelas duplicadas (detect_duplicate_groups)
+        collapsed: Se as duplicatas foram removidas da saída
+        rule_decisions: Tabelas decididas por cada regra (apply_rules)
+        rules_file: Arquivo de regras aplicado
     """
     
-    total_tables = len(metadata)
     filtered_count = len(filtered_metadata)
     removed_count = len(removed_tables)
+    duplicate_groups = duplicate_groups or []
+    duplicate_count = sum(len(g['duplicates']) for g in duplicate_groups)
     
     report = f"""# Relatório de Filtragem de Metadados
 
@@ -39,11 +80,24 @@ def generate_report(metadata, filtered_metadata, removed_tables, output_file: st
 - **Tabelas mantidas:** {filtered_count}
 - **Tabelas removidas:** {removed_count}
 - **Percentual removido:** {(removed_count/total_tables)*100:.2f}%
+"""
+    if rule_decisions is not None:
+        rule_excluded = sum(len(d['tables']) for d in rule_decisions if d['action'] == 'exclude')
+        report += f"- **Removidas por regras:** {rule_excluded} (incluídas nas tabelas removidas)\n"
+    if collapsed:
+        report += f"- **Duplicatas colapsadas:** {duplicate_count} (incluídas nas tabelas removidas)\n"
 
+    report += """
 ## Critério de Filtragem
 
-Foram removidas **apenas** as tabelas com `row_count = 0` (tabelas vazias).
+Foram removidas as tabelas com `row_count = 0` (tabelas vazias).
+"""
+    if rule_decisions is not None:
+        report += f"\nTambém foram aplicadas as regras declarativas de `{Path(rules_file).name}` (detalhes abaixo).\n"
+    if collapsed:
+        report += "\nTambém foram removidas as tabelas duplicadas e gêmeas de log, mantendo uma representante por grupo.\n"
 
+    report += f"""
 ## Tabelas Removidas
 
 Total de tabelas removidas: **{removed_count}**
@@ -94,6 +148,38 @@ Total de tabelas mantidas: **{filtered_count}**
         if len(filtered_metadata) > 20:
             report += f"\n*... e mais {len(filtered_metadata) - 20} tabelas*\n"
     
+    if rule_decisions is not None:
+        report += """
+## Regras de Filtragem
+
+Avaliadas em ordem; a primeira regra que casa decide se a tabela é mantida (`keep`) ou removida (`exclude`).
+
+| Regra | Ação | Tabelas | Descrição |
+|-------|------|---------|-----------|
+"""
+        for decision in rule_decisions:
+            report += (f"| {decision['name']} | {decision['action']} | {len(decision['tables'])} "
+                       f"| {decision['description']} |\n")
+        for decision in rule_decisions:
+            if decision['tables']:
+                report += f"\n**{decision['name']}** ({decision['action']}): " + ", ".join(f"`{t}`" for t in decision['tables']) + "\n"
+
+    if duplicate_groups:
+        report += f"""
+## Tabelas Duplicadas e Tabelas de Log
+
+Grupos detectados: **{len(duplicate_groups)}** ({duplicate_count} tabelas duplicadas).
+{"As duplicatas foram removidas; cada grupo é classificado apenas pela representante, e o step3 copia a classificação para as duplicatas (via `tabelas_duplicadas.json`)." if collapsed else "As duplicatas foram apenas sinalizadas (use `--colapsar-duplicatas` para removê-las)."}
+
+| Representante | Duplicata | Motivo | Similaridade |
+|---------------|-----------|--------|--------------|
+"""
+        for group in duplicate_groups:
+            rep = group['representative']
+            for dup in group['duplicates']:
+                report += (f"| {rep['schema']}.{rep['table_name']} | {dup['schema']}.{dup['table_name']} "
+                           f"| {dup['reason']} | {dup['similarity']:.2f} |\n")
+
     report += """
 ## Justificativa Científica
 
@@ -119,41 +205,123 @@ A remoção de tabelas com `row_count = 0` é justificada pelos seguintes motivo
     print(f"Relatório salvo em: {output_file}")
 
 
-def filter_metadata(input_file: str, output_file: str, report_file: str):
+def table_summary(table, position: int):
+    """
+    Resumo de uma tabela com só o que a seleção usa: schema, nome, row_count e erro, as FKs (grau no
+    grafo), o hash da assinatura de colunas e, por coluna, nome, nulos, distintos e os hashes de 64 bits
+    dos valores de exemplo (sobreposição das duplicatas), no lugar dos valores em si.
+
+    Continua O(tabelas x colunas): os nomes das colunas ficam porque as regras (column_regex,
+    column_count) e as gêmeas de log (Jaccard dos nomes) comparam tabelas entre si; ~15 hashes por coluna.
+    """
+    summary = {key: table[key] for key in ('schema', 'table_name', 'row_count', 'error') if key in table}
+    summary['position'] = position
+    summary['foreign_keys'] = [{"referred_schema": fk.get('referred_schema'), "referred_table": fk.get('referred_table')}
+                               for fk in table.get('foreign_keys', []) or []]
+    summary['column_signature'] = column_signature(table)
+    columns = []
+    for column in table.get('columns', []) or []:
+        stats = column.get('stats')
+        if isinstance(stats, dict):
+            summary_stats = {key: stats[key] for key in ('null_percentage', 'distinct_count') if key in stats}
+            if stats.get('sample_values'):
+                summary_stats['sample_hashes'] = sample_hashes(stats['sample_values'])
+            stats = summary_stats
+        columns.append({"name": column.get('name'), "stats": stats})
+    summary['columns'] = columns
+    return summary
+
+
+def select_tables(metadata, output_file: str, collapse_duplicates_flag: bool, rules_file, search_path=None):
+    """
+    Decide quais tabelas seguem para a saída: remove as vazias, aplica as regras e detecta
+    (e opcionalmente colapsa) as duplicatas. `search_path` resolve as FKs sem schema nas regras.
+
+    Returns:
+        (tabelas_mantidas, tabelas_removidas, grupos_de_duplicatas, decisões_das_regras)
+    """
+    # Filtrar tabelas com row_count > 0
+    filtered_metadata = [
+        table for table in metadata 
+        if table.get('row_count', 0) > 0
+    ]
+    
+    # Tabelas removidas (row_count = 0)
+    removed_tables = [
+        table for table in metadata 
+        if table.get('row_count', 0) == 0
+    ]
+    
+    # NOVO: Regras declarativas (antes das duplicatas, para não eleger como representante uma tabela excluída)
+    rule_decisions = None
+    if rules_file and Path(rules_file).exists():
+        print(f"\nAplicando regras de: {rules_file}")
+        rules_config = load_rules(rules_file)
+        filtered_metadata, rule_excluded, rule_decisions = apply_rules(
+            filtered_metadata, rules_config, load_profile_exclusions(PROFILE_FILE), search_path)
+        removed_tables = removed_tables + rule_excluded
+        for decision in rule_decisions:
+            print(f"  - {decision['name']} ({decision['action']}): {len(decision['tables'])} tabelas")
+    elif rules_file:
+        print(f"\nArquivo de regras não encontrado ({rules_file}); regras ignoradas")
+
+    # NOVO: Duplicatas estruturais e gêmeas de log (entre as tabelas não vazias)
+    duplicate_groups = []
+    if DETECT_DUPLICATES or collapse_duplicates_flag:
+        duplicate_groups = detect_duplicate_groups(filtered_metadata)
+        duplicate_count = sum(len(g['duplicates']) for g in duplicate_groups)
+        print(f"\nGrupos de tabelas duplicadas: {len(duplicate_groups)} ({duplicate_count} duplicatas)")
+        for group in duplicate_groups[:10]:
+            names = ", ".join(d['table_name'] for d in group['duplicates'])
+            print(f"  - {group['representative']['table_name']} <- {names}")
+        duplicates_file = Path(output_file).parent / "tabelas_duplicadas.json"
+        with open(duplicates_file, 'w', encoding='utf-8') as f:
+            json.dump(duplicate_groups, f, indent=2, ensure_ascii=False)
+        print(f"Grupos de duplicatas salvos em: {duplicates_file}")
+        if collapse_duplicates_flag:
+            filtered_metadata, collapsed_tables = collapse_duplicates(filtered_metadata, duplicate_groups)
+            removed_tables = removed_tables + collapsed_tables
+
+    return filtered_metadata, removed_tables, duplicate_groups, rule_decisions
+
+
+def filter_metadata(input_file: str, output_file: str, report_file: str,
+                    collapse_duplicates_flag: bool = COLLAPSE_DUPLICATES, rules_file=RULES_FILE,
+                    streaming: bool = STREAMING_MODE):
     """
     Filtra tabelas de metadados baseado no row_count.
-    Remove APENAS tabelas com row_count = 0.
+    Remove tabelas com row_count = 0, as excluídas pelas regras declarativas e,
+    opcionalmente, as duplicatas de outras tabelas.
     
     Args:
         input_file: Caminho para o arquivo JSON de entrada
         output_file: Caminho para o arquivo JSON de saída
         report_file: Caminho para o arquivo de relatório MD
+        collapse_duplicates_flag: Remove as duplicatas, mantendo a representante de cada grupo
+        rules_file: Arquivo de regras (.json/.yaml); None desliga as regras
+        streaming: Lê o arquivo uma tabela por vez, em duas passadas, sem carregá-lo inteiro
     """
     
     # Ler o arquivo JSON de entrada
-    print(f"Lendo arquivo: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
+    print(f"Lendo arquivo: {input_file}" + (" (streaming)" if streaming else ""))
+    if streaming:
+        # 1ª passada: só o resumo de cada tabela fica em memória
+        metadata = [table_summary(table, position) for position, table in enumerate(iter_json_array(input_file))]
+    else:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
     
     total_tables = len(metadata)
     print(f"Total de tabelas no arquivo original: {total_tables}")
     
-    # Filtrar tabelas com row_count > 0
-    filtered_metadata = [
-        table for table in metadata 
-        if table.get('row_count', 0) > 0
-    ]
-    
-    # Tabelas removidas (row_count = 0)
-    removed_tables = [
-        table for table in metadata 
-        if table.get('row_count', 0) == 0
-    ]
+    filtered_metadata, removed_tables, duplicate_groups, rule_decisions = select_tables(
+        metadata, output_file, collapse_duplicates_flag, rules_file,
+        load_search_path(Path(input_file).parent / FK_GRAPH_FILE))
     
     filtered_count = len(filtered_metadata)
     removed_count = len(removed_tables)
     
-    print(f"\nTabelas removidas (row_count = 0): {removed_count}")
+    print(f"\nTabelas removidas: {removed_count}")
     print(f"Tabelas mantidas: {filtered_count}")
     print(f"Percentual removido: {(removed_count/total_tables)*100:.2f}%")
     
@@ -167,12 +335,25 @@ def filter_metadata(input_file: str, output_file: str, report_file: str):
     
     # Salvar o JSON filtrado mantendo o formato original
     print(f"\nSalvando arquivo filtrado: {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(filtered_metadata, f, indent=2, ensure_ascii=False)
+    if streaming:
+        # 2ª passada: grava as tabelas mantidas à medida que são lidas (arquivo temporário + rename,
+        # já que a saída pode ser o próprio arquivo de entrada)
+        kept_positions = {table['position'] for table in filtered_metadata}
+        partial_file = f"{output_file}.partial"
+        with StreamingJSONArrayWriter(partial_file) as writer:
+            for position, table in enumerate(iter_json_array(input_file)):
+                if position in kept_positions:
+                    writer.write(table)
+        os.replace(partial_file, output_file)
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(filtered_metadata, f, indent=2, ensure_ascii=False)
     
     # Gerar relatório
     print(f"\nGerando relatório...")
-    generate_report(metadata, filtered_metadata, removed_tables, report_file)
+    generate_report(total_tables, filtered_metadata, removed_tables, report_file,
+                    duplicate_groups, collapsed=collapse_duplicates_flag,
+                    rule_decisions=rule_decisions, rules_file=rules_file)
     
     print("\nProcesso concluído com sucesso!")
 
@@ -185,13 +366,23 @@ def main():
     output_file = "metadata_output_advanced/metadata_advanced_consolidated_filtered.json"
     report_file = "metadata_output_advanced/relatorio_filtragem.md"
     
-    # Verificar argumentos da linha de comando
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
-    if len(sys.argv) > 3:
-        report_file = sys.argv[3]
+    # Verificar argumentos da linha de comando (opções "--" podem vir em qualquer posição)
+    options = [a for a in sys.argv[1:] if a.startswith("--")]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) > 0:
+        input_file = args[0]
+    if len(args) > 1:
+        output_file = args[1]
+    if len(args) > 2:
+        report_file = args[2]
+    collapse = COLLAPSE_DUPLICATES or "--colapsar-duplicatas" in options
+    rules_file = RULES_FILE
+    for option in options:
+        if option.startswith("--regras="):
+            rules_file = option.split("=", 1)[1]
+    if "--sem-regras" in options:
+        rules_file = None
+    streaming = STREAMING_MODE or "--streaming" in options
     
     # Verificar se o arquivo de entrada existe
     if not Path(input_file).exists():
@@ -206,7 +397,8 @@ def main():
     
     # Executar filtragem
     try:
-        filter_metadata(input_file, output_file, report_file)
+        filter_metadata(input_file, output_file, report_file, collapse_duplicates_flag=collapse,
+                        rules_file=rules_file, streaming=streaming)
     except Exception as e:
         print(f"ERRO durante a execução: {e}")
         import traceback
@@ -219,7 +411,8 @@ if __name__ == "__main__":
     print("Script de Filtragem de Metadados")
     print("=" * 70)
     print()
-    print("Uso: python filter_metadata.py [input_file] [output_file] [report_file]")
+    print("Uso: python filter_metadata.py [input_file] [output_file] [report_file] [--colapsar-duplicatas]")
+    print("                              [--regras=<arquivo>] [--sem-regras] [--streaming]")
     print()
     print("Argumentos:")
     print("  input_file   : Arquivo JSON de entrada")
@@ -228,8 +421,13 @@ if __name__ == "__main__":
     print("                 (padrão: metadata_output_advanced/metadata_advanced_consolidated_filtered.json)")
     print("  report_file  : Arquivo de relatório MD")
     print("                 (padrão: metadata_output_advanced/relatorio_filtragem.md)")
+    print("  --colapsar-duplicatas : Mantém só uma representante de cada grupo de tabelas")
+    print("                          duplicadas / gêmeas de log (tl_x de tb_x)")
+    print("  --regras=<arquivo>    : Regras declarativas .json/.yaml (padrão: regras_filtragem.json)")
+    print("  --sem-regras          : Não aplica as regras declarativas")
+    print("  --streaming           : Lê o JSON uma tabela por vez (memória constante por tabela)")
     print()
-    print("Critério: Remove APENAS tabelas com row_count = 0")
+    print("Critério: Remove tabelas com row_count = 0 e as excluídas pelas regras (duplicatas são sinalizadas no relatório)")
     print()
     print("=" * 70)
     print()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Motor de regras declarativas para pré-filtrar tabelas antes da classificação.
+
+As regras ficam em um arquivo JSON (ou YAML, se o pyyaml estiver instalado) e são avaliadas
+em ordem: a primeira regra cujo "when" casa decide a ação ("keep" ou "exclude") da tabela;
+sem regra aplicável vale "default_action". Exemplo:
+
+    {
+      "default_action": "keep",
+      "rules": [
+        {"name": "ligadas ao cidadão", "action": "keep", "when": {"fk_degree": {"min": 3}}},
+        {"name": "migração", "action": "exclude", "when": {"name_regex": "(?i)migracao"}},
+        {"name": "quase vazias", "action": "exclude", "when": {"all": [
+            {"row_count": {"max": 10}}, {"avg_null_percentage": {"min": 90}}]}}
+      ]
+    }
+
+Predicados disponíveis em "when" (vários na mesma regra são combinados com E):
+    schema                  texto ou lista de schemas
+    name_regex              expressão regular sobre o nome da tabela
+    column_regex            expressão regular; casa se alguma coluna casar
+    row_count, column_count, avg_null_percentage, max_null_percentage,
+    fk_degree, fk_in_degree, fk_out_degree
+                            faixa {"min": x, "max": y} (limites inclusivos, ambos opcionais)
+    terms                   lista de termos procurados no nome da tabela (sem acentos/maiúsculas)
+    profile_exclusions      true = usa os termos de "exclusoes" do perfil_usuario.json
+    all / any / not         combinação de predicados
+
+As características de cada tabela (contagens, nulos, grau no grafo de FKs) são calculadas uma
+única vez, e as regras são compiladas em funções antes da varredura.
+"""
+
+import json
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# common/ fica na raiz do repositório
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from common.fk_refs import resolve_referred_table  # noqa: E402
+
+
+RANGE_FEATURES = ("row_count", "column_count", "avg_null_percentage", "max_null_percentage",
+                  "fk_degree", "fk_in_degree", "fk_out_degree")
+
+
+def normalize_term(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços/hífens como '_' (o padrão dos nomes de tabelas)."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[\s\-]+', '_', text.strip().lower())
+
+
+def load_rules(rules_file: str):
+    """Lê o arquivo de regras (.json, ou .yaml/.yml com pyyaml instalado)."""
+    path = Path(rules_file)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ImportError("pyyaml não encontrado. Instale com: pip install pyyaml (ou use regras em JSON)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def load_profile_exclusions(profile_file: str):
+    """Termos de "exclusoes" do perfil_usuario.json (lista vazia se o arquivo não existir)."""
+    if not profile_file or not Path(profile_file).exists():
+        return []
+    with open(profile_file, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    return profile.get('perfil_usuario', profile).get('exclusoes', [])
+
+
+def load_search_path(fk_graph_file):
+    """search_path gravado pelo step1 no grafo de FKs (None se o arquivo não existir)."""
+    if not fk_graph_file or not Path(fk_graph_file).exists():
+        return None
+    with open(fk_graph_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('search_path')
+
+
+def table_features(metadata, search_path=None):
+    """
+    Calcula, em uma passada, as características usadas pelos predicados de cada tabela.
+    O grau de FK considera as tabelas distintas ligadas (saída = referenciadas, entrada = que referenciam).
+    FKs com referred_schema = None são resolvidas pelo `search_path` da extração, como no grafo de FKs
+    do step1 (common/fk_refs.py).
+    """
+    known = {(table.get('schema'), table.get('table_name')) for table in metadata}
+    out_edges = {}
+    in_edges = {}
+    for table in metadata:
+        source = (table.get('schema'), table.get('table_name'))
+        for fk in table.get('foreign_keys', []) or []:
+            target = resolve_referred_table(fk, table.get('schema'), known, search_path)
+            out_edges.setdefault(source, set()).add(target)
+            in_edges.setdefault(target, set()).add(source)
+
+    features = []
+    for table in metadata:
+        name = table.get('table_name', '')
+        columns = table.get('columns', []) or []
+        null_pcts = [c['stats']['null_percentage'] for c in columns
+                     if isinstance(c.get('stats'), dict) and 'null_percentage' in c['stats']]
+        fk_out = len(out_edges.get((table.get('schema'), name), ()))
+        fk_in = len(in_edges.get((table.get('schema'), name), ()))
+        features.append({
+            "schema": table.get('schema'),
+            "table_name": name,
+            "column_names": [c.get('name', '') for c in columns],
+            "normalized_name": normalize_term(name),
+            "row_count": table.get('row_count', 0),
+            "column_count": len(columns),
+            "avg_null_percentage": sum(null_pcts) / len(null_pcts) if null_pcts else 0.0,
+            "max_null_percentage": max(null_pcts) if null_pcts else 0.0,
+            "fk_out_degree": fk_out,
+            "fk_in_degree": fk_in,
+            "fk_degree": fk_out + fk_in,
+        })
+    return features
+
+
+def compile_condition(when, profile_exclusions):
+    """Converte o dicionário "when" de uma regra em uma função características -> bool."""
+    if not isinstance(when, dict):
+        raise ValueError(f"Condição inválida (esperado um objeto): {when!r}")
+
+    checks = []
+    for key, value in when.items():
+        if key == 'all':
+            subs = [compile_condition(v, profile_exclusions) for v in value]
+            checks.append(lambda f, subs=subs: all(s(f) for s in subs))
+        elif key == 'any':
+            subs = [compile_condition(v, profile_exclusions) for v in value]
+            checks.append(lambda f, subs=subs: any(s(f) for s in subs))
+        elif key == 'not':
+            sub = compile_condition(value, profile_exclusions)
+            checks.append(lambda f, sub=sub: not sub(f))
+        elif key == 'schema':
+            schemas = {value} if isinstance(value, str) else set(value)
+            checks.append(lambda f, schemas=schemas: f['schema'] in schemas)
+        elif key == 'name_regex':
+            pattern = re.compile(value)
+            checks.append(lambda f, pattern=pattern: bool(pattern.search(f['table_name'])))
+        elif key == 'column_regex':
+            pattern = re.compile(value)
+            checks.append(lambda f, pattern=pattern: any(pattern.search(c) for c in f['column_names']))
+        elif key in RANGE_FEATURES:
+            low, high = value.get('min'), value.get('max')
+            checks.append(lambda f, key=key, low=low, high=high:
+                          (low is None or f[key] >= low) and (high is None or f[key] <= high))
+        elif key in ('terms', 'profile_exclusions'):
+            terms = profile_exclusions if key == 'profile_exclusions' else value
+            if key == 'profile_exclusions' and not value:
+                continue
+            normalized = [normalize_term(t) for t in terms if str(t).strip()]
+            checks.append(lambda f, normalized=normalized: any(t in f['normalized_name'] for t in normalized))
+        else:
+            raise ValueError(f"Predicado desconhecido na regra: {key}")
+
+    return lambda f: all(check(f) for check in checks)
+
+
+def compile_rules(rules_config, profile_exclusions=None):
+    """Valida e compila as regras; devolve (ação_padrão, [(regra, função)])."""
+    default_action = rules_config.get('default_action', 'keep')
+    compiled = []
+    for i, rule in enumerate(rules_config.get('rules', [])):
+        action = rule.get('action', 'exclude')
+        if action not in ('keep', 'exclude') or default_action not in ('keep', 'exclude'):
+            raise ValueError(f"Ação inválida na regra {i + 1}: use 'keep' ou 'exclude'")
+        info = {"name": rule.get('name', f"regra_{i + 1}"), "action": action,
+                "description": rule.get('description', '')}
+        compiled.append((info, compile_condition(rule.get('when', {}), profile_exclusions or [])))
+    return default_action, compiled
+
+
+def apply_rules(metadata, rules_config, profile_exclusions=None, search_path=None):
+    """
+    Avalia as regras sobre todas as tabelas.
+
+    Args:
+        metadata: Lista de tabelas no formato do JSON consolidado
+        rules_config: Dicionário de regras (ver load_rules)
+        profile_exclusions: Termos de exclusão do perfil do usuário
+        search_path: search_path da extração, para resolver FKs sem schema (ver load_search_path)
+
+    Returns:
+        (tabelas_mantidas, tabelas_excluidas, decisões), em que decisões traz, para cada regra,
+        {name, action, description, tables} com as tabelas ("schema.tabela") que ela decidiu
+    """
+    default_action, compiled = compile_rules(rules_config, profile_exclusions)
+    kept, excluded = [], []
+    decisions = [dict(info, tables=[]) for info, _ in compiled]
+    for table, features in zip(metadata, table_features(metadata, search_path)):
+        action = default_action
+        for decision, (info, condition) in zip(decisions, compiled):
+            if condition(features):
+                action = info['action']
+                decision['tables'].append(f"{features['schema']}.{features['table_name']}")
+                break
+        (kept if action == 'keep' else excluded).append(table)
+    return kept, excluded, decisions
@@ -0,0 +1,50 @@
+"""
+Testes do motor de regras. Rodar com `python -m pytest` dentro de step2/.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "step1"))
+
+from fk_graph import FKGraphBuilder  # noqa: E402
+from rule_engine import table_features, apply_rules  # noqa: E402
+
+
+def cross_schema_metadata():
+    """saude.tb_atendimento -> tb_cidadao sem referred_schema: a tabela referenciada está em public."""
+    return [
+        {"schema": "public", "table_name": "tb_cidadao", "row_count": 10, "columns": [], "foreign_keys": []},
+        {"schema": "saude", "table_name": "tb_atendimento", "row_count": 10, "columns": [], "foreign_keys": [
+            {"constrained_columns": ["co_cidadao"], "referred_schema": None,
+             "referred_table": "tb_cidadao", "referred_columns": ["co_seq_cidadao"]},
+        ]},
+    ]
+
+
+def test_fk_without_schema_resolves_through_search_path():
+    search_path = ["public"]
+    features = {(f["schema"], f["table_name"]): f for f in table_features(cross_schema_metadata(), search_path)}
+    assert features[("public", "tb_cidadao")]["fk_in_degree"] == 1
+    assert features[("saude", "tb_atendimento")]["fk_out_degree"] == 1
+
+
+def test_rule_engine_and_fk_graph_agree_on_cross_schema_fk():
+    search_path = ["public"]
+    builder = FKGraphBuilder(search_path)
+    for table in cross_schema_metadata():
+        builder.add_table(table)
+    graph = builder.build()
+
+    features = table_features(cross_schema_metadata(), search_path)
+    for f in features:
+        node = graph["nodes"][f"{f['schema']}.{f['table_name']}"]
+        assert f["fk_in_degree"] == node["in_degree"]
+        assert f["fk_out_degree"] == node["out_degree"]
+    assert "saude.tb_cidadao" not in graph["nodes"]
+
+
+def test_fk_degree_rule_counts_cross_schema_reference():
+    rules = {"default_action": "exclude",
+             "rules": [{"name": "referenciadas", "action": "keep", "when": {"fk_in_degree": {"min": 1}}}]}
+    kept, _, _ = apply_rules(cross_schema_metadata(), rules, search_path=["public"])
+    assert [t["table_name"] for t in kept] == ["tb_cidadao"]
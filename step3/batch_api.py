@@ -0,0 +1,133 @@
+"""
+Modo lote: envio das classificações pela Batch API (formato da OpenAI) em vez de uma chamada por tabela.
+
+Fluxo: as requisições de chat de todas as tabelas vão para um arquivo JSONL (uma linha por
+requisição, identificada por custom_id), o arquivo é enviado com purpose="batch", o lote é criado
+e consultado periodicamente até terminar, e as respostas são lidas dos arquivos de saída e de erro.
+O provedor processa o lote em até 24h, com custo menor e sem os limites de requisições/min das
+chamadas individuais; serve para a classificação noturna do banco inteiro.
+
+Um arquivo de estado guarda o id do lote enviado: se a execução for interrompida durante a espera,
+rodar de novo com as mesmas entradas retoma o mesmo lote em vez de enviar (e pagar) outro.
+
+Para testes, ApiTests/mockOpenAiServer atende os mesmos endpoints localmente.
+"""
+
+import hashlib
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def write_batch_file(requests: list, path) -> str:
+    """
+    Grava as requisições no formato JSONL da Batch API.
+
+    Args:
+        requests: Lista de (custom_id, corpo da requisição de chat completions)
+        path: Arquivo de saída
+
+    Returns:
+        SHA-256 do conteúdo (identifica o lote para retomá-lo)
+    """
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                   ensure_ascii=False)
+        for custom_id, body in requests
+    ]
+    content = "\n".join(lines) + "\n"
+    Path(path).write_text(content, encoding='utf-8')
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def load_batch_state(state_file, requests_sha256: str):
+    """Id do lote já enviado com exatamente estas requisições, ou None."""
+    if not Path(state_file).exists():
+        return None
+    with open(state_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get("requests_sha256") != requests_sha256:
+        return None
+    return state.get("batch_id")
+
+
+def save_batch_state(state_file, batch_id: str, requests_sha256: str, provider: str, model: str):
+    state = {
+        "batch_id": batch_id,
+        "requests_sha256": requests_sha256,
+        "provider": provider,
+        "model": model,
+        "submitted_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+def submit_batch(client, batch_file, description: str = None):
+    """Envia o arquivo JSONL e cria o lote. Devolve o objeto do lote."""
+    with open(batch_file, 'rb') as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+        metadata={"description": description} if description else None,
+    )
+
+
+def wait_for_batch(client, batch_id: str, poll_seconds: float, max_wait_seconds: float, label: str = ""):
+    """
+    Consulta o lote até ele chegar a um estado final, imprimindo as mudanças de andamento.
+
+    Raises:
+        TimeoutError: se o lote não terminar em max_wait_seconds (ele continua no provedor e
+            pode ser retomado depois)
+    """
+    started = time.monotonic()
+    last_progress = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = (batch.status, counts.completed if counts else 0, counts.failed if counts else 0)
+        if progress != last_progress:
+            total = counts.total if counts else 0
+            print(f"{label}lote {batch_id}: {batch.status} ({progress[1]}/{total} concluídas, {progress[2]} com erro)")
+            last_progress = progress
+        if batch.status in FINAL_STATUSES:
+            return batch
+        if time.monotonic() - started > max_wait_seconds:
+            raise TimeoutError(f"lote {batch_id} ainda em '{batch.status}' após {max_wait_seconds / 3600:.1f}h")
+        time.sleep(poll_seconds)
+
+
+def read_batch_results(client, batch) -> dict:
+    """
+    Lê os arquivos de saída e de erro de um lote terminado.
+
+    Returns:
+        Dicionário custom_id -> (texto da resposta, None, usage) ou (None, mensagem de erro, None)
+    """
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        text = client.files.content(file_id).text
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            body = response.get("body") or {}
+            if response.get("status_code") == 200 and body.get("choices"):
+                results[entry["custom_id"]] = (body["choices"][0]["message"]["content"], None, body.get("usage"))
+            else:
+                error = entry.get("error") or body.get("error") or {}
+                message = error.get("message") or f"HTTP {response.get('status_code')}"
+                results[entry["custom_id"]] = (None, message, None)
+    return results
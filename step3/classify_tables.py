@@ -0,0 +1,1384 @@
+"""
+Script para classificar tabelas de metadados com vários provedores de LLM (OpenAI, Mistral, DeepSeek).
+
+Classifica cada tabela com um score de relevância (0-100) para estudos de doenças cardiovasculares.
+Gera relatórios em JSON e Markdown para análise detalhada (um par por provedor, lidos pelo
+LLMsOutputAnlyzer/analyze_consensus.py).
+
+Os metadados e o prompt são carregados uma vez e todos os provedores selecionados percorrem as
+mesmas tabelas ao mesmo tempo, cada um com seu cliente, seus limites de taxa e seu pool de
+chamadas. Construção do prompt, leitura da resposta e relatórios são os mesmos para todos.
+
+Os scripts classify_tables_<provedor>.py chamam este módulo com um único provedor.
+"""
+
+import json
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime
+from openai import OpenAI  # Mistral e DeepSeek também são compatíveis com o cliente OpenAI
+from dotenv import load_dotenv
+
+from batch_api import load_batch_state, read_batch_results, save_batch_state, submit_batch, wait_for_batch, write_batch_file
+from llm_scheduler import RateLimiter, estimate_tokens, run_concurrently
+from response_cache import ResponseCache
+from llm_telemetry import CallTelemetry
+
+
+# Metadados no prompt sem indentação (o JSON indentado gasta ~30% a mais de tokens).
+# Use junto com a saída do step2/compact_metadata.py, que já mede o payload nesse formato.
+PROMPT_JSON_COMPACT = True
+
+# Classificação concorrente respeitando os limites de taxa de cada provedor
+CONCURRENCY = 8                 # Chamadas simultâneas por provedor (sobrescrito por --concorrencia=N; 1 = sequencial)
+RESPONSE_TOKENS = 800           # max_tokens de cada resposta
+MAX_RETRIES = 6                 # Novas tentativas do cliente em 429/5xx (com backoff e respeitando o Retry-After)
+TEMPERATURE = 0.1               # Baixa temperatura para respostas mais determinísticas
+SYSTEM_PROMPT = "Você é um especialista em informática médica e doenças cardiovasculares. Responda sempre em JSON válido seguindo exatamente o formato solicitado."
+
+# NOVO: Layout de prefixo fixo: instruções, perfil do usuário e formato de saída vão no prompt de
+# sistema, idêntico em todas as requisições, e só os metadados da tabela vão na mensagem do
+# usuário. No layout original os metadados ficam no meio do prompt (antes da TAREFA FINAL), o que
+# impede o cache de prefixo do provedor de aproveitar o resto. Os tokens de prompt servidos do
+# cache saem nos metadados da execução (token_usage).
+PROMPT_PREFIX_LAYOUT = False    # Ligado por --prompt-prefixo
+PREFIX_LAYOUT_NOTE = "Os metadados a serem avaliados (JSON) são enviados na mensagem do usuário."
+
+# Cache persistente das respostas (mesma requisição = resposta local, sem nova cobrança)
+RESPONSE_CACHE = True           # Desligado por --sem-cache
+CACHE_FILE = "metadata_output_advanced/llm_response_cache.sqlite"   # Compartilhado entre provedores (a chave inclui o provedor)
+CACHE_MAX_MB = 200              # Tamanho máximo; acima dele saem as respostas usadas há mais tempo
+
+# NOVO: Várias tabelas por requisição: as instruções do prompt (~4,8 KB) vão uma vez para K tabelas
+# e a resposta é um array JSON mapeado de volta pelo nome da tabela. Tabelas ausentes da resposta
+# são reclassificadas uma a uma. Use com os metadados compactados do step2/compact_metadata.py.
+PACK_SIZE = 1                   # Tabelas por requisição (1 = uma por requisição; sobrescrito por --agrupar=K)
+PACK_MAX_TOKENS = 12_000        # Limite (estimado) de tokens de metadados por requisição; fecha o pacote antes de K tabelas
+
+# NOVO: Modo lote (Batch API): todas as requisições num arquivo JSONL processado pelo provedor em
+# até 24h, mais barato e sem limites de requisições/min; para a classificação noturna completa
+BATCH_MODE = False              # Ligado por --lote
+BATCH_POLL_SECONDS = 30         # Intervalo entre consultas ao andamento do lote (sobrescrito por --intervalo-lote=N)
+BATCH_MAX_WAIT_HOURS = 24       # Desiste de esperar depois disso (o lote segue no provedor e é retomado na próxima execução)
+
+PROMPT_FILE = "prompt_final_universal.txt"
+INPUT_FILE = "metadata_advanced_consolidated_filtered.json"
+# NOVO: Grupos de duplicatas do step2 (copiar junto com o INPUT_FILE). As duplicatas removidas por
+# --colapsar-duplicatas não vão para a LLM: recebem uma cópia da classificação da representante
+DUPLICATES_FILE = "tabelas_duplicadas.json"
+OUTPUT_DIR = "metadata_output_advanced"
+
+# NOVO: Registro de provedores. Para incluir outro endpoint compatível com a API da OpenAI basta
+# acrescentar uma entrada; os relatórios saem em OUTPUT_DIR/classification_results_<chave>.json/.md
+# e a chave é o nome usado em --provedores=. batch_api indica suporte à Batch API no formato da
+# OpenAI; com --lote, os demais provedores usam as chamadas individuais. pricing são os preços de
+# tabela em USD por milhão de tokens, usados só na estimativa de custo dos relatórios (conferir a
+# página de preços do provedor antes de orçar uma execução).
+PROVIDERS = {
+    "openai": {
+        "name": "OpenAI",
+        "env_key": "OPENAI_API_KEY",
+        "model": "gpt-4o-mini",
+        "base_url": None,                       # None = padrão da OpenAI
+        # Limites do nível 1 da OpenAI para o gpt-4o-mini
+        "requests_per_minute": 500,
+        "tokens_per_minute": 200_000,
+        "batch_api": True,
+        "pricing": {"input": 0.15, "cached_input": 0.075, "output": 0.60, "batch_discount": 0.5},
+    },
+    "mistral": {
+        "name": "Mistral",
+        "env_key": "MISTRAL_API_KEY",
+        "model": "mistral-small",
+        "base_url": "https://api.mistral.ai/v1",
+        # Limites padrão da La Plateforme (1 requisição/s)
+        "requests_per_minute": 60,
+        "tokens_per_minute": 500_000,
+        "batch_api": False,                     # A API de lotes do Mistral tem outro formato
+        "pricing": {"input": 0.20, "cached_input": 0.20, "output": 0.60},
+    },
+    "deepseek": {
+        "name": "DeepSeek",
+        "env_key": "DEEPSEEK_API_KEY",
+        "model": "deepseek-coder",
+        "base_url": "https://api.deepseek.com/v1",
+        # A DeepSeek não publica limites fixos (aplica contenção dinâmica)
+        "requests_per_minute": None,
+        "tokens_per_minute": None,
+        "batch_api": False,
+        "pricing": {"input": 0.27, "cached_input": 0.07, "output": 1.10},
+    },
+}
+
+
+def load_prompt(prompt_file: str) -> str:
+    """
+    Carrega o prompt de um arquivo de texto.
+
+    Args:
+        prompt_file: Caminho para o arquivo de prompt
+
+    Returns:
+        String com o conteúdo do prompt
+    """
+    print(f"Carregando prompt de: {prompt_file}")
+    with open(prompt_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def load_metadata(input_file: str, limit: int = None):
+    """
+    Carrega o arquivo JSON de metadados.
+
+    Args:
+        input_file: Caminho para o arquivo JSON
+        limit: Número máximo de tabelas a processar (None = todas)
+
+    Returns:
+        Lista de tabelas
+    """
+    print(f"Carregando metadados de: {input_file}")
+    with open(input_file, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    if limit:
+        metadata = metadata[:limit]
+        print(f"Limitando a {limit} tabelas para teste")
+
+    print(f"Total de tabelas a processar: {len(metadata)}")
+    return metadata
+
+
+def build_full_prompt(base_prompt: str, table_metadata: dict) -> str:
+    """
+    Constrói o prompt completo combinando o prompt base com os metadados da tabela.
+
+    O novo formato do prompt já contém instruções completas, então substituímos
+    apenas a seção de metadados JSON no final.
+
+    Args:
+        base_prompt: Prompt base carregado do arquivo
+        table_metadata: Dicionário com metadados COMPLETOS da tabela
+
+    Returns:
+        String com o prompt formatado
+    """
+
+    # Converter metadados da tabela para JSON (compacto ou formatado)
+    if PROMPT_JSON_COMPACT:
+        metadata_json = json.dumps(table_metadata, ensure_ascii=False, separators=(',', ':'))
+    else:
+        metadata_json = json.dumps(table_metadata, indent=2, ensure_ascii=False)
+
+    if PROMPT_PREFIX_LAYOUT:
+        # Instruções no prompt de sistema (build_system_prompt); aqui vai só a parte variável
+        return f"**METADADOS DA TABELA A SER AVALIADA (JSON):**\n\n{metadata_json}\n"
+
+    # O prompt base já tem a estrutura completa, vamos substituir a seção de metadados
+    # Procurar pela seção **METADADOS DA TABELA A SER AVALIADA (JSON):**
+    if "**METADADOS DA TABELA A SER AVALIADA (JSON):**" in base_prompt:
+        # Dividir o prompt na seção de metadados
+        parts = base_prompt.split("**METADADOS DA TABELA A SER AVALIADA (JSON):**")
+
+        # Pegar a parte antes dos metadados e adicionar os metadados reais
+        prompt_before = parts[0] + "**METADADOS DA TABELA A SER AVALIADA (JSON):**\n"
+
+        # Pegar a parte depois dos metadados (TAREFA FINAL e FORMATO DE SAÍDA)
+        # Encontrar onde começa a próxima seção
+        if len(parts) > 1 and "**TAREFA FINAL:**" in parts[1]:
+            prompt_after = "\n\n**TAREFA FINAL:**" + parts[1].split("**TAREFA FINAL:**")[1]
+        else:
+            prompt_after = ""
+
+        full_prompt = f"{prompt_before}\n{metadata_json}\n{prompt_after}"
+    else:
+        # Fallback: apenas adicionar metadados no final
+        full_prompt = f"{base_prompt}\n\n**METADADOS DA TABELA A SER AVALIADA (JSON):**\n\n{metadata_json}\n"
+
+    return full_prompt
+
+
+def build_system_prompt(base_prompt: str) -> str:
+    """
+    Constrói o prompt de sistema.
+
+    No layout de prefixo fixo (PROMPT_PREFIX_LAYOUT) inclui todas as instruções do prompt base
+    (a seção de metadados de exemplo sai, como em build_full_prompt), de modo que o início de
+    todas as requisições seja idêntico e aproveitado pelo cache de prefixo do provedor.
+
+    Args:
+        base_prompt: Prompt base carregado do arquivo
+
+    Returns:
+        String com o prompt de sistema
+    """
+    if not PROMPT_PREFIX_LAYOUT:
+        return SYSTEM_PROMPT
+
+    if "**METADADOS DA TABELA A SER AVALIADA (JSON):**" in base_prompt:
+        parts = base_prompt.split("**METADADOS DA TABELA A SER AVALIADA (JSON):**")
+        instructions = parts[0].rstrip()
+        if len(parts) > 1 and "**TAREFA FINAL:**" in parts[1]:
+            instructions += "\n\n**TAREFA FINAL:**" + parts[1].split("**TAREFA FINAL:**")[1].rstrip()
+    else:
+        instructions = base_prompt.rstrip()
+
+    return f"{SYSTEM_PROMPT}\n{instructions}\n\n{PREFIX_LAYOUT_NOTE}"
+
+
+def chat_request(model: str, full_prompt: str, max_tokens: int = RESPONSE_TOKENS,
+                 system_prompt: str = SYSTEM_PROMPT) -> dict:
+    """Parâmetros da requisição de chat completions (os mesmos nas chamadas individuais e no lote)."""
+    # Aumentar max_tokens para garantir resposta completa
+    # O novo formato pede score, colunas contribuintes e justificativa
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": full_prompt
+            }
+        ],
+        "temperature": TEMPERATURE,
+        "max_tokens": max_tokens  # Aumentado para garantir resposta completa
+    }
+
+
+PACKING_INSTRUCTIONS = """**AVALIAÇÃO DE VÁRIAS TABELAS:** Os metadados acima trazem {count} tabelas. Avalie cada uma de forma independente, com os mesmos critérios, e responda com um ARRAY JSON contendo exatamente um objeto no formato de saída obrigatório para cada tabela, na mesma ordem da lista, com o campo "tabela" igual ao "table_name" da tabela avaliada. Não escreva nada fora do array."""
+
+
+def build_packed_prompt(base_prompt: str, tables: list) -> str:
+    """
+    Constrói o prompt para classificar várias tabelas numa única requisição.
+
+    Mesmo prompt base de build_full_prompt, com a lista de metadados no lugar da tabela única e
+    a instrução de responder um array com uma classificação por tabela.
+
+    Args:
+        base_prompt: Prompt base carregado do arquivo
+        tables: Metadados das tabelas do pacote
+
+    Returns:
+        String com o prompt formatado
+    """
+    if PROMPT_JSON_COMPACT:
+        metadata_json = json.dumps(tables, ensure_ascii=False, separators=(',', ':'))
+    else:
+        metadata_json = json.dumps(tables, indent=2, ensure_ascii=False)
+
+    packed_header = f"**METADADOS DAS {len(tables)} TABELAS A SEREM AVALIADAS (JSON, uma tabela por item da lista):**"
+    if PROMPT_PREFIX_LAYOUT:
+        return f"{packed_header}\n\n{metadata_json}\n\n{PACKING_INSTRUCTIONS.format(count=len(tables))}\n"
+
+    if "**METADADOS DA TABELA A SER AVALIADA (JSON):**" in base_prompt:
+        parts = base_prompt.split("**METADADOS DA TABELA A SER AVALIADA (JSON):**")
+        prompt_before = parts[0]
+        if len(parts) > 1 and "**TAREFA FINAL:**" in parts[1]:
+            prompt_after = "\n\n**TAREFA FINAL:**" + parts[1].split("**TAREFA FINAL:**")[1]
+        else:
+            prompt_after = ""
+    else:
+        prompt_before, prompt_after = base_prompt + "\n\n", ""
+
+    return (f"{prompt_before}{packed_header}\n\n{metadata_json}\n{prompt_after}\n\n"
+            f"{PACKING_INSTRUCTIONS.format(count=len(tables))}\n")
+
+
+def make_packs(tables: list, pack_size: int, max_tokens: int = PACK_MAX_TOKENS) -> list:
+    """
+    Agrupa as tabelas, na ordem de entrada, em pacotes de até `pack_size` tabelas e até
+    `max_tokens` tokens estimados de metadados (uma tabela maior que o limite vai sozinha).
+
+    Returns:
+        Lista de pacotes, cada um com os índices das tabelas em `tables`
+    """
+    packs, current, current_tokens = [], [], 0
+    for index, table in enumerate(tables):
+        tokens = estimate_tokens(json.dumps(table, ensure_ascii=False, separators=(',', ':')))
+        if current and (len(current) >= pack_size or current_tokens + tokens > max_tokens):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def request_completion(client: OpenAI, model: str, full_prompt: str, max_tokens: int = RESPONSE_TOKENS,
+                       system_prompt: str = SYSTEM_PROMPT, telemetry: CallTelemetry = None, tables: int = 1):
+    """
+    Chama a API de chat completions.
+
+    Returns:
+        (texto da resposta, registro da chamada em `telemetry` com latência, tempo até o primeiro
+         byte, tokens e novas tentativas; None sem telemetry)
+    """
+    started = time.perf_counter()
+    # with_streaming_response devolve a resposta quando chegam os cabeçalhos HTTP e só lê o corpo
+    # em parse(): separa o tempo até o primeiro byte (fila e geração no provedor, incluindo as
+    # novas tentativas) da transferência da resposta
+    with client.chat.completions.with_streaming_response.create(
+            **chat_request(model, full_prompt, max_tokens, system_prompt)) as response:
+        time_to_first_byte = time.perf_counter() - started
+        completion = response.parse()
+        retries = response.retries_taken
+    latency = time.perf_counter() - started
+
+    call = None
+    if telemetry is not None:
+        call = telemetry.record(completion.usage, latency, time_to_first_byte, retries, tables)
+    return completion.choices[0].message.content, call
+
+
+def extract_json(raw_content: str):
+    """
+    Lê o JSON da resposta da LLM, removendo o bloco de código markdown se houver.
+
+    Raises:
+        json.JSONDecodeError: se a resposta não for um JSON válido
+    """
+    # Extrair resposta
+    content = raw_content.strip()
+
+    # Tentar parsear JSON (remover markdown se presente)
+    if content.startswith("```"):
+        # Remover blocos de código markdown
+        lines = content.split('\n')
+        json_lines = []
+        in_code_block = False
+        for line in lines:
+            if line.strip().startswith("```"):
+                in_code_block = not in_code_block
+                continue
+            # Adicionado `or (not line.strip().startswith("```"))` para incluir linhas fora do bloco se o bloco não for fechado corretamente
+            if in_code_block or (not line.strip().startswith("```")):
+                json_lines.append(line)
+        content = '\n'.join(json_lines)
+
+    # Parsear JSON
+    return json.loads(content)
+
+
+def complete_classification(result: dict, table_metadata: dict) -> dict:
+    """Acrescenta à classificação os dados da tabela e os campos obrigatórios ausentes."""
+    # Adicionar informações extras do metadado original
+    result['table_name'] = table_metadata.get('table_name', 'N/A')
+    result['schema'] = table_metadata.get('schema', 'N/A')
+    result['row_count'] = table_metadata.get('row_count', 0)
+
+    # Garantir que campos obrigatórios existem
+    if 'score_relevancia' not in result:
+        result['score_relevancia'] = 0
+    if 'justificativa' not in result:
+        result['justificativa'] = 'Não fornecida'
+    if 'colunas_contribuintes' not in result:
+        result['colunas_contribuintes'] = []
+
+    return result
+
+
+def parse_classification(raw_content: str, table_metadata: dict) -> dict:
+    """
+    Converte a resposta da LLM no dicionário da classificação.
+
+    Raises:
+        json.JSONDecodeError: se a resposta não for um JSON válido
+    """
+    return complete_classification(extract_json(raw_content), table_metadata)
+
+
+def parse_packed_classifications(raw_content: str, tables: list) -> list:
+    """
+    Converte a resposta de um pacote nas classificações de cada tabela, pelo nome da tabela
+    (não pela posição, que o modelo pode trocar).
+
+    Returns:
+        Lista alinhada com `tables`: a classificação, ou None se a tabela não veio na resposta
+
+    Raises:
+        json.JSONDecodeError: se a resposta não for um JSON válido
+    """
+    data = extract_json(raw_content)
+    if isinstance(data, dict):
+        # Array embrulhado num objeto ({"classificacoes": [...]}) ou um objeto só
+        arrays = [v for v in data.values() if isinstance(v, list) and v and all(isinstance(i, dict) for i in v)]
+        data = arrays[0] if arrays else [data]
+
+    # Nomes repetidos (mesma tabela em schemas diferentes) são atribuídos na ordem do pacote
+    positions = {}
+    for index, table in enumerate(tables):
+        positions.setdefault(str(table.get('table_name', '')).lower(), []).append(index)
+
+    results = [None] * len(tables)
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        name = str(item.get('tabela') or item.get('table_name') or '').strip().strip('`"').lower()
+        candidates = positions.get(name) or positions.get(name.split('.')[-1])
+        if candidates:
+            index = candidates.pop(0)
+            results[index] = complete_classification(item, tables[index])
+    return results
+
+
+def error_result(table_metadata: dict, message: str, call: dict = None) -> dict:
+    """Classificação registrada para uma tabela que não pôde ser classificada."""
+    table_name = table_metadata.get('table_name', 'N/A')
+    result = {
+        "table_name": table_name,
+        "schema": table_metadata.get('schema', 'N/A'),
+        "row_count": table_metadata.get('row_count', 0),
+        "tabela": table_name,
+        "chave_primaria": "ERRO",
+        "score_relevancia": 0,
+        "colunas_contribuintes": [],
+        "justificativa": message
+    }
+    if call is not None:
+        # A chamada aconteceu (e foi cobrada), só a resposta não serviu
+        result['telemetry'] = {"response_cache": False, **call}
+    return result
+
+
+def classify_table(client: OpenAI, base_prompt: str, table_metadata: dict, model: str = "gpt-4o-mini",
+                   verbose: bool = True, cache: ResponseCache = None, limiter: RateLimiter = None,
+                   provider: str = "OpenAI", telemetry: CallTelemetry = None) -> dict:
+    """
+    Classifica uma tabela usando a API de um provedor.
+
+    Args:
+        client: Cliente OpenAI (ou de um provedor compatível)
+        base_prompt: Prompt base carregado do arquivo
+        table_metadata: Metadados COMPLETOS da tabela
+        model: Modelo a ser usado
+        verbose: Imprime o andamento da chamada (desligado na execução concorrente)
+        cache: Cache de respostas (None = sempre chama a API)
+        limiter: Limites de taxa do provedor, aplicados só às chamadas que vão de fato à API
+        provider: Nome do provedor (entra na chave do cache e nas mensagens de erro)
+        telemetry: Registro das chamadas do provedor (só chamadas à API; acertos do cache não contam)
+
+    Returns:
+        Dicionário com a classificação (em 'telemetry', os dados da chamada à API)
+    """
+
+    table_name = table_metadata.get('table_name', 'N/A')
+    # Na execução concorrente (verbose=False) o progresso é impresso por tabela concluída,
+    # e os erros levam o provedor e o nome da tabela para não se misturarem
+    error_prefix = "" if verbose else f"  [{provider}] {table_name}: "
+    if verbose:
+        print(f"  Classificando: {table_name}...", end=" ")
+
+    raw_content = ""
+    call = None
+    try:
+        system_prompt = build_system_prompt(base_prompt)
+        full_prompt = build_full_prompt(base_prompt, table_metadata)
+
+        # Requisição idêntica já respondida é servida do cache
+        cache_key = None
+        raw_content = None
+        if cache is not None:
+            cache_key = cache.make_key(provider, model, TEMPERATURE, RESPONSE_TOKENS, system_prompt, full_prompt)
+            raw_content = cache.get(cache_key, provider)
+
+        from_cache = raw_content is not None
+        if not from_cache:
+            if limiter is not None:
+                limiter.acquire(estimate_tokens(system_prompt + full_prompt) + RESPONSE_TOKENS)
+            raw_content, call = request_completion(client, model, full_prompt, RESPONSE_TOKENS, system_prompt,
+                                                   telemetry)
+
+        result = parse_classification(raw_content, table_metadata)
+        if cache is not None and not from_cache:
+            # Só respostas válidas entram no cache
+            cache.put(cache_key, raw_content, provider, model)
+        result['telemetry'] = {"response_cache": from_cache, **(call or {})}
+
+        if verbose:
+            print(f"✓ Score: {result['score_relevancia']}")
+
+        return result
+
+    except json.JSONDecodeError as e:
+        print(f"{error_prefix}✗ ERRO JSON: {str(e)}")
+        print(f"   Resposta recebida: {(raw_content or '').strip()[:200]}...")
+        return error_result(table_metadata, f"Erro ao parsear JSON: {str(e)}", call)
+    except Exception as e:
+        print(f"{error_prefix}✗ ERRO: {str(e)}")
+        return error_result(table_metadata, f"Erro ao processar: {str(e)}", call)
+
+
+def load_duplicate_groups(path: str) -> list:
+    """Grupos de duplicatas gerados pelo step2 (lista vazia se o arquivo não existir)."""
+    if not Path(path).exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def inherit_duplicate_classifications(results: list, duplicate_groups: list) -> list:
+    """
+    Acrescenta a `results` uma classificação para cada duplicata colapsada no step2, copiada da
+    representante do grupo e marcada com 'herdada_de'. Duplicatas que já têm classificação
+    própria (step2 sem --colapsar-duplicatas) e grupos cuja representante não foi classificada
+    (ex.: fora do limite) ficam como estão.
+
+    Returns:
+        Lista das classificações herdadas
+    """
+    by_table = {(r.get('schema'), r.get('table_name')): r for r in results}
+    inherited = []
+    for group in duplicate_groups:
+        representative = group['representative']
+        source = by_table.get((representative['schema'], representative['table_name']))
+        if source is None:
+            continue
+        for duplicate in group['duplicates']:
+            key = (duplicate['schema'], duplicate['table_name'])
+            if key in by_table:
+                continue
+            # Sem telemetria: a chamada à API é contada só na representante
+            result = {k: v for k, v in source.items() if k != 'telemetry'}
+            result.update({
+                "table_name": duplicate['table_name'],
+                "schema": duplicate['schema'],
+                "row_count": duplicate.get('row_count', source.get('row_count', 0)),
+                "tabela": duplicate['table_name'],
+                "herdada_de": f"{representative['schema']}.{representative['table_name']}",
+                "motivo_duplicata": duplicate.get('reason'),
+            })
+            by_table[key] = result
+            inherited.append(result)
+    results.extend(inherited)
+    return inherited
+
+
+def generate_json_report(results: list, output_file: str, metadata: dict, telemetry: dict = None):
+    """
+    Gera relatório em JSON para análise programática.
+
+    Args:
+        results: Lista de resultados da classificação
+        output_file: Caminho para o arquivo de saída
+        metadata: Metadados da execução
+        telemetry: Telemetria das chamadas (percentis de latência, vazão e custo estimado)
+    """
+
+    # Calcular estatísticas de score
+    scores = [r['score_relevancia'] for r in results if isinstance(r.get('score_relevancia'), (int, float))]
+
+    report = {
+        "metadata": metadata,
+        "summary": {
+            "total_tables": len(results),
+            "score_statistics": {
+                "avg": sum(scores) / len(scores) if scores else 0,
+                "min": min(scores) if scores else 0,
+                "max": max(scores) if scores else 0,
+                "median": sorted(scores)[len(scores)//2] if scores else 0
+            },
+            "score_distribution": {
+                "high_relevance_80_100": sum(1 for s in scores if s >= 80),
+                "medium_relevance_50_79": sum(1 for s in scores if 50 <= s < 80),
+                "low_relevance_20_49": sum(1 for s in scores if 20 <= s < 50),
+                "very_low_relevance_0_19": sum(1 for s in scores if s < 20)
+            },
+            "errors": sum(1 for r in results if r.get('score_relevancia') == 0 and 'ERRO' in r.get('justificativa', '')),
+            "telemetry": telemetry
+        },
+        "classifications": results
+    }
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\nRelatório JSON salvo em: {output_file}")
+
+
+def telemetry_markdown(telemetry: dict) -> str:
+    """Seções de telemetria das chamadas e custo estimado do relatório Markdown ("" sem chamadas à API)."""
+    if not telemetry or not telemetry.get('calls'):
+        return ""
+
+    def row(label, stats, fmt):
+        if not stats:
+            return f"| **{label}** | - | - | - | - | - |\n"
+        return (f"| **{label}** | {stats['p50']:{fmt}} | {stats['p95']:{fmt}} | {stats['p99']:{fmt}} | "
+                f"{stats['avg']:{fmt}} | {stats['max']:{fmt}} |\n")
+
+    throughput = telemetry.get('throughput_tokens_per_second')
+    throughput = f"{throughput:,.1f}" if throughput else "N/A"
+    section = f"""## Telemetria das Chamadas
+
+Chamadas à API: **{telemetry['calls']}** | Novas tentativas: **{telemetry['retries']}** (em {telemetry['calls_with_retries']} chamadas) | Vazão: **{throughput} tokens/s**
+
+| Métrica | p50 | p95 | p99 | Média | Máx |
+|---------|-----|-----|-----|-------|-----|
+"""
+    section += row("Latência (s)", telemetry.get('latency_s'), ".2f")
+    section += row("Tempo até o primeiro byte (s)", telemetry.get('time_to_first_byte_s'), ".2f")
+    section += row("Tokens de resposta/s", telemetry.get('output_tokens_per_second'), ".1f")
+
+    cost = telemetry['cost_usd']
+    pricing = telemetry['pricing_usd_per_million_tokens']
+    section += f"""
+## Custo Estimado (USD)
+
+| Item | Preço (USD/1M tokens) | Custo (USD) |
+|------|-----------------------|-------------|
+| **Prompt (sem cache)** | {pricing['input']} | {cost['prompt_uncached']:.4f} |
+| **Prompt (cache de prefixo)** | {pricing.get('cached_input', pricing['input'])} | {cost['prompt_cached']:.4f} |
+| **Resposta** | {pricing['output']} | {cost['completion']:.4f} |
+| **Total** | | **{cost['total']:.4f}** |
+
+Custo médio por tabela: US$ {cost['per_table']:.6f}"""
+    if telemetry.get('batch_calls') and pricing.get('batch_discount'):
+        section += (f" ({telemetry['batch_calls']} chamadas pela Batch API, com "
+                    f"{pricing['batch_discount']:.0%} de desconto)")
+    section += "\n\n---\n\n"
+    return section
+
+
+def generate_markdown_report(results: list, output_file: str, metadata: dict, telemetry: dict = None):
+    """
+    Gera relatório em Markdown para leitura humana.
+
+    Args:
+        results: Lista de resultados da classificação
+        output_file: Caminho para o arquivo de saída
+        metadata: Metadados da execução (o título usa metadata['llm_provider'])
+        telemetry: Telemetria das chamadas (percentis de latência, vazão e custo estimado)
+    """
+
+    provider = metadata['llm_provider']
+    total = len(results)
+    scores = [r['score_relevancia'] for r in results if isinstance(r.get('score_relevancia'), (int, float))]
+
+    avg_score = sum(scores) / len(scores) if scores else 0
+    min_score = min(scores) if scores else 0
+    max_score = max(scores) if scores else 0
+
+    high_rel = sum(1 for s in scores if s >= 80)
+    medium_rel = sum(1 for s in scores if 50 <= s < 80)
+    low_rel = sum(1 for s in scores if 20 <= s < 50)
+    very_low_rel = sum(1 for s in scores if s < 20)
+    errors = sum(1 for r in results if r.get('score_relevancia') == 0 and 'ERRO' in r.get('justificativa', ''))
+    token_usage = metadata.get('token_usage') or {}
+    prompt_tokens = (f"{token_usage['prompt_tokens']:,} ({token_usage['cached_prompt_tokens']:,} do cache de prefixo, "
+                     f"{token_usage['cached_ratio']:.1%})" if token_usage.get('requests') else "N/A")
+
+    report = f"""# Relatório de Classificação de Tabelas - {provider}
+
+**Data de Execução:** {metadata['execution_date']}  
+**Modelo:** {metadata['model']}  
+**LLM Provider:** {metadata['llm_provider']}  
+**Temperatura:** {metadata['temperature']}
+
+---
+
+## Resumo Geral
+
+| Métrica | Valor |
+|---------|-------|
+| **Total de Tabelas** | {total} |
+| **Score Médio** | {avg_score:.2f} |
+| **Score Mínimo** | {min_score} |
+| **Score Máximo** | {max_score} |
+| **Erros de Processamento** | {errors} |
+| **Tokens de Prompt** | {prompt_tokens} |
+| **Herdadas de Duplicatas** | {metadata.get('inherited_duplicates', 0)} |
+
+## Distribuição de Relevância por Score
+
+| Categoria | Score Range | Quantidade | Percentual |
+|-----------|-------------|------------|------------|
+| **Alta Relevância** | 80-100 | {high_rel} | {(high_rel/total*100):.1f}% |
+| **Média Relevância** | 50-79 | {medium_rel} | {(medium_rel/total*100):.1f}% |
+| **Baixa Relevância** | 20-49 | {low_rel} | {(low_rel/total*100):.1f}% |
+| **Muito Baixa Relevância** | 0-19 | {very_low_rel} | {(very_low_rel/total*100):.1f}% |
+
+---
+
+{telemetry_markdown(telemetry)}## Tabelas de Alta Relevância (Score ≥ 80)
+
+Total: **{high_rel}** tabelas
+
+| # | Tabela | Row Count | Score | Justificativa |
+|---|--------|-----------|-------|---------------|
+"""
+
+    # Adicionar tabelas de alta relevância
+    high_rel_tables = sorted(
+        [r for r in results if r.get('score_relevancia', 0) >= 80],
+        key=lambda x: x.get('score_relevancia', 0),
+        reverse=True
+    )
+
+    for idx, r in enumerate(high_rel_tables, 1):
+        justification = r.get('justificativa', 'N/A')
+        if len(justification) > 100:
+            justification = justification[:100] + "..."
+        report += f"| {idx} | `{r['table_name']}` | {r['row_count']:,} | {r.get('score_relevancia', 0)} | {justification} |\n"
+
+    if not high_rel_tables:
+        report += "| - | Nenhuma tabela encontrada | - | - | - |\n"
+
+    report += f"""
+
+---
+
+## Tabelas de Média Relevância (Score 50-79)
+
+Total: **{medium_rel}** tabelas
+
+| # | Tabela | Row Count | Score | Justificativa |
+|---|--------|-----------|-------|---------------|
+"""
+
+    # Adicionar tabelas de média relevância (limitar a 30)
+    medium_rel_tables = sorted(
+        [r for r in results if 50 <= r.get('score_relevancia', 0) < 80],
+        key=lambda x: x.get('score_relevancia', 0),
+        reverse=True
+    )
+
+    for idx, r in enumerate(medium_rel_tables[:30], 1):
+        justification = r.get('justificativa', 'N/A')
+        if len(justification) > 100:
+            justification = justification[:100] + "..."
+        report += f"| {idx} | `{r['table_name']}` | {r['row_count']:,} | {r.get('score_relevancia', 0)} | {justification} |\n"
+
+    if not medium_rel_tables:
+        report += "| - | Nenhuma tabela encontrada | - | - | - |\n"
+    elif len(medium_rel_tables) > 30:
+        report += f"\n*... e mais {len(medium_rel_tables) - 30} tabelas de média relevância*\n"
+
+    report += """
+
+---
+
+## Detalhamento das Tabelas de Alta Relevância
+
+"""
+
+    # Detalhamento completo das tabelas de alta relevância
+    for idx, r in enumerate(high_rel_tables, 1):
+        colunas = r.get('colunas_contribuintes', [])
+        chave_primaria = r.get('chave_primaria', 'N/A')
+
+        report += f"""### {idx}. {r['table_name']}
+
+- **Schema:** {r['schema']}
+- **Row Count:** {r['row_count']:,}
+- **Score de Relevância:** {r.get('score_relevancia', 0)}
+- **Chave Primária:** {chave_primaria}
+
+**Justificativa:**
+{r.get('justificativa', 'N/A')}
+
+**Colunas Contribuintes para o Score:**
+"""
+        if colunas:
+            for col in colunas:
+                report += f"- `{col}`\n"
+        else:
+            report += "- Nenhuma coluna específica identificada\n"
+
+        report += "\n---\n\n"
+
+    # Adicionar seção de erros se houver
+    if errors > 0:
+        report += f"""## Erros de Processamento
+
+Total: **{errors}** tabelas com erro
+
+| Tabela | Erro |
+|--------|------|
+"""
+        error_tables = [r for r in results if r.get('score_relevancia') == 0 and 'ERRO' in r.get('justificativa', '')]
+        for r in error_tables:
+            report += f"| `{r['table_name']}` | {r.get('justificativa', 'N/A')} |\n"
+
+    report += """
+
+---
+
+## Metadados da Execução
+
+```json
+"""
+    report += json.dumps(metadata, indent=2, ensure_ascii=False)
+    report += f"""
+```
+
+---
+
+*Relatório gerado automaticamente pelo script de classificação de tabelas com {provider}.*
+"""
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(report)
+
+    print(f"Relatório Markdown salvo em: {output_file}")
+
+
+def parse_options(argv: list, default_providers: list = None) -> dict:
+    """
+    Lê os argumentos da linha de comando (opções "--" podem vir em qualquer posição).
+
+    Returns:
+        Dicionário com limit, providers (None = todos os que tiverem chave), concurrency,
+        use_cache, batch e os limites/endpoint informados (ausentes = os do registro de cada provedor)
+    """
+    options = [a for a in argv if a.startswith("--")]
+    args = [a for a in argv if not a.startswith("--")]
+    parsed = {
+        "limit": None,
+        "providers": default_providers,
+        "concurrency": CONCURRENCY,
+        "use_cache": RESPONSE_CACHE and "--sem-cache" not in options,
+        "batch": BATCH_MODE or "--lote" in options,
+        "batch_poll_seconds": BATCH_POLL_SECONDS,
+        "pack_size": PACK_SIZE,
+        "prefix_layout": PROMPT_PREFIX_LAYOUT or "--prompt-prefixo" in options,
+    }
+    try:
+        for option in options:
+            value = option.split("=", 1)[1] if "=" in option else ""
+            if option.startswith("--concorrencia="):
+                parsed["concurrency"] = int(value)
+            elif option.startswith("--rpm="):
+                parsed["requests_per_minute"] = int(value) or None
+            elif option.startswith("--tpm="):
+                parsed["tokens_per_minute"] = int(value) or None
+            elif option.startswith("--base-url="):
+                parsed["base_url"] = value
+            elif option.startswith("--agrupar="):
+                parsed["pack_size"] = max(1, int(value))
+            elif option.startswith("--intervalo-lote="):
+                parsed["batch_poll_seconds"] = float(value)
+            elif option.startswith("--provedores="):
+                parsed["providers"] = [p.strip().lower() for p in value.split(",") if p.strip()]
+    except ValueError:
+        print("ERRO: --concorrencia, --rpm, --tpm, --agrupar e --intervalo-lote devem ser números")
+        sys.exit(1)
+
+    # Processar argumentos da linha de comando
+    if len(args) > 0:
+        try:
+            parsed["limit"] = int(args[0])
+            print(f"Modo de teste: processando apenas {parsed['limit']} tabelas")
+        except ValueError:
+            print("ERRO: O argumento deve ser um número inteiro (limit)")
+            sys.exit(1)
+
+    unknown = [p for p in (parsed["providers"] or []) if p not in PROVIDERS]
+    if unknown:
+        print(f"ERRO: Provedor(es) desconhecido(s): {', '.join(unknown)} (disponíveis: {', '.join(PROVIDERS)})")
+        sys.exit(1)
+    return parsed
+
+
+def select_providers(options: dict) -> dict:
+    """
+    Resolve os provedores da execução e suas chaves de API.
+
+    Provedores pedidos explicitamente (--provedores= ou pelos scripts de um provedor) precisam
+    da chave; sem seleção, entram todos os que têm chave configurada.
+
+    Returns:
+        Dicionário chave do provedor -> chave de API
+    """
+    explicit = options["providers"] is not None
+    selected = {}
+    for key in (options["providers"] if explicit else PROVIDERS):
+        config = PROVIDERS[key]
+        base_url = options.get("base_url", config["base_url"])
+        api_key = os.getenv(config["env_key"])
+        if not api_key and base_url != config["base_url"]:
+            # Servidor local (ex.: ApiTests/mockOpenAiServer) não exige chave
+            api_key = "sk-local"
+        if api_key:
+            selected[key] = api_key
+        elif explicit:
+            print(f"ERRO: {config['env_key']} não encontrada nas variáveis de ambiente")
+            print(f"Configure a variável {config['env_key']} no arquivo .env ou nas variáveis de ambiente do sistema")
+            sys.exit(1)
+        else:
+            print(f"⚠ {config['name']}: {config['env_key']} não configurada, provedor ignorado")
+
+    if not selected:
+        print("ERRO: Nenhum provedor com chave de API configurada "
+              f"({', '.join(c['env_key'] for c in PROVIDERS.values())})")
+        sys.exit(1)
+    return selected
+
+
+def classify_pack(client: OpenAI, base_prompt: str, tables: list, model: str, provider: str,
+                  cache: ResponseCache = None, limiter: RateLimiter = None, telemetry: CallTelemetry = None) -> list:
+    """
+    Classifica um pacote de tabelas numa única requisição.
+
+    Returns:
+        Lista alinhada com `tables`, com None nas tabelas sem classificação (ausentes da resposta
+        ou pacote inteiro com erro), que devem ser reclassificadas individualmente
+    """
+    label = f"  [{provider}] pacote de {len(tables)} tabelas ({tables[0].get('table_name', 'N/A')}, ...)"
+    raw_content = ""
+    call = None
+    try:
+        system_prompt = build_system_prompt(base_prompt)
+        packed_prompt = build_packed_prompt(base_prompt, tables)
+        max_tokens = RESPONSE_TOKENS * len(tables)
+
+        cache_key = None
+        raw_content = None
+        if cache is not None:
+            cache_key = cache.make_key(provider, model, TEMPERATURE, max_tokens, system_prompt, packed_prompt)
+            raw_content = cache.get(cache_key, provider)
+
+        from_cache = raw_content is not None
+        if not from_cache:
+            if limiter is not None:
+                limiter.acquire(estimate_tokens(system_prompt + packed_prompt) + max_tokens)
+            raw_content, call = request_completion(client, model, packed_prompt, max_tokens, system_prompt,
+                                                   telemetry, len(tables))
+
+        results = parse_packed_classifications(raw_content, tables)
+        if cache is not None and not from_cache:
+            cache.put(cache_key, raw_content, provider, model)
+        # A chamada (tokens e latência do pacote inteiro) vai para cada tabela do pacote
+        for result in results:
+            if result is not None:
+                result['telemetry'] = {"response_cache": from_cache, **(call or {})}
+        return results
+
+    except json.JSONDecodeError as e:
+        print(f"{label}: ✗ ERRO JSON: {str(e)}")
+        print(f"   Resposta recebida: {(raw_content or '').strip()[:200]}...")
+    except Exception as e:
+        print(f"{label}: ✗ ERRO: {str(e)}")
+    return [None] * len(tables)
+
+
+def classify_packed(client: OpenAI, base_prompt: str, metadata_tables: list, model: str, provider: str,
+                    pack_size: int, concurrency: int, cache: ResponseCache = None,
+                    limiter: RateLimiter = None, label: str = "", telemetry: CallTelemetry = None):
+    """
+    Classifica as tabelas em pacotes de até `pack_size` por requisição, com chamadas concorrentes.
+
+    Returns:
+        (resultados na ordem de metadata_tables, com None nas tabelas sem classificação;
+         informações do agrupamento para os metadados da execução)
+    """
+    packs = make_packs(metadata_tables, pack_size)
+
+    def report_progress(completed, index, pack, pack_results):
+        classified = sum(1 for r in pack_results if r is not None)
+        print(f"[{label}pacote {completed}/{len(packs)}] {classified}/{len(pack)} tabelas classificadas")
+
+    pack_results = run_concurrently(
+        packs,
+        lambda pack: classify_pack(client, base_prompt, [metadata_tables[i] for i in pack], model, provider,
+                                   cache, limiter, telemetry),
+        concurrency=concurrency,
+        on_done=report_progress,
+    )
+    results = [None] * len(metadata_tables)
+    for pack, pack_result in zip(packs, pack_results):
+        for index, result in zip(pack, pack_result):
+            results[index] = result
+
+    info = {
+        "pack_size": pack_size,
+        "requests": len(packs),
+        "avg_tables_per_request": round(len(metadata_tables) / len(packs), 2) if packs else 0,
+        "missing_from_responses": sum(1 for r in results if r is None),
+    }
+    return results, info
+
+
+def classify_online(client: OpenAI, base_prompt: str, tables: list, model: str, provider: str,
+                    concurrency: int, cache: ResponseCache = None, limiter: RateLimiter = None,
+                    label: str = "", telemetry: CallTelemetry = None) -> list:
+    """Classifica as tabelas com chamadas concorrentes; os resultados voltam na ordem de `tables`."""
+    def report_progress(completed, index, table, result):
+        status = ("✗ ERRO" if 'ERRO' in str(result.get('chave_primaria', ''))
+                  else f"✓ Score: {result.get('score_relevancia')}")
+        print(f"[{label}{completed}/{len(tables)}] {table.get('table_name', 'N/A')}: {status}")
+
+    return run_concurrently(
+        tables,
+        lambda table: classify_table(client, base_prompt, table, model, verbose=False,
+                                     cache=cache, limiter=limiter, provider=provider, telemetry=telemetry),
+        concurrency=concurrency,
+        on_done=report_progress,
+    )
+
+
+def batch_state_file(key: str) -> Path:
+    """Arquivo com o id do lote enviado pelo provedor (existe enquanto o lote não foi consumido)."""
+    return Path(OUTPUT_DIR) / f"batch_state_{key}.json"
+
+
+def classify_batch(client: OpenAI, base_prompt: str, metadata_tables: list, key: str, model: str,
+                   provider: str, poll_seconds: float, cache: ResponseCache = None, telemetry: CallTelemetry = None):
+    """
+    Classifica as tabelas pela Batch API: tabelas já no cache não entram no lote, e as respostas
+    válidas do lote entram no cache.
+
+    Returns:
+        (resultados na ordem de metadata_tables, com None nas tabelas sem resposta válida no lote;
+         informações do lote para os metadados da execução)
+
+    Raises:
+        TimeoutError: se o lote não terminar em BATCH_MAX_WAIT_HOURS (batch_state_file(key)
+            continua gravado e a próxima execução com --lote retoma o mesmo lote)
+    """
+    results = [None] * len(metadata_tables)
+    pending = []
+    system_prompt = build_system_prompt(base_prompt)
+    for index, table in enumerate(metadata_tables):
+        full_prompt = build_full_prompt(base_prompt, table)
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(provider, model, TEMPERATURE, RESPONSE_TOKENS, system_prompt, full_prompt)
+            cached = cache.get(cache_key, provider)
+            if cached is not None:
+                results[index] = parse_classification(cached, table)
+                results[index]['telemetry'] = {"response_cache": True}
+                continue
+        pending.append((index, full_prompt, cache_key))
+
+    info = {"batch_id": None, "status": None, "requests": len(pending),
+            "served_from_cache": len(metadata_tables) - len(pending), "failed": 0}
+    if not pending:
+        print(f"{provider}: todas as tabelas estão no cache, nenhum lote enviado")
+        return results, info
+
+    request_file = Path(OUTPUT_DIR) / f"batch_requests_{key}.jsonl"
+    state_file = batch_state_file(key)
+    requests_sha256 = write_batch_file(
+        [(f"tabela-{index}", chat_request(model, full_prompt, RESPONSE_TOKENS, system_prompt))
+         for index, full_prompt, _ in pending],
+        request_file)
+    batch_id = load_batch_state(state_file, requests_sha256)
+    if batch_id:
+        print(f"{provider}: retomando o lote {batch_id} enviado anteriormente ({state_file})")
+    else:
+        batch = submit_batch(client, request_file, f"step3 {provider}: {len(pending)} tabelas")
+        batch_id = batch.id
+        save_batch_state(state_file, batch_id, requests_sha256, provider, model)
+        print(f"{provider}: lote {batch_id} enviado ({len(pending)} requisições em {request_file})")
+
+    # TimeoutError e erros da API sobem para main, que mantém os demais provedores; o arquivo de
+    # estado só é apagado depois de lidas as respostas, então o lote pode ser retomado
+    batch = wait_for_batch(client, batch_id, poll_seconds, BATCH_MAX_WAIT_HOURS * 3600, f"{provider}: ")
+
+    # Lotes expirados ou cancelados ainda trazem as respostas concluídas até ali
+    answers = read_batch_results(client, batch)
+    for index, full_prompt, cache_key in pending:
+        table = metadata_tables[index]
+        content, error, response_usage = answers.get(f"tabela-{index}", (None, f"sem resposta no lote ({batch.status})", None))
+        call = None
+        if content is not None and telemetry is not None:
+            call = telemetry.record(response_usage, batch=True)
+        try:
+            if content is None:
+                raise ValueError(error)
+            results[index] = parse_classification(content, table)
+            results[index]['telemetry'] = {"response_cache": False, **(call or {})}
+        except ValueError as e:
+            # json.JSONDecodeError também é ValueError
+            print(f"  [{provider}] {table.get('table_name', 'N/A')}: ✗ lote: {str(e)}")
+            info["failed"] += 1
+            continue
+        if cache is not None:
+            cache.put(cache_key, content, provider, model)
+    # Lote consumido: a próxima execução com --lote envia um novo
+    state_file.unlink()
+
+    info.update(batch_id=batch_id, status=batch.status)
+    return results, info
+
+
+def run_provider(key: str, api_key: str, base_prompt: str, metadata_tables: list, options: dict,
+                 cache: ResponseCache = None, verbose: bool = False):
+    """
+    Classifica todas as tabelas com um provedor.
+
+    Args:
+        key: Chave do provedor em PROVIDERS
+        api_key: Chave de API do provedor
+        base_prompt: Prompt base carregado do arquivo
+        metadata_tables: Tabelas a classificar (as mesmas para todos os provedores)
+        options: Opções da linha de comando (parse_options)
+        cache: Cache de respostas compartilhado (None = sem cache)
+        verbose: Progresso detalhado tabela a tabela (só com um provedor e execução sequencial)
+
+    Returns:
+        (resultados na ordem de metadata_tables, metadados da execução, telemetria das chamadas)
+    """
+    config = PROVIDERS[key]
+    name, model = config["name"], config["model"]
+    base_url = options.get("base_url", config["base_url"])
+    requests_per_minute = options.get("requests_per_minute", config["requests_per_minute"])
+    tokens_per_minute = options.get("tokens_per_minute", config["tokens_per_minute"])
+    concurrency = options["concurrency"]
+
+    client = OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=MAX_RETRIES,
+    )
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    print(f"{name}: modelo {model}, concorrência {concurrency}, limites: "
+          f"{requests_per_minute or 'sem limite'} req/min, {tokens_per_minute or 'sem limite'} tokens/min")
+    started = time.monotonic()
+    label = f"{name} " if len(options["selected"]) > 1 else ""
+    telemetry = CallTelemetry()
+    batch_info = None
+    pack_info = None
+    use_batch = options["batch"] and config["batch_api"]
+    if options["batch"] and not use_batch:
+        print(f"⚠ {name}: sem suporte à Batch API, usando chamadas individuais")
+    pack_size = options["pack_size"] if not use_batch else 1
+    if use_batch and options["pack_size"] > 1:
+        print(f"⚠ {name}: --agrupar não se aplica ao modo lote; uma tabela por requisição do lote")
+
+    if use_batch:
+        results, batch_info = classify_batch(client, base_prompt, metadata_tables, key, model, name,
+                                             options["batch_poll_seconds"], cache, telemetry)
+    elif pack_size > 1:
+        results, pack_info = classify_packed(client, base_prompt, metadata_tables, model, name, pack_size,
+                                             concurrency, cache, limiter, label, telemetry)
+    elif verbose:
+        results = []
+        for idx, table in enumerate(metadata_tables, 1):
+            print(f"[{idx}/{len(metadata_tables)}]", end=" ")
+            result = classify_table(client, base_prompt, table, model, cache=cache, limiter=limiter,
+                                    provider=name, telemetry=telemetry)
+            results.append(result)
+    else:
+        # Chamadas concorrentes; os resultados voltam na ordem das tabelas de entrada
+        results = classify_online(client, base_prompt, metadata_tables, model, name, concurrency,
+                                  cache, limiter, label, telemetry)
+
+    # Tabelas sem resposta válida no lote ou no pacote são reclassificadas individualmente
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        print(f"{name}: reclassificando individualmente {len(missing)} tabelas sem resposta válida")
+        retried = classify_online(client, base_prompt, [metadata_tables[i] for i in missing], model, name,
+                                  concurrency, cache, limiter, label, telemetry)
+        for index, result in zip(missing, retried):
+            results[index] = result
+    if batch_info is not None or pack_info is not None:
+        (batch_info or pack_info)["retried_online"] = len(missing)
+    elapsed = time.monotonic() - started
+    print(f"{name}: {len(results)} tabelas em {elapsed:.1f}s "
+          f"(soma das esperas por limite de taxa: {limiter.waited:.1f}s)")
+    token_usage = telemetry.token_summary()
+    telemetry_report = telemetry.summary(elapsed)
+    cost = telemetry.cost(config["pricing"])
+    cost["per_table"] = round(cost["total"] / len(results), 6) if results else 0.0
+    telemetry_report.update(cost_usd=cost, pricing_usd_per_million_tokens=config["pricing"])
+    if token_usage["requests"]:
+        print(f"{name}: {token_usage['prompt_tokens']:,} tokens de prompt, {token_usage['cached_prompt_tokens']:,} "
+              f"do cache de prefixo do provedor ({token_usage['cached_ratio']:.1%})")
+        latency = telemetry_report["latency_s"]
+        if latency:
+            print(f"{name}: latência p50/p95/p99 {latency['p50']:.2f}/{latency['p95']:.2f}/{latency['p99']:.2f}s, "
+                  f"{telemetry_report['retries']} novas tentativas")
+        print(f"{name}: custo estimado US$ {cost['total']:.4f} (US$ {cost['per_table']:.6f} por tabela)")
+
+    # Metadados da execução
+    execution_metadata = {
+        "execution_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "llm_provider": name,
+        "model": model,
+        "temperature": TEMPERATURE,
+        "prompt_file": PROMPT_FILE,
+        "input_file": INPUT_FILE,
+        "total_tables_processed": len(results),
+        "limit": options["limit"],
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "requests_per_minute": requests_per_minute,
+        "tokens_per_minute": tokens_per_minute,
+        "elapsed_seconds": round(elapsed, 2),
+        "rate_limit_wait_seconds": round(limiter.waited, 2),
+        "parallel_providers": list(options["selected"]),
+        "mode": "batch" if use_batch else "online",
+        "batch": batch_info,
+        "packing": pack_info,
+        "prompt_layout": "prefix" if PROMPT_PREFIX_LAYOUT else "inline",
+        "token_usage": token_usage,
+        "response_cache": cache.stats(name) if cache is not None else None
+    }
+    return results, execution_metadata, telemetry_report
+
+
+def print_summary(provider: str, results: list):
+    scores = [r['score_relevancia'] for r in results if isinstance(r.get('score_relevancia'), (int, float))]
+    avg_score = sum(scores) / len(scores) if scores else 0
+    high_rel = sum(1 for s in scores if s >= 80)
+    medium_rel = sum(1 for s in scores if 50 <= s < 80)
+    errors = sum(1 for r in results if r.get('score_relevancia') == 0 and 'ERRO' in r.get('justificativa', ''))
+
+    print("\n" + "="*70)
+    print(f"RESUMO FINAL - {provider}")
+    print("="*70)
+    print(f"Total processado: {len(results)}")
+    print(f"Score médio: {avg_score:.2f}")
+    print(f"Alta relevância (≥80): {high_rel} ({high_rel/len(results)*100:.1f}%)")
+    print(f"Média relevância (50-79): {medium_rel} ({medium_rel/len(results)*100:.1f}%)")
+    print(f"Erros: {errors}")
+    print("="*70)
+
+
+def main(default_providers: list = None):
+    """
+    Função principal.
+
+    Args:
+        default_providers: Provedores usados quando não há --provedores= (None = todos os
+            provedores com chave configurada)
+    """
+
+    # Carregar variáveis de ambiente
+    load_dotenv()
+
+    global PROMPT_PREFIX_LAYOUT
+    options = parse_options(sys.argv[1:], default_providers)
+    PROMPT_PREFIX_LAYOUT = options["prefix_layout"]
+    selected = select_providers(options)
+    options["selected"] = selected
+
+    # Verificar se os arquivos necessários existem
+    if not Path(PROMPT_FILE).exists():
+        print(f"ERRO: Arquivo de prompt não encontrado: {PROMPT_FILE}")
+        sys.exit(1)
+
+    if not Path(INPUT_FILE).exists():
+        print(f"ERRO: Arquivo de entrada não encontrado: {INPUT_FILE}")
+        sys.exit(1)
+
+    # Criar diretório de saída
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+
+    # Prompt e metadados são carregados uma vez e compartilhados por todos os provedores
+    base_prompt = load_prompt(PROMPT_FILE)
+    metadata_tables = load_metadata(INPUT_FILE, options["limit"])
+
+    # Cache de respostas
+    cache = ResponseCache(CACHE_FILE, CACHE_MAX_MB * 1024 * 1024) if options["use_cache"] else None
+    if cache is not None:
+        print(f"Cache de respostas: {CACHE_FILE}")
+
+    # Classificar tabelas: um fluxo por provedor, todos ao mesmo tempo
+    verbose = len(selected) == 1 and options["concurrency"] <= 1
+    print(f"\nClassificando {len(metadata_tables)} tabelas com {len(selected)} provedor(es): "
+          f"{', '.join(PROVIDERS[key]['name'] for key in selected)}\n")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+        futures = {
+            key: executor.submit(run_provider, key, api_key, base_prompt, metadata_tables, options, cache, verbose)
+            for key, api_key in selected.items()
+        }
+        # A falha de um provedor não descarta os resultados dos outros
+        runs, failures = {}, {}
+        for key, future in futures.items():
+            try:
+                runs[key] = future.result()
+            except Exception as e:
+                failures[key] = e
+                print(f"ERRO: {PROVIDERS[key]['name']}: {e}")
+    elapsed = time.monotonic() - started
+    print(f"\nTempo total de classificação: {elapsed:.1f}s")
+    if cache is not None:
+        cache_stats = cache.stats()
+        cache.close()
+        print(f"Cache: {cache_stats['hits']} acertos, {cache_stats['misses']} chamadas à API "
+              f"({cache_stats['entries']} respostas, {cache_stats['size_bytes'] / 1024 / 1024:.1f} MB)")
+
+    # Duplicatas colapsadas no step2 recebem a classificação da representante
+    duplicate_groups = load_duplicate_groups(DUPLICATES_FILE)
+    for key, (results, execution_metadata, _) in runs.items():
+        inherited = inherit_duplicate_classifications(results, duplicate_groups)
+        execution_metadata["inherited_duplicates"] = len(inherited)
+        if inherited:
+            print(f"{PROVIDERS[key]['name']}: {len(inherited)} duplicatas herdaram a classificação da "
+                  f"representante ({DUPLICATES_FILE})")
+
+    # Gerar relatórios
+    print("\n" + "="*70)
+    print("Gerando relatórios...")
+    print("="*70)
+
+    for key, (results, execution_metadata, telemetry) in runs.items():
+        generate_json_report(results, f"{OUTPUT_DIR}/classification_results_{key}.json", execution_metadata,
+                             telemetry)
+        generate_markdown_report(results, f"{OUTPUT_DIR}/classification_results_{key}.md", execution_metadata,
+                                 telemetry)
+
+    # Resumo final
+    for key, (results, _, _) in runs.items():
+        print_summary(PROVIDERS[key]["name"], results)
+
+    if failures:
+        print("\n" + "="*70)
+        print("PROVEDORES COM FALHA (sem relatório)")
+        print("="*70)
+        for key, error in failures.items():
+            print(f"{PROVIDERS[key]['name']}: {error}")
+            if batch_state_file(key).exists():
+                print(f"  O lote continua no provedor; execute novamente com --lote para retomá-lo "
+                      f"({batch_state_file(key)})")
+        sys.exit(1)
+    print("\nProcesso concluído com sucesso!")
+
+
+def print_usage(script: str, providers: list = None):
+    """Cabeçalho com as opções de uso (providers = provedores fixos do script, None = todos)."""
+    title = ", ".join(PROVIDERS[key]["name"] for key in (providers or PROVIDERS))
+    print("="*70)
+    print(f"Script de Classificação de Tabelas - {title}")
+    print("="*70)
+    print()
+    print(f"Uso: python {script} [limit] [--provedores=LISTA] [--concorrencia=N] [--rpm=N] [--tpm=N] [--base-url=URL] [--sem-cache]")
+    print("                [--agrupar=K] [--prompt-prefixo] [--lote] [--intervalo-lote=N]")
+    print()
+    print("Argumentos:")
+    print("  limit : Número de tabelas a processar (opcional, para testes)")
+    print(f"          Exemplo: python {script} 10")
+    if providers:
+        print(f"  --provedores=LISTA : Provedores separados por vírgula (padrão: {','.join(providers)})")
+    else:
+        print(f"  --provedores=LISTA : Provedores separados por vírgula, entre {','.join(PROVIDERS)} "
+              "(padrão: todos com chave de API configurada)")
+    print(f"  --concorrencia=N : Chamadas simultâneas por provedor (padrão: {CONCURRENCY}; 1 = sequencial)")
+    print("  --rpm=N / --tpm=N : Limites de requisições e tokens por minuto para todos os provedores")
+    print("                      (padrão: os de cada provedor em PROVIDERS; 0 = sem limite)")
+    print("  --base-url=URL   : Endpoint compatível com OpenAI para todos os provedores (ex.: http://127.0.0.1:8000/v1 do servidor mock)")
+    print(f"  --sem-cache      : Ignora o cache de respostas ({CACHE_FILE})")
+    print(f"  --agrupar=K      : Tabelas por requisição (padrão: {PACK_SIZE}); as ausentes da resposta são reclassificadas uma a uma")
+    print("  --prompt-prefixo : Instruções no prompt de sistema e só os metadados na mensagem do usuário (cache de prefixo)")
+    print("  --lote           : Envia as requisições pela Batch API e espera o resultado (provedores com suporte;")
+    print("                     retoma o lote pendente de uma execução interrompida)")
+    print(f"  --intervalo-lote=N : Segundos entre consultas ao andamento do lote (padrão: {BATCH_POLL_SECONDS})")
+    print()
+    print("="*70)
+    print()
+
+
+if __name__ == "__main__":
+    print_usage("classify_tables.py")
+    main()
@@ -0,0 +1,100 @@
+"""
+Execução concorrente das chamadas de classificação, respeitando os limites de taxa do provedor.
+
+- TokenBucket: balde de fichas reabastecido continuamente (ex.: 500 requisições/min). Cada
+  chamada reserva as fichas de que precisa; se o saldo ficar negativo, espera o tempo de
+  reabastecimento correspondente fora da trava, então as chamadas saem na ordem de reserva.
+- RateLimiter: combina os baldes de requisições/min e de tokens/min de um provedor.
+- run_concurrently: executa uma função sobre os itens em um pool de threads e devolve os
+  resultados na ordem original dos itens, qualquer que seja a ordem de conclusão.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+BURST_SECONDS = 10          # Capacidade dos baldes: quantos segundos de taxa podem sair de uma vez
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens (~4 caracteres por token), usada só para dosar os tokens/min."""
+    return math.ceil(len(text) / 4)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """Reserva `amount` fichas, bloqueando até que estejam disponíveis. Devolve o tempo esperado."""
+        # Uma chamada maior que a capacidade nunca caberia no balde: limita à capacidade
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Limites de um provedor; None desliga o limite correspondente."""
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0):
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.tokens and tokens:
+            waited += self.tokens.acquire(tokens)
+        with self.lock:
+            self.waited += waited
+
+
+def run_concurrently(items, worker, concurrency: int = 4, limiter: RateLimiter = None,
+                     cost=None, on_done=None):
+    """
+    Aplica `worker` a cada item com até `concurrency` chamadas simultâneas.
+
+    Args:
+        items: Itens a processar
+        worker: Função item -> resultado (deve tratar os próprios erros)
+        concurrency: Número máximo de chamadas em andamento
+        limiter: Limites de requisições/tokens por minuto (opcional)
+        cost: Função item -> tokens estimados da chamada (para o limite de tokens/min)
+        on_done: Callback (concluídas, índice, item, resultado) chamado à medida que as chamadas
+            terminam; `concluídas` é o total terminado até ali (para o progresso)
+
+    Returns:
+        Lista de resultados na mesma ordem de `items`
+    """
+    items = list(items)
+    lock = threading.Lock()
+    completed = [0]
+
+    def task(index, item):
+        if limiter:
+            limiter.acquire(cost(item) if cost else 0)
+        result = worker(item)
+        if on_done:
+            with lock:
+                completed[0] += 1
+                on_done(completed[0], index, item, result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(task, index, item) for index, item in enumerate(items)]
+        return [future.result() for future in futures]
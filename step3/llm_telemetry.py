@@ -0,0 +1,152 @@
+"""
+Telemetria das chamadas à LLM: latência, tempo até o primeiro byte, tokens, novas tentativas e custo.
+
+Cada chamada à API gera um registro (que também vai para o resultado da tabela); CallTelemetry
+junta os registros de um provedor e calcula percentis de latência, vazão de tokens e custo
+estimado, usados para dimensionar a concorrência e orçar as execuções.
+
+Os tokens vêm do campo `usage` da resposta, separando os tokens de prompt servidos do cache de
+prefixo do provedor (cobrados com desconto e sem novo prefill) dos processados do zero. O cache
+de prefixo só aproveita o início idêntico entre requisições (na OpenAI, a partir de 1024 tokens,
+em blocos de 128): é o que mede se o layout do prompt (PROMPT_PREFIX_LAYOUT em
+classify_tables.py) está funcionando.
+
+- OpenAI e compatíveis: usage.prompt_tokens_details.cached_tokens
+- DeepSeek: usage.prompt_cache_hit_tokens
+"""
+
+import math
+import threading
+
+
+def usage_field(usage, name: str):
+    """Campo de `usage`, seja o objeto do cliente OpenAI ou o dicionário de um resultado de lote."""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
+def cached_prompt_tokens(usage) -> int:
+    cached = usage_field(usage_field(usage, "prompt_tokens_details"), "cached_tokens")
+    if cached is None:
+        cached = usage_field(usage, "prompt_cache_hit_tokens")
+    return cached or 0
+
+
+def percentile(values: list, p: float):
+    """Percentil pelo método do posto mais próximo (None se não houver valores)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def distribution(values: list, digits: int = 3) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50), digits),
+        "p95": round(percentile(values, 95), digits),
+        "p99": round(percentile(values, 99), digits),
+        "avg": round(sum(values) / len(values), digits),
+        "max": round(max(values), digits),
+    }
+
+
+class CallTelemetry:
+    """Registros das chamadas de um provedor; pode ser alimentado por várias threads."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def record(self, usage=None, latency: float = None, time_to_first_byte: float = None,
+               retries: int = 0, tables: int = 1, batch: bool = False) -> dict:
+        """
+        Registra uma chamada à API.
+
+        Args:
+            usage: Campo `usage` da resposta (objeto do cliente ou dicionário)
+            latency: Segundos do envio até a resposta completa (None no modo lote)
+            time_to_first_byte: Segundos do envio até o início da resposta HTTP
+            retries: Novas tentativas feitas pelo cliente (429/5xx) antes da resposta
+            tables: Tabelas classificadas na chamada (> 1 com --agrupar)
+            batch: Chamada feita pela Batch API (preço com desconto)
+
+        Returns:
+            O registro, para ser anexado ao resultado da tabela
+        """
+        prompt_tokens = usage_field(usage, "prompt_tokens") or 0
+        completion_tokens = usage_field(usage, "completion_tokens") or 0
+        call = {
+            "latency_s": round(latency, 3) if latency is not None else None,
+            "time_to_first_byte_s": round(time_to_first_byte, 3) if time_to_first_byte is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "cached_prompt_tokens": cached_prompt_tokens(usage),
+            "completion_tokens": completion_tokens,
+            "output_tokens_per_second": (round(completion_tokens / latency, 1)
+                                         if latency and completion_tokens else None),
+            "retries": retries,
+            "tables": tables,
+            "batch": batch,
+        }
+        with self.lock:
+            self.calls.append(call)
+        return call
+
+    def token_summary(self) -> dict:
+        with self.lock:
+            calls = list(self.calls)
+        prompt_tokens = sum(c["prompt_tokens"] for c in calls)
+        cached = sum(c["cached_prompt_tokens"] for c in calls)
+        return {
+            "requests": len(calls),
+            "prompt_tokens": prompt_tokens,
+            "cached_prompt_tokens": cached,
+            "uncached_prompt_tokens": prompt_tokens - cached,
+            "cached_ratio": round(cached / prompt_tokens, 4) if prompt_tokens else 0.0,
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+        }
+
+    def cost(self, pricing: dict) -> dict:
+        """
+        Custo estimado em USD.
+
+        Args:
+            pricing: Preços em USD por milhão de tokens: input, cached_input, output e
+                batch_discount (fração descontada nas chamadas pela Batch API)
+        """
+        with self.lock:
+            calls = list(self.calls)
+        parts = {"prompt_uncached": 0.0, "prompt_cached": 0.0, "completion": 0.0}
+        for c in calls:
+            factor = (1 - pricing.get("batch_discount", 0)) if c["batch"] else 1
+            parts["prompt_uncached"] += (c["prompt_tokens"] - c["cached_prompt_tokens"]) * pricing["input"] * factor
+            parts["prompt_cached"] += c["cached_prompt_tokens"] * pricing.get("cached_input", pricing["input"]) * factor
+            parts["completion"] += c["completion_tokens"] * pricing["output"] * factor
+        cost = {key: round(value / 1_000_000, 6) for key, value in parts.items()}
+        cost["total"] = round(sum(parts.values()) / 1_000_000, 6)
+        return cost
+
+    def summary(self, elapsed: float = None) -> dict:
+        """
+        Percentis de latência, tempo até o primeiro byte e vazão das chamadas.
+
+        Args:
+            elapsed: Duração da execução do provedor, para a vazão agregada em tokens/s
+        """
+        with self.lock:
+            calls = list(self.calls)
+        total_tokens = sum(c["prompt_tokens"] + c["completion_tokens"] for c in calls)
+        return {
+            "calls": len(calls),
+            "latency_s": distribution([c["latency_s"] for c in calls]),
+            "time_to_first_byte_s": distribution([c["time_to_first_byte_s"] for c in calls]),
+            "output_tokens_per_second": distribution([c["output_tokens_per_second"] for c in calls], 1),
+            "throughput_tokens_per_second": round(total_tokens / elapsed, 1) if elapsed else None,
+            "retries": sum(c["retries"] for c in calls),
+            "calls_with_retries": sum(1 for c in calls if c["retries"]),
+            "batch_calls": sum(1 for c in calls if c["batch"]),
+        }
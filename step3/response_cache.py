@@ -0,0 +1,123 @@
+"""
+Cache persistente (SQLite) das respostas da LLM, endereçado pelo conteúdo da requisição.
+
+A chave é o SHA-256 de provedor, modelo, temperatura, max_tokens, prompt de sistema e o prompt
+completo (saída de build_full_prompt): reexecutar o step3 com as mesmas entradas (ex.: depois de
+mudar só a formatação dos relatórios) não chama a API de novo. Qualquer mudança no prompt, nos
+metadados ou no modelo gera outra chave.
+
+O arquivo tem tamanho máximo; ao ultrapassá-lo, as respostas usadas há mais tempo são removidas.
+Pode ser usado por várias threads ao mesmo tempo (uma conexão protegida por trava), inclusive por
+vários provedores na mesma execução: acertos, chamadas e gravações são contados também por provedor.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+
+CACHE_EVICT_TO = 0.9        # Ao passar do limite, remove as entradas mais antigas até esta fração do limite
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.provider_hits = Counter()
+        self.provider_misses = Counter()
+        self.provider_stores = Counter()
+
+    @staticmethod
+    def make_key(provider, model, temperature, max_tokens, system_prompt, prompt) -> str:
+        payload = json.dumps([provider, model, temperature, max_tokens, system_prompt, prompt],
+                             ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, provider: str = None):
+        """Resposta guardada para a chave, ou None."""
+        with self.lock:
+            row = self.conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self.provider_misses[provider] += 1
+                return None
+            self.hits += 1
+            self.provider_hits[provider] += 1
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key: str, content: str, provider: str = None, model: str = None):
+        size = len(content.encode('utf-8')) + len(key)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, content, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, content, size, now, now))
+            self.stores += 1
+            self.provider_stores[provider] += 1
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * CACHE_EVICT_TO
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        removed = []
+        for key, size in rows:
+            if total <= target:
+                break
+            removed.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+        self.evictions += len(removed)
+
+    def stats(self, provider: str = None) -> dict:
+        """Estatísticas do cache; com `provider`, acertos, chamadas e gravações só daquele provedor."""
+        with self.lock:
+            entries, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        hits = self.provider_hits[provider] if provider else self.hits
+        misses = self.provider_misses[provider] if provider else self.misses
+        stores = self.provider_stores[provider] if provider else self.stores
+        lookups = hits + misses
+        return {
+            "file": str(self.path),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "stores": stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()